@@ -0,0 +1,60 @@
+"""Consumer of one of the queues of the processing of the samples (see
+`app.worker`), with as many workers as its stage is configured to:
+
+    python -m app.consumer --stage parse --lane fast
+"""
+import argparse
+import logging
+from typing import Dict, Optional
+
+from huey.consumer import Consumer
+from huey.consumer_options import ConsumerConfig
+
+from app.core.config import Settings, get_settings
+from app.enums.worker import Lane, Stage
+from app.worker import QUEUES
+
+
+def get_stage_workers(stage: Stage) -> int:
+    settings: Settings = get_settings()
+    workers: Dict[Stage, int] = {
+        Stage.PARSE: settings.WORKER_PARSE_WORKERS,
+        Stage.STATS: settings.WORKER_STATS_WORKERS,
+        Stage.RENDER: settings.WORKER_RENDER_WORKERS,
+    }
+    return workers[stage]
+
+
+def get_stage_worker_type(stage: Stage) -> str:
+    """Thread workers for the stages spreading their work over a process pool
+    (see `app.utils.pool`), which huey's daemonic worker processes cannot have,
+    otherwise process ones."""
+    settings: Settings = get_settings()
+    pooled: Dict[Stage, bool] = {
+        Stage.PARSE: settings.STATS_PARALLEL_WORKERS > 1,
+        Stage.STATS: settings.STATS_PARALLEL_WORKERS > 1,
+        Stage.RENDER: settings.VISUALIZATION_RENDERING_WORKERS > 1,
+    }
+    return "thread" if pooled[stage] else "process"
+
+
+def consume(stage: Stage, lane: Lane, workers: Optional[int] = None) -> None:
+    config: ConsumerConfig = ConsumerConfig(
+        workers=workers or get_stage_workers(stage),
+        worker_type=get_stage_worker_type(stage),
+    )
+    config.validate()
+    config.setup_logger(logging.getLogger("huey"))
+    consumer: Consumer = QUEUES[stage, lane].create_consumer(**config.values)
+    consumer.run()
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--stage", choices=[stage.value for stage in Stage], required=True
+    )
+    parser.add_argument("--lane", choices=[lane.value for lane in Lane], required=True)
+    parser.add_argument("--workers", type=int, default=None)
+    args: argparse.Namespace = parser.parse_args()
+    consume(Stage(args.stage), Lane(args.lane), workers=args.workers)
@@ -1,6 +1,8 @@
+import os
 import secrets
+import tempfile
 from functools import lru_cache
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseSettings
 
@@ -14,6 +16,8 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     API_APP: str = "app.main:app"
     PORT: int = 9000
+    API_HOST_EXT: str = "localhost"
+    API_PORT_EXT: int = 9000
 
     API_CLIENT_KEY: str
     API_CLIENT_SECRET: str
@@ -22,6 +26,18 @@ class Settings(BaseSettings):
     TUSD_PORT: str
     TUSD_ENDPOINT: str
     TUSD_UPLOAD_CHUNK: int
+    # tusd `-upload-dir` as seen by this host, its uploads are memory mapped
+    TUSD_FILESTORE_DIR: Optional[str] = None
+
+    # admission of uploads by the tusd pre-create hook
+    UPLOAD_MAX_BYTES: Optional[int] = 2 << 30
+    UPLOAD_MAX_ROWS: Optional[int] = None
+    UPLOAD_REQUIRED_METADATA: List[str] = ["filename", "filetype", "row_count"]
+    UPLOAD_FILETYPES: List[str] = ["text/csv", "application/csv", "text/plain"]
+    # per client quotas, over the last UPLOAD_QUOTA_WINDOW seconds
+    UPLOAD_CLIENT_MAX_ACTIVE: Optional[int] = 8
+    UPLOAD_CLIENT_MAX_BYTES: Optional[int] = 16 << 30
+    UPLOAD_QUOTA_WINDOW: int = 24 * 60 * 60
 
     S3_HOST: str
     S3_PORT: str
@@ -34,7 +50,53 @@ class Settings(BaseSettings):
     S3_HOST_EXT: str
     S3_PORT_EXT: str
 
+    S3_MAX_POOL_CONNECTIONS: int = 16
+    S3_MAX_ATTEMPTS: int = 5
+    S3_UPLOAD_CONCURRENCY: int = 8
+    # csvs are downloaded as concurrent range requests
+    S3_DOWNLOAD_PART_BYTES: int = 8 << 20
+    S3_DOWNLOAD_CONCURRENCY: int = 8
+
+    CSV_CHUNK_ROWS: Optional[int] = 100_000
+    CSV_CHUNK_BYTES: Optional[int] = None  # takes precedence over CSV_CHUNK_ROWS
+
+    # 1 computes the statistics in the calling process
+    STATS_PARALLEL_WORKERS: int = 1
+    STATS_PARTITION_BYTES: int = 64 << 20
+
+    SAMPLE_DEDUP_ENABLED: bool = True  # reuse results of byte identical samples
+    # appends (see `parent_sample_id`) only process their own rows
+    SAMPLE_APPEND_ENABLED: bool = True
+    SAMPLE_APPEND_RETRY_DELAY: int = 10  # seconds, while the parent is processed
+    SAMPLE_APPEND_MAX_RETRIES: int = 360  # then the append fails
+
+    # parquet copy of every parsed sample, cached locally by the workers
+    COLUMNAR_CACHE_ENABLED: bool = True
+    COLUMNAR_CACHE_DIR: str = os.path.join(tempfile.gettempdir(), "ath", "samples")
+    COLUMNAR_CACHE_MAX_BYTES: int = 8 << 30
+
     VISUALIZATION_RENDERING_FORMAT: Optional[RenderingFormat] = RenderingFormat.PNG
+    VISUALIZATION_RENDERING_WORKERS: int = 4  # 1 renders in the calling process
+    # fixed margins and fewer pixels for bar and pie charts
+    VISUALIZATION_SIMPLE_RENDERING: bool = False
+    VISUALIZATION_SIMPLE_DPI: int = 72
+    # violins drawn from per team histograms instead of every row
+    VISUALIZATION_FAST_DISTRIBUTIONS: bool = False
+    VISUALIZATION_DISTRIBUTION_BINS: int = 512
+    # otherwise, from at most as many values per team
+    VISUALIZATION_VIOLIN_MAX_ROWS: int = 100_000
+    # render plots when first requested, through the api
+    VISUALIZATION_LAZY_RENDERING: bool = False
+
+    # a queue per stage and lane, larger samples go to the bulk lanes
+    WORKER_FAST_LANE_MAX_BYTES: int = 64 * 1024 * 1024
+    WORKER_PARSE_WORKERS: int = 2
+    WORKER_STATS_WORKERS: int = 1
+    WORKER_RENDER_WORKERS: int = 2
+
+    # served at /metrics by the api and on METRICS_WORKER_PORT by the workers
+    METRICS_ENABLED: bool = True
+    METRICS_WORKER_PORT: int = 9100
 
     SECRET_KEY: str = secrets.token_urlsafe(32)
 
@@ -0,0 +1,234 @@
+"""Prometheus metrics of the api and the workers.
+
+Metrics live in the process that records them. When `PROMETHEUS_MULTIPROC_DIR`
+is set (the huey consumer runs several worker processes) they are written
+there instead, and whoever serves them aggregates every process: run this
+module as the worker sidecar,
+
+    python -m app.core.metrics --port 9100
+"""
+import argparse
+import os
+import time
+from functools import lru_cache
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+if TYPE_CHECKING:
+    from huey import Huey
+
+__all__ = ["CONTENT_TYPE_LATEST", "generate_latest"]
+
+MULTIPROCESS: bool = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+HTTP_REQUEST_DURATION: Histogram = Histogram(
+    "ath_http_request_duration_seconds",
+    "Latency of the api requests",
+    ["method", "route", "status_code"],
+)
+
+DB_POOL_CHECKOUT_WAIT: Histogram = Histogram(
+    "ath_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a db connection from the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_CONNECTIONS: Gauge = Gauge(
+    "ath_db_pool_connections",
+    "Db connections held by the pool, checked out or idle",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+
+TASK_DURATION: Histogram = Histogram(
+    "ath_task_duration_seconds",
+    "Duration of the huey tasks",
+    ["task", "outcome"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+
+INGESTED_BYTES: Counter = Counter(
+    "ath_ingested_bytes",
+    "Bytes of samples read by the workers",
+    ["source"],
+)
+INGESTED_ROWS: Counter = Counter(
+    "ath_ingested_rows",
+    "Rows of samples read by the workers",
+    ["source"],
+)
+REJECTED_UPLOADS: Counter = Counter(
+    "ath_rejected_uploads",
+    "Uploads refused by the tusd pre-create hook",
+    ["reason"],
+)
+
+
+def route_template(request: Request) -> str:
+    """Path template of the route matching `request`, e.g.
+    `/api/v1/samples/{sample_id}`, so that paths do not blow up the number of
+    label values."""
+    for route in request.app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+async def metrics_middleware(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    start: float = time.perf_counter()
+    status_code: int = 500
+    try:
+        response: Response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_REQUEST_DURATION.labels(
+            method=request.method,
+            route=route_template(request),
+            status_code=status_code,
+        ).observe(time.perf_counter() - start)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Async engine pool timing how long each checkout waits for a connection
+    (including opening it, when the pool has to)."""
+
+    def connect(self) -> Any:
+        start: float = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Keeps `DB_POOL_CONNECTIONS` up to date with the pool of `engine`."""
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(*args) -> None:
+        DB_POOL_CONNECTIONS.labels(state="idle").inc()
+
+    @event.listens_for(engine.sync_engine, "close")
+    def on_close(*args) -> None:
+        DB_POOL_CONNECTIONS.labels(state="idle").dec()
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def on_checkout(*args) -> None:
+        DB_POOL_CONNECTIONS.labels(state="idle").dec()
+        DB_POOL_CONNECTIONS.labels(state="checked_out").inc()
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def on_checkin(*args) -> None:
+        DB_POOL_CONNECTIONS.labels(state="checked_out").dec()
+        DB_POOL_CONNECTIONS.labels(state="idle").inc()
+
+
+def instrument_huey(huey: "Huey") -> None:
+    """Records `TASK_DURATION` of every task run by the consumers of `huey`."""
+    from huey.signals import SIGNAL_COMPLETE, SIGNAL_ERROR, SIGNAL_EXECUTING
+
+    started: Dict[str, float] = {}
+
+    @huey.signal(SIGNAL_EXECUTING)
+    def on_executing(signal: str, task: Any) -> None:
+        started[task.id] = time.perf_counter()
+
+    @huey.signal(SIGNAL_COMPLETE, SIGNAL_ERROR)
+    def on_finished(signal: str, task: Any, exc: Optional[Exception] = None) -> None:
+        start: Optional[float] = started.pop(task.id, None)
+        if start is None:
+            return
+        TASK_DURATION.labels(
+            task=task.name,
+            outcome="error" if signal == SIGNAL_ERROR else "complete",
+        ).observe(time.perf_counter() - start)
+
+
+class HueyQueueCollector(Collector):
+    """Backlog of huey queues, read from redis on every scrape, so it is the
+    same whichever process serves it."""
+
+    def __init__(self, *hueys: "Huey") -> None:
+        self.hueys: Tuple["Huey", ...] = hueys
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        pending: GaugeMetricFamily = GaugeMetricFamily(
+            "ath_huey_queue_depth", "Tasks waiting in the queue", labels=["queue"]
+        )
+        for huey in self.hueys:
+            pending.add_metric([huey.name], huey.pending_count())
+        yield pending
+        scheduled: GaugeMetricFamily = GaugeMetricFamily(
+            "ath_huey_scheduled_tasks",
+            "Tasks scheduled to run later",
+            labels=["queue"],
+        )
+        for huey in self.hueys:
+            scheduled.add_metric([huey.name], huey.scheduled_count())
+        yield scheduled
+
+
+@lru_cache()
+def get_registry() -> CollectorRegistry:
+    """Registry to serve the metrics from, the metrics of every process when in
+    multiprocess mode, plus the backlog of the queues."""
+    from app.worker import QUEUES
+
+    registry: CollectorRegistry = REGISTRY
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    registry.register(HueyQueueCollector(*QUEUES.values()))
+    return registry
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drops the live gauges of a worker process that is exiting."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
+
+
+def serve(port: int) -> None:
+    start_http_server(port, registry=get_registry())
+    while True:
+        time.sleep(3600)
+
+
+if __name__ == "__main__":
+    from app.core.config import Settings, get_settings
+
+    settings: Settings = get_settings()
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=settings.METRICS_WORKER_PORT)
+    args: argparse.Namespace = parser.parse_args()
+    serve(args.port)
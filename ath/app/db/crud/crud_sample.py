@@ -1,20 +1,46 @@
+import datetime as dt
 import logging
 import uuid
-from typing import List, Optional
+from typing import Any, Collection, Dict, List, Optional, Tuple
 
+from sqlalchemy import literal_column, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
-from sqlmodel import select
+from sqlalchemy.orm import aliased, joinedload, noload
+from sqlmodel import func, select, update
 
 from app.db.crud import CRUDBase
+from app.enums.sample import SampleInclude, Status
 from app.schemas.sample import SampleDb, SampleDbCreate, SampleDbUpdate
 from app.schemas.summary_statistics import SummaryStatisticsDb
 from app.schemas.visualization import VisualizationDb
+from app.utils.pagination import Cursor
 
 logger = logging.getLogger(__name__)
 
 
 class CRUDSample(CRUDBase[SampleDb, SampleDbCreate, SampleDbUpdate]):
+    async def update_status(
+        self,
+        db: AsyncSession,
+        *,
+        id: uuid.UUID,
+        status: Status,
+        parsing_error: Optional[str] = None,
+        stages: Optional[Dict[str, Any]] = None,
+        commit: bool = True,
+    ) -> None:
+        """Lightweight progress report: a single `UPDATE` of the status columns,
+        without loading, flushing or refreshing the sample object. Samples
+        already in the session are kept in sync."""
+        values: Dict[str, Any] = {"status": status}
+        if parsing_error is not None:
+            values["parsing_error"] = parsing_error
+        if stages is not None:
+            values["stages"] = stages
+        await db.execute(update(SampleDb).where(SampleDb.id == id).values(**values))
+        if commit:
+            await db.commit()
+
     async def get_by_upload_id(
         self, db: AsyncSession, upload_id: uuid.UUID
     ) -> Optional[SampleDb]:
@@ -24,6 +50,84 @@ class CRUDSample(CRUDBase[SampleDb, SampleDbCreate, SampleDbUpdate]):
         sample = result.scalars().one_or_none()
         return sample
 
+    async def get_done_by_content_hash(
+        self, db: AsyncSession, content_hash: str
+    ) -> Optional[SampleDb]:
+        """Oldest processed sample with the given content, along with its
+        results, if any. Appends are left out, their results also cover the
+        rows of their parent."""
+        result = await db.execute(
+            select(SampleDb)
+            .options(
+                joinedload(SampleDb.summary_statistics),
+                joinedload(SampleDb.visualization).selectinload(VisualizationDb.plots),
+            )
+            .where(SampleDb.content_hash == content_hash)
+            .where(SampleDb.status == Status.DONE)
+            .where(SampleDb.parent_sample_id.is_(None))  # type: ignore
+            .order_by(SampleDb.created_at)
+            .limit(1)
+        )
+        sample = result.scalars().first()
+        return sample
+
+    async def get_lineage(self, db: AsyncSession, sample: SampleDb) -> List[SampleDb]:
+        """`sample` and the samples it appends to, oldest first, in a single
+        (recursive) query."""
+        parent = aliased(SampleDb)
+        lineage = (
+            select(  # type: ignore
+                SampleDb.id,
+                SampleDb.parent_sample_id,
+                literal_column("0").label("depth"),
+            )
+            .where(SampleDb.id == sample.id)
+            .cte(name="lineage", recursive=True)
+        )
+        lineage = lineage.union_all(
+            select(  # type: ignore
+                parent.id, parent.parent_sample_id, lineage.c.depth + 1
+            ).where(parent.id == lineage.c.parent_sample_id)
+        )
+        result = await db.execute(
+            select(SampleDb)
+            .join(lineage, SampleDb.id == lineage.c.id)
+            .order_by(lineage.c.depth.desc())
+        )
+        return list(result.scalars().all())
+
+    async def get_content_cache_stats(self, db: AsyncSession) -> Tuple[int, int]:
+        """Number of processed samples whose results were reused (hits) and
+        computed (misses)."""
+        hit = SampleDb.source_sample_id.isnot(None)  # type: ignore
+        result = await db.execute(
+            select(  # type: ignore
+                func.count().filter(hit),
+                func.count().filter(~hit),
+            )
+            .where(SampleDb.status == Status.DONE)
+            .where(SampleDb.content_hash.isnot(None))  # type: ignore
+        )
+        hits, misses = result.one()
+        return hits, misses
+
+    async def get_client_usage(
+        self, db: AsyncSession, client: str, since: dt.datetime
+    ) -> Tuple[int, int]:
+        """Number of the uploads `client` started since `since` that are still
+        uploading, and bytes they all add up to."""
+        uploading = SampleDb.status == Status.UPLOADING
+        result = await db.execute(
+            select(  # type: ignore
+                func.count().filter(uploading),
+                func.coalesce(func.sum(SampleDb.size), 0),
+            )
+            .where(SampleDb.client == client)
+            .where(SampleDb.started_upload_at >= since)
+        )
+        active, num_bytes = result.one()
+        return active, num_bytes
+
     async def get_multi_by_upload_id(
         self,
         db: AsyncSession,
@@ -46,15 +150,32 @@ class CRUDSample(CRUDBase[SampleDb, SampleDbCreate, SampleDbUpdate]):
         skip: Optional[int] = 0,
         limit: Optional[int] = None,
         upload_id: Optional[uuid.UUID] = None,
+        after: Optional[Cursor] = None,
+        include: Optional[Collection[SampleInclude]] = None,
     ) -> List[SampleDb]:
-        stmt = (
-            select(SampleDb)
-            .offset(skip)
-            .options(joinedload(SampleDb.summary_statistics))
-            .options(
-                joinedload(SampleDb.visualization).joinedload(VisualizationDb.plots)
+        """Samples ordered by `(created_at, id)`. Pass the key of the last
+        sample of a page as `after` to get the next one (keyset pagination).
+        Only the relationships in `include` are loaded, all when `None`."""
+        if include is None:
+            include = list(SampleInclude)
+
+        stmt = select(SampleDb).order_by(SampleDb.created_at, SampleDb.id)
+        if SampleInclude.SUMMARY_STATISTICS in include:
+            stmt = stmt.options(joinedload(SampleDb.summary_statistics))
+        else:
+            stmt = stmt.options(noload(SampleDb.summary_statistics))
+        if SampleInclude.VISUALIZATION in include:
+            stmt = stmt.options(
+                joinedload(SampleDb.visualization).selectinload(VisualizationDb.plots)
             )
-        )
+        else:
+            stmt = stmt.options(noload(SampleDb.visualization))
+
+        if after:
+            keyset = tuple_(SampleDb.created_at, SampleDb.id)  # type: ignore
+            stmt = stmt.where(keyset > tuple_(*after))  # type: ignore
+        if skip:
+            stmt = stmt.offset(skip)
         if limit:
             stmt = stmt.limit(limit)
         if upload_id:
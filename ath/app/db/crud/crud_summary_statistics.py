@@ -1,5 +1,6 @@
 import json
 import logging
+import uuid
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -26,7 +27,11 @@ class CRUDSummaryStatistics(
         commit: bool = False,
     ) -> SummaryStatisticsDb:
         report = json.loads(obj_in.report.json())
-        db_obj = SummaryStatisticsDb(report=report, sample=sample)  # type: ignore
+        # client side id, so the row can be read back (and batched with other
+        # inserts) without flushing
+        db_obj = SummaryStatisticsDb(
+            id=uuid.uuid4(), report=report, sample=sample  # type: ignore
+        )
         db.add(db_obj)
         if flush:
             await db.flush()
@@ -1,4 +1,5 @@
 import logging
+import uuid
 from typing import List
 
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -28,7 +29,7 @@ class CRUDVisualization(
         commit: bool = False,
     ) -> VisualizationDb:
         db_obj: VisualizationDb = VisualizationDb(
-            **obj_in.dict(), sample=sample, plots=plots
+            id=uuid.uuid4(), **obj_in.dict(), sample=sample, plots=plots
         )
         db.add(db_obj)
         if flush:
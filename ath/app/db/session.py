@@ -1,27 +1,39 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core import config
+from app.core.metrics import InstrumentedAsyncQueuePool, instrument_engine
 
 settings = config.get_settings()
 
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    future=True,
-    pool_size=100,
-    max_overflow=100,
-)
+def create_engine() -> AsyncEngine:
+    """Its connections are bound to the event loop they were opened on: every
+    loop (e.g. of each thread worker, see `app.worker`) needs its own engine."""
+    engine: AsyncEngine = create_async_engine(
+        settings.DATABASE_URL,
+        echo=False,
+        future=True,
+        pool_size=100,
+        max_overflow=100,
+        poolclass=InstrumentedAsyncQueuePool,
+    )
+    instrument_engine(engine)
+    return engine
 
 
-async_session_factory = sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False,
-)
+def create_session_factory(engine: AsyncEngine) -> sessionmaker:
+    return sessionmaker(
+        engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+
+
+engine = create_engine()
+async_session_factory = create_session_factory(engine)
 
 
 async def close_engine():
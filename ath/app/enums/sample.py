@@ -8,3 +8,8 @@ class Status(str, Enum):
     RENDERING = "rendering"
     DONE = "done"
     FAILED = "failed"
+
+
+class SampleInclude(str, Enum):
+    SUMMARY_STATISTICS = "summary_statistics"
+    VISUALIZATION = "visualization"
@@ -0,0 +1,18 @@
+from enum import Enum
+
+
+class Stage(str, Enum):
+    """Stages of the processing of a sample, each run by the consumers of its
+    own queues."""
+
+    PARSE = "parse"
+    STATS = "stats"
+    RENDER = "render"
+
+
+class Lane(str, Enum):
+    """Queues of a stage, by size of the sample, so that small samples are
+    never queued behind large ones."""
+
+    FAST = "fast"
+    BULK = "bulk"
@@ -1,10 +1,40 @@
+from typing import List, NamedTuple, Sequence
+
+
 class ServiceError(Exception):
     ...
 
 
+class RowError(NamedTuple):
+    """A value of a csv at fault, `line` counting the header as line 1."""
+
+    line: int
+    column: str
+    value: str
+
+
 class ParsingCsvError(ServiceError):
-    ...
+    """The csv is malformed. `errors` holds a bounded sample of the values at
+    fault, when they are known."""
+
+    def __init__(self, *args: object, errors: Sequence[RowError] = ()) -> None:
+        super().__init__(*args)
+        self.errors: List[RowError] = list(errors)
+
+    def __str__(self) -> str:
+        message: str = super().__str__()
+        if not self.errors:
+            return message
+        values: str = "; ".join(
+            f"line {error.line}, {error.column}: {error.value!r}"
+            for error in self.errors
+        )
+        return f"{message} [{values}]"
 
 
 class BadSampleError(ServiceError):
     ...
+
+
+class SampleNotReadyError(ServiceError):
+    """The sample depends on another one that is still being processed."""
@@ -3,7 +3,7 @@ from pprint import pformat
 from typing import Literal
 
 import uvicorn
-from fastapi import FastAPI, status
+from fastapi import FastAPI, Response, status
 from fastapi_utils.timing import add_timing_middleware
 
 from app.core import config
@@ -20,6 +20,12 @@ from app.core.exceptions import (
     http_409_conflict_exception_handler,
 )
 from app.core.logging import setup_logger
+from app.core.metrics import (
+    CONTENT_TYPE_LATEST,
+    generate_latest,
+    get_registry,
+    metrics_middleware,
+)
 from app.db.sanity import check_db_is_ready
 from app.db.session import close_engine
 from app.routes.v1 import router_v1
@@ -83,6 +89,17 @@ async def health_check() -> Literal[""]:
     return ""
 
 
+async def metrics() -> Response:
+    return Response(
+        generate_latest(get_registry()), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
+
+
+if settings.METRICS_ENABLED:
+    app.middleware("http")(metrics_middleware)
+    app.add_api_route("/metrics", metrics, include_in_schema=False)
+
+
 app.include_router(router_v1, prefix=settings.API_V1_STR)
 
 
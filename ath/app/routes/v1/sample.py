@@ -1,14 +1,22 @@
 import logging
 import uuid
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import Settings, get_settings
 from app.db.session import get_db
-from app.schemas.http_errors import HTTP401UnauthorizedContent, HTTP403ForbiddenContent
-from app.schemas.sample import SampleReadListResponse
+from app.enums.sample import SampleInclude
+from app.schemas.http_errors import (
+    HTTP400BadRequestContent,
+    HTTP401UnauthorizedContent,
+    HTTP403ForbiddenContent,
+    HTTP404NotFoundContent,
+    HTTP409ConflictContent,
+)
+from app.schemas.sample import SampleCacheStats, SampleReadListResponse
 from app.services.sample import SampleService, get_sample_service
 
 sample_router: APIRouter = APIRouter()
@@ -21,6 +29,10 @@ logger: logging.Logger = logging.getLogger(__name__)
     response_model=SampleReadListResponse,
     status_code=status.HTTP_200_OK,
     responses={
+        status.HTTP_400_BAD_REQUEST: {
+            "model": HTTP400BadRequestContent,
+            "description": "Invalid cursor",
+        },
         status.HTTP_401_UNAUTHORIZED: {
             "model": HTTP401UnauthorizedContent,
             "description": "Not authenticated",
@@ -38,10 +50,68 @@ async def list_samples(
     skip: Optional[int] = Query(0, ge=0),
     limit: Optional[int] = Query(10, ge=1),
     upload_id: Optional[uuid.UUID] = None,
+    cursor: Optional[str] = None,
+    include: Optional[List[SampleInclude]] = Query(None),
     sample_svc: SampleService = Depends(get_sample_service),
 ) -> SampleReadListResponse:
-    """List samples."""
+    """List samples, oldest first.
+
+    Follow `next_cursor` to walk the pages, and narrow `include` to the
+    relationships actually needed to keep the listing light.
+    """
     sample_read_list_response: SampleReadListResponse = await sample_svc.list(
-        skip=skip, limit=limit, upload_id=upload_id
+        skip=skip, limit=limit, upload_id=upload_id, cursor=cursor, include=include
     )
     return sample_read_list_response
+
+
+@sample_router.get(
+    "/samples/cache-stats",
+    response_model=SampleCacheStats,
+    status_code=status.HTTP_200_OK,
+    responses={
+        status.HTTP_401_UNAUTHORIZED: {
+            "model": HTTP401UnauthorizedContent,
+            "description": "Not authenticated",
+        },
+        status.HTTP_403_FORBIDDEN: {
+            "model": HTTP403ForbiddenContent,
+            "description": "Not enough privileges",
+        },
+    },
+)
+async def get_samples_cache_stats(
+    *,
+    # auth_token_payload: TokenPayload = Depends(oauth2_token_payload),
+    sample_svc: SampleService = Depends(get_sample_service),
+) -> SampleCacheStats:
+    """Hits and misses of the content dedup cache, i.e. how many processed
+    samples reused the results of an identical earlier upload."""
+    sample_cache_stats: SampleCacheStats = await sample_svc.get_cache_stats()
+    return sample_cache_stats
+
+
+@sample_router.get(
+    "/samples/{sample_id}/plots/{name}",
+    response_class=RedirectResponse,
+    status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+    responses={
+        status.HTTP_404_NOT_FOUND: {
+            "model": HTTP404NotFoundContent,
+            "description": "Unknown sample or plot",
+        },
+        status.HTTP_409_CONFLICT: {
+            "model": HTTP409ConflictContent,
+            "description": "Sample not processed yet",
+        },
+    },
+)
+async def get_sample_plot(
+    *,
+    sample_id: uuid.UUID,
+    name: str,
+    sample_svc: SampleService = Depends(get_sample_service),
+) -> RedirectResponse:
+    """Redirects to a plot of the sample, rendering it on its first request."""
+    url: str = await sample_svc.get_plot_url(sample_id=sample_id, name=name)
+    return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
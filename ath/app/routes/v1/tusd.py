@@ -5,7 +5,11 @@ from fastapi import APIRouter, Depends, Header, Request, Response, status
 # from app.core.auth import oauth2_token_payload
 from app.core.config import get_settings
 from app.enums.tusd import HookName
-from app.schemas.http_errors import HTTP401UnauthorizedContent, HTTP403ForbiddenContent
+from app.schemas.http_errors import (
+    HTTP400BadRequestContent,
+    HTTP401UnauthorizedContent,
+    HTTP403ForbiddenContent,
+)
 from app.schemas.tusd import HookBody
 from app.services.tusd import TusdService, get_tusd_service
 
@@ -18,13 +22,17 @@ logger = logging.getLogger(__name__)
     "/tusd-webhook-notification",
     status_code=status.HTTP_204_NO_CONTENT,
     responses={
+        status.HTTP_400_BAD_REQUEST: {
+            "model": HTTP400BadRequestContent,
+            "description": "Upload refused: invalid size or metadata",
+        },
         status.HTTP_401_UNAUTHORIZED: {
             "model": HTTP401UnauthorizedContent,
             "description": "Not authenticated",
         },
         status.HTTP_403_FORBIDDEN: {
             "model": HTTP403ForbiddenContent,
-            "description": "Not enough privileges",
+            "description": "Not enough privileges, or upload quota exceeded",
         },
     },
 )
@@ -30,7 +30,9 @@ class PlotDbUpdate(SQLModel):
 class PlotDb(Base, PlotBase, table=True):
     __tablename__ = "plot"
 
-    visualization_id: uuid.UUID = Field(default=None, foreign_key="visualization.id")
+    visualization_id: uuid.UUID = Field(
+        default=None, foreign_key="visualization.id", index=True
+    )
     visualization: "VisualizationDb" = Relationship(back_populates="plots")
 
 
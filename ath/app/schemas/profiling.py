@@ -0,0 +1,32 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+# Data schemas #######################################
+
+
+class StageMetrics(BaseModel):
+    """Resources used by a stage of the processing of a sample."""
+
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: Optional[int] = None
+    """High water mark of the resident memory of the process that ran the stage,
+    at its end."""
+    num_rows: Optional[int] = None
+    num_bytes: Optional[int] = None
+
+    def merge(self, other: "StageMetrics") -> "StageMetrics":
+        def add(a: Optional[int], b: Optional[int]) -> Optional[int]:
+            return a if b is None else b if a is None else a + b
+
+        def peak(a: Optional[int], b: Optional[int]) -> Optional[int]:
+            return a if b is None else b if a is None else max(a, b)
+
+        return StageMetrics(
+            wall_seconds=self.wall_seconds + other.wall_seconds,
+            cpu_seconds=self.cpu_seconds + other.cpu_seconds,
+            peak_rss_bytes=peak(self.peak_rss_bytes, other.peak_rss_bytes),
+            num_rows=add(self.num_rows, other.num_rows),
+            num_bytes=add(self.num_bytes, other.num_bytes),
+        )
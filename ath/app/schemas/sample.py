@@ -1,17 +1,31 @@
 import datetime as dt
 import uuid
-from typing import List, Optional
+from typing import Dict, List, NamedTuple, Optional
 
 import pytz
 from pydantic import BaseModel, Extra
 from sqlalchemy import null
 from sqlalchemy.dialects.postgresql import UUID
-from sqlmodel import Column, DateTime, Field, Relationship, SQLModel, func, text
+from sqlmodel import (
+    JSON,
+    BigInteger,
+    Column,
+    DateTime,
+    Field,
+    Index,
+    Relationship,
+    SQLModel,
+    func,
+    text,
+)
 
 from app.enums.sample import Status
 from app.schemas.base import Base
+from app.schemas.profiling import StageMetrics
 from app.schemas.summary_statistics import SummaryStatisticsDb, SummaryStatisticsDbRead
+from app.schemas.tusd import StorageType
 from app.schemas.visualization import VisualizationDb, VisualizationRead
+from app.utils.accumulators import ReportAccumulator
 
 # Data schemas #######################################
 
@@ -30,19 +44,39 @@ class SampleBase(SQLModel):
 
     file_name: Optional[str] = Field(default=None)
     """Generated by the tusd client as a name to the file stored in the S3
-    server. Can't be used as upload_id since during `pre-create` hook there is
-    no ID (file name) yet.
+    server (or in the tusd filestore, see `TUSD_FILESTORE_DIR`). Can't be used
+    as upload_id since during `pre-create` hook there is no ID (file name) yet.
     """
 
     parsing_error: Optional[str] = Field(default=None)
 
+    content_hash: Optional[str] = Field(default=None)
+    """sha256 of the csv file, computed while it's parsed."""
+
+    source_sample_id: Optional[uuid.UUID] = Field(default=None)
+    """Set when the results were reused from an earlier sample with the same
+    `content_hash` instead of being computed."""
+
+    parent_sample_id: Optional[uuid.UUID] = Field(default=None)
+    """Set on a sample that appends new rows to another one (its parent, given
+    as tus metadata): its results are those of the parent plus its own rows."""
+
+    size: Optional[int] = Field(default=None)
+    """Bytes of the csv, as declared when the upload was created, `None` when
+    deferred."""
+
+    stages: Optional[Dict[str, StageMetrics]] = Field(default=None)
+    """Resources used by each stage of the processing of the sample (download,
+    parse, stats, build_figures, rasterize, upload, db_commit...). Stages that
+    run in worker processes add up the time of every worker."""
+
 
 class SampleDbRead(SampleBase):
     id: uuid.UUID
 
 
 class SampleDbCreate(SampleBase, extra=Extra.forbid):
-    ...
+    client: Optional[str] = None
 
 
 class SampleDbUpdate(SQLModel):
@@ -52,10 +86,20 @@ class SampleDbUpdate(SQLModel):
     upload_id: Optional[uuid.UUID]
     file_name: Optional[str]
     parsing_error: Optional[str]
+    content_hash: Optional[str]
+    source_sample_id: Optional[uuid.UUID]
+    parent_sample_id: Optional[uuid.UUID]
+    size: Optional[int]
+    stages: Optional[Dict[str, StageMetrics]]
+    storage: Optional[StorageType]
 
 
 class SampleDb(Base, SampleBase, table=True):
     __tablename__ = "sample"
+    __table_args__ = (
+        Index("ix_sample_created_at_id", "created_at", "id"),
+        Index("ix_sample_client_started_upload_at", "client", "started_upload_at"),
+    )
 
     upload_id: uuid.UUID = Field(
         sa_column=Column(UUID(as_uuid=True), nullable=False, unique=True)
@@ -65,6 +109,28 @@ class SampleDb(Base, SampleBase, table=True):
         sa_column=Column(DateTime(timezone=True), server_default=func.now())
     )
 
+    content_hash: Optional[str] = Field(default=None, index=True)
+
+    source_sample_id: Optional[uuid.UUID] = Field(default=None, foreign_key="sample.id")
+
+    parent_sample_id: Optional[uuid.UUID] = Field(
+        default=None, foreign_key="sample.id", index=True
+    )
+
+    stages: Optional[Dict] = Field(default=None, sa_column=Column(JSON))  # type: ignore
+
+    size: Optional[int] = Field(
+        default=None, sa_column=Column(BigInteger)  # type: ignore
+    )
+
+    client: Optional[str] = Field(default=None)
+    """Address the upload came from, the upload quotas are per client (see
+    `UPLOAD_CLIENT_MAX_ACTIVE`/`UPLOAD_CLIENT_MAX_BYTES`). Not exposed."""
+
+    storage: Optional[StorageType] = Field(default=None)
+    """Where tusd stored the csv: S3 or a filestore, which the workers must
+    share (see `TUSD_FILESTORE_DIR`). Not exposed."""
+
     visualization: "VisualizationDb" = Relationship(
         sa_relationship_kwargs={"uselist": False}, back_populates="sample"
     )
@@ -82,8 +148,27 @@ class SampleRead(SampleDbRead):
     visualization: Optional[VisualizationRead] = Field(None)
 
 
+class ParsedSample(NamedTuple):
+    """What the first stage of the processing of a sample hands over to the
+    next ones when they run in the same process (see `SampleService.process`),
+    instead of them loading it back."""
+
+    accumulator: ReportAccumulator
+    """Statistics state of every row of the sample, including those of the
+    samples it appends to, which the plots are drawn from as well."""
+
+
 # Routes schemas #######################################
 
 
 class SampleReadListResponse(BaseModel):
     sample_reads: List[SampleRead]
+    next_cursor: Optional[str] = None
+    """Pass it back as `cursor` to get the next page, `None` on the last one."""
+
+
+class SampleCacheStats(BaseModel):
+    hits: int
+    """Samples whose results were reused from an identical earlier one."""
+    misses: int
+    """Samples that had to be processed."""
@@ -77,7 +77,9 @@ class SummaryStatisticsDb(Base, SummaryStatisticsBase, table=True):
 
     report: Dict = Field(default={}, sa_column=Column(JSON))  # type: ignore
 
-    sample_id: uuid.UUID = Field(foreign_key="sample.id", nullable=True, default=None)
+    sample_id: uuid.UUID = Field(
+        foreign_key="sample.id", nullable=True, default=None, index=True
+    )
     sample: "SampleDb" = Relationship(back_populates="summary_statistics")
 
 
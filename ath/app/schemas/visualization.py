@@ -1,12 +1,15 @@
 import uuid
-from typing import TYPE_CHECKING, List, NamedTuple
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional
 
+import pandas as pd
 from matplotlib.figure import Figure
 from pydantic import Extra
 from sqlmodel import Field, Relationship, SQLModel
 
 from app.schemas.base import Base
 from app.schemas.plots import PlotDbRead
+from app.schemas.profiling import StageMetrics
+from app.utils.distributions import BinnedDistribution
 
 if TYPE_CHECKING:
     from app.schemas.plots import PlotDb
@@ -32,7 +35,7 @@ class VisualizationDbUpdate(SQLModel):
 class VisualizationDb(Base, VisualizationBase, table=True):
     __tablename__ = "visualization"
 
-    sample_id: uuid.UUID = Field(default=None, foreign_key="sample.id")
+    sample_id: uuid.UUID = Field(default=None, foreign_key="sample.id", index=True)
     sample: "SampleDb" = Relationship(back_populates="visualization")
 
     plots: List["PlotDb"] = Relationship(back_populates="visualization")
@@ -45,6 +48,31 @@ class VisualizationRead(VisualizationDbRead):
     plots: List[PlotDbRead]
 
 
+class FigureData(NamedTuple):
+    """What the figure builders draw from, computed once per sample."""
+
+    per_team: Dict[bool, pd.DataFrame]
+    """Mean review/merge time and number of PRs of each team, keyed by whether
+    outliers (unreviewed or non-CI PRs) are included."""
+
+    num_rows: int
+
+    without_outliers: Optional[pd.DataFrame] = None
+    """The rows of PRs with both a review and a merge time, the violins are
+    drawn from, unless they come from `distributions`."""
+
+    distributions: Optional[Dict[str, BinnedDistribution]] = None
+    """Binned distribution of each time column of the same rows, per team (see
+    `VISUALIZATION_FAST_DISTRIBUTIONS`)."""
+
+
 class NamedFigure(NamedTuple):
     name: str
     figure: Figure
+
+
+class RenderedFigure(NamedTuple):
+    name: str
+    data: bytes
+    stages: Dict[str, StageMetrics] = {}
+    """Resources used to build and rasterize the figure."""
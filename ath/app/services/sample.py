@@ -1,6 +1,12 @@
+import asyncio
+import datetime as dt
+import hashlib
 import logging
+import os
 import uuid
-from typing import List, Optional
+from functools import partial
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple, Union, cast
 
 import pandas as pd
 from fastapi import Depends
@@ -8,11 +14,28 @@ from pydantic import parse_obj_as
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core import config
+from app.core.exceptions import (
+    HTTP400BadRequestException,
+    HTTP404NotFoundException,
+    HTTP409ConflictException,
+)
+from app.core.metrics import INGESTED_BYTES, INGESTED_ROWS
 from app.db.crud.crud_sample import crud_sample
-from app.db.session import get_db
-from app.enums.sample import Status
-from app.error import BadSampleError, ParsingCsvError
+from app.db.session import async_session_factory, get_db
+from app.enums.sample import SampleInclude, Status
+from app.error import BadSampleError, ParsingCsvError, SampleNotReadyError
+from app.schemas.http_errors import (
+    HTTP400BadRequestContent,
+    HTTP400BadRequestResponse,
+    HTTP404NotFoundContent,
+    HTTP404NotFoundResponse,
+    HTTP409ConflictContent,
+    HTTP409ConflictResponse,
+)
+from app.schemas.profiling import StageMetrics
 from app.schemas.sample import (
+    ParsedSample,
+    SampleCacheStats,
     SampleDb,
     SampleDbCreate,
     SampleDbRead,
@@ -20,21 +43,61 @@ from app.schemas.sample import (
     SampleRead,
     SampleReadListResponse,
 )
-from app.schemas.summary_statistics import SummaryStatisticsDbRead
-from app.schemas.visualization import VisualizationRead
+from app.schemas.summary_statistics import Report, SummaryStatisticsDbRead
+from app.schemas.tusd import StorageType
+from app.schemas.visualization import FigureData, VisualizationRead
 from app.services.base import BaseService
 from app.services.summary_statistics import (
     SummaryStatisticsService,
     get_summary_statistics_service,
 )
-from app.services.visualization import VisualizationService, get_visualization_service
-from app.utils.s3 import s3_csv_url
+from app.services.visualization import (
+    FIGURE_SPECS_BY_NAME,
+    FigureSpec,
+    VisualizationService,
+    get_state_figure_data,
+    get_visualization_service,
+    plot_file_name,
+)
+from app.utils.accumulators import ReportAccumulator
+from app.utils.columnar import (
+    ParquetSink,
+    evict_parquet_files,
+    parquet_file_name,
+    read_parquet,
+    stream_parquet,
+)
+from app.utils.ingestion import (
+    ByteStream,
+    ChunkConsumer,
+    DataFrameCollector,
+    HashingReader,
+    MappedFileReader,
+    stream_csv,
+)
+from app.utils.pagination import Cursor, decode_cursor, encode_cursor
+from app.utils.partitions import stream_csv_partitioned
+from app.utils.pool import process_pool
+from app.utils.profiling import StageTimer, TimedConsumer, TimedReader
+from app.utils.s3 import (
+    S3RangeReader,
+    s3_download_file,
+    s3_download_to_memory,
+    s3_open,
+    s3_upload_file_from_memory,
+    s3_upload_fileobj,
+)
+from app.utils.tusd import tusd_file_path
 
 settings: config.Settings = config.get_settings()
 
 logger: logging.Logger = logging.getLogger(__name__)
 
 
+def state_file_name(sample_file_name: str) -> str:
+    return f"{sample_file_name}.state"
+
+
 class SampleService(BaseService):
     def __init__(
         self,
@@ -77,49 +140,183 @@ class SampleService(BaseService):
         return sample_db_read
 
     async def process(self, sample_id: uuid.UUID) -> SampleDbRead:
+        """Runs every stage in this process, the workers queue each one."""
+        parsed: Optional[ParsedSample] = await self.parse(sample_id, hand_over=True)
+        if parsed is None:
+            return await self.get(sample_id)
+        await self.summarize(sample_id, accumulator=parsed.accumulator)
+        return await self.render(sample_id, accumulator=parsed.accumulator)
+
+    async def parse(
+        self, sample_id: uuid.UUID, hand_over: bool = False
+    ) -> Optional[ParsedSample]:
+        """Returns `None` when the sample failed or reused earlier results."""
+        sample: SampleDb = await self.get_processable(sample_id)
+
+        parent: Optional[SampleDb] = None
+        if sample.parent_sample_id:
+            parent = await crud_sample.get(self.db, id=sample.parent_sample_id)
+            if not parent or parent.status == Status.FAILED:
+                await crud_sample.update_status(
+                    self.db,
+                    id=sample.id,
+                    status=Status.FAILED,
+                    parsing_error=(
+                        f"Unable to append to sample [{sample.parent_sample_id=}]"
+                    ),
+                )
+                return None
+            if parent.status != Status.DONE:
+                raise SampleNotReadyError(
+                    f"Parent sample is not processed yet [{sample.parent_sample_id=}]"
+                )
+
+        await crud_sample.update_status(self.db, id=sample.id, status=Status.PARSING)
+
+        timer: StageTimer = StageTimer()
+        accumulator: ReportAccumulator = ReportAccumulator()
+        try:
+            content_hash: Optional[str] = self.ingest(
+                sample, consumers=[], timer=timer, accumulator=accumulator
+            )
+        except ParsingCsvError as e:
+            await crud_sample.update_status(
+                self.db,
+                id=sample.id,
+                status=Status.FAILED,
+                parsing_error=str(e),
+                stages=timer.dict(),
+            )
+            return None
+
+        if parent:
+            # only the new rows were parsed, the rest comes from the parent
+            with timer.stage("stats"):
+                accumulator = (await self.load_state(parent, timer)).merge(accumulator)
+        if (
+            settings.SAMPLE_APPEND_ENABLED
+            or settings.VISUALIZATION_LAZY_RENDERING
+            or not hand_over
+        ):
+            # loaded back by the next stages, appends and plots rendered lazily
+            self.save_state(sample, accumulator, timer)
+
+        if not parent and settings.SAMPLE_DEDUP_ENABLED and content_hash:
+            source: Optional[SampleDb] = await crud_sample.get_done_by_content_hash(
+                self.db, content_hash=content_hash
+            )
+            if source and source.summary_statistics and source.visualization:
+                await self.reuse_results(
+                    sample=sample, source=source, content_hash=content_hash, timer=timer
+                )
+                return None
+
+        await self.commit_stage(
+            sample,
+            SampleDbUpdate(status=Status.PROCESSING, content_hash=content_hash),
+            timer,
+        )
+        return ParsedSample(accumulator=accumulator)
+
+    async def summarize(
+        self, sample_id: uuid.UUID, accumulator: Optional[ReportAccumulator] = None
+    ) -> SampleDbRead:
+        sample: SampleDb = await self.get_processable(sample_id)
+        timer: StageTimer = self.resume_timer(sample)
+        with timer.stage("stats"):
+            if accumulator is None:
+                accumulator = await self.load_state(sample, timer)
+            report: Report = accumulator.result()
+
+        await self.summary_statistics_svc.create_from_report(
+            report=report, sample=sample, commit=False
+        )
+        await self.commit_stage(sample, SampleDbUpdate(status=Status.RENDERING), timer)
+        return SampleDbRead.parse_obj(sample)
+
+    async def render(
+        self, sample_id: uuid.UUID, accumulator: Optional[ReportAccumulator] = None
+    ) -> SampleDbRead:
+        sample: SampleDb = await self.get_processable(sample_id)
+        timer: StageTimer = self.resume_timer(sample)
+        data: Optional[FigureData] = None
+        if not settings.VISUALIZATION_LAZY_RENDERING:
+            with timer.stage("figure_data") as metrics:
+                if accumulator is None:
+                    accumulator = await self.load_state(sample, timer)
+                data = get_state_figure_data(accumulator)
+                metrics.num_rows = data.num_rows
+
+        await self.visualization_svc.create(
+            data=data, sample=sample, commit=False, timer=timer
+        )
+        await self.commit_stage(sample, SampleDbUpdate(status=Status.DONE), timer)
+        return SampleDbRead.parse_obj(sample)
+
+    async def fail(self, sample_id: uuid.UUID, error: str) -> None:
+        # drops whatever the stage that failed left in the session
+        await self.db.rollback()
+        await crud_sample.update_status(
+            self.db, id=sample_id, status=Status.FAILED, parsing_error=error
+        )
+
+    async def get_processable(self, sample_id: uuid.UUID) -> SampleDb:
         sample: Optional[SampleDb] = await crud_sample.get(self.db, id=sample_id)
         if not sample:
             raise BadSampleError(f"Unable to find sample by sample id [{sample_id=}]")
-
         if not sample.file_name:
             raise BadSampleError(f"Sample has no csv file associated [{sample_id=}]")
+        return sample
 
+    async def commit_stage(
+        self, sample: SampleDb, sample_update: SampleDbUpdate, timer: StageTimer
+    ) -> None:
+        with timer.stage("db_commit"):
+            await self.db.flush()
+        sample_update.stages = dict(timer.stages)
         await crud_sample.update(
-            db=self.db,
-            db_obj=sample,
-            obj_in=SampleDbUpdate(status=Status.PARSING),
-            commit=True,
+            db=self.db, db_obj=sample, obj_in=sample_update, flush=False, commit=True
         )
 
-        try:
-            df: pd.DataFrame = self.read_csv(sample.file_name)
-        except ParsingCsvError as e:
-            await crud_sample.update(
-                db=self.db,
-                db_obj=sample,
-                obj_in=SampleDbUpdate(status=Status.FAILED, parsing_error=str(e)),
-                commit=True,
-            )
-            return SampleDbRead.parse_obj(sample)
-
-        await crud_sample.update(
-            db=self.db,
-            db_obj=sample,
-            obj_in=SampleDbUpdate(status=Status.PROCESSING),
-            commit=True,
+    def resume_timer(self, sample: SampleDb) -> StageTimer:
+        timer: StageTimer = StageTimer()
+        timer.merge(
+            {
+                name: StageMetrics.parse_obj(metrics)
+                for name, metrics in (sample.stages or {}).items()
+            }
         )
+        return timer
+
+    async def reuse_results(
+        self,
+        sample: SampleDb,
+        source: SampleDb,
+        content_hash: str,
+        timer: Optional[StageTimer] = None,
+    ) -> SampleRead:
+        logger.info(f"Reusing results [{sample.id=}, {source.id=}, {content_hash=}]")
+        timer = timer or StageTimer()
         summary_statistics: SummaryStatisticsDbRead = (
-            await self.summary_statistics_svc.create(df=df, sample_id=sample.id)
+            await self.summary_statistics_svc.create_from_report(
+                report=Report.parse_obj(source.summary_statistics.report),
+                sample=sample,
+                commit=False,
+            )
         )
-
-        await crud_sample.update(
-            db=self.db,
-            db_obj=sample,
-            obj_in=SampleDbUpdate(status=Status.RENDERING),
-            commit=True,
+        visualization: VisualizationRead = (
+            await self.visualization_svc.create_from_plots(
+                plots=source.visualization.plots, sample=sample, commit=False
+            )
         )
-        visualization: VisualizationRead = await self.visualization_svc.create(
-            df=df, sample_id=sample.id
+        await self.commit_stage(
+            sample,
+            SampleDbUpdate(
+                status=Status.DONE,
+                content_hash=content_hash,
+                source_sample_id=source.id,
+            ),
+            timer,
         )
 
         sample_read: SampleRead = SampleRead(
@@ -127,51 +324,344 @@ class SampleService(BaseService):
             summary_statistics=summary_statistics,
             visualization=visualization,
         )
-        await crud_sample.update(
-            db=self.db,
-            db_obj=sample,
-            obj_in=SampleDbUpdate(status=Status.DONE),
-            commit=True,
-        )
         return sample_read
 
-    def read_csv(self, sample_file_name: str) -> pd.DataFrame:
-        url: str = s3_csv_url(sample_file_name)
-        dtypes: dict[str, str] = {
-            "review_time": "int",
-            "merge_time": "int",
-            "date": "str",
-            "team": "str",
-        }
-        usecols: list[str] = ["review_time", "merge_time", "team", "date"]
-        parse_dates: list[str] = ["date"]
+    async def load_state(
+        self, sample: SampleDb, timer: Optional[StageTimer] = None
+    ) -> ReportAccumulator:
+        timer = timer or StageTimer()
+        accumulator: Optional[ReportAccumulator] = self.read_state(sample, timer)
+        if accumulator is None:
+            lineage: List[SampleDb] = await crud_sample.get_lineage(self.db, sample)
+            accumulator = self.accumulate(lineage, timer)
+        return accumulator
+
+    def read_state(
+        self, sample: SampleDb, timer: Optional[StageTimer] = None
+    ) -> Optional[ReportAccumulator]:
+        timer = timer or StageTimer()
+        file_name: str = cast(str, sample.file_name)
+        with timer.stage("download"):
+            data: Optional[bytes] = s3_download_to_memory(
+                state_file_name(file_name), bucket=settings.S3_CSVS_BUCKET_NAME
+            )
+        if data:
+            try:
+                return ReportAccumulator.loads(data)
+            except ValueError as e:
+                logger.warning(f"Ignoring statistics state [{file_name=}]: {e}")
+        return None
+
+    def accumulate(
+        self, lineage: List[SampleDb], timer: Optional[StageTimer] = None
+    ) -> ReportAccumulator:
+        timer = timer or StageTimer()
+        accumulator: ReportAccumulator = ReportAccumulator()
+        for sample in lineage:
+            self.ingest(sample, consumers=[], timer=timer, accumulator=accumulator)
+        return accumulator
+
+    def save_state(
+        self,
+        sample: SampleDb,
+        accumulator: ReportAccumulator,
+        timer: Optional[StageTimer] = None,
+    ) -> None:
+        timer = timer or StageTimer()
+        file_name: str = cast(str, sample.file_name)
+        with timer.stage("state") as metrics:
+            data: bytes = accumulator.dumps()
+            metrics.num_bytes = len(data)
+            try:
+                s3_upload_file_from_memory(
+                    data,
+                    file_name=state_file_name(file_name),
+                    bucket=settings.S3_CSVS_BUCKET_NAME,
+                )
+            except Exception as e:
+                # the state is recomputed when an upload appends to the sample
+                logger.warning(f"Unable to save statistics state [{file_name=}]: {e}")
+
+    async def get_plot_url(self, sample_id: uuid.UUID, name: str) -> str:
+        spec: Optional[FigureSpec] = FIGURE_SPECS_BY_NAME.get(name)
+        sample: Optional[SampleDb] = await crud_sample.get(self.db, id=sample_id)
+        if not spec or not sample:
+            raise HTTP404NotFoundException(
+                response=HTTP404NotFoundResponse(
+                    content=HTTP404NotFoundContent(
+                        msg=f"Unable to find plot [{sample_id=}, {name=}]"
+                    )
+                )
+            )
+        if sample.status != Status.DONE:
+            raise HTTP409ConflictException(
+                response=HTTP409ConflictResponse(
+                    content=HTTP409ConflictContent(
+                        msg=f"Sample is not processed yet [{sample_id=}]"
+                    )
+                )
+            )
+        source: Optional[SampleDb] = sample
+        if sample.source_sample_id:
+            # reused results, the plots are those of the source sample
+            source = await crud_sample.get(self.db, id=sample.source_sample_id)
+        if not source:
+            raise HTTP404NotFoundException(
+                response=HTTP404NotFoundResponse(
+                    content=HTTP404NotFoundContent(
+                        msg=(
+                            "Unable to find the sample the plots come from "
+                            f"[{sample_id=}, {sample.source_sample_id=}]"
+                        )
+                    )
+                )
+            )
+
+        file_name: str = plot_file_name(cast(str, source.file_name), spec.name)
+        # the figure data is only loaded when the plot is not stored yet
+        load: Callable[[], Awaitable[FigureData]] = partial(
+            self.load_figure_data, source
+        )
+        await self.visualization_svc.render_lazily(spec, file_name, load=load)
+        return self.visualization_svc.gen_plot_url(file_name)
+
+    async def load_figure_data(self, sample: SampleDb) -> FigureData:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        accumulator: Optional[ReportAccumulator] = await loop.run_in_executor(
+            None, self.read_state, sample
+        )
+        if accumulator is None:
+            # the rendering may outlive the session of the request
+            async with async_session_factory() as db:
+                lineage: List[SampleDb] = await crud_sample.get_lineage(db, sample)
+            accumulator = await loop.run_in_executor(None, self.accumulate, lineage)
+        return await loop.run_in_executor(None, get_state_figure_data, accumulator)
+
+    async def get_cache_stats(self) -> SampleCacheStats:
+        hits, misses = await crud_sample.get_content_cache_stats(self.db)
+        return SampleCacheStats(hits=hits, misses=misses)
+
+    async def get_client_usage(
+        self, client: str, since: dt.datetime
+    ) -> Tuple[int, int]:
+        return await crud_sample.get_client_usage(self.db, client=client, since=since)
+
+    def ingest(
+        self,
+        sample: SampleDb,
+        consumers: List[ChunkConsumer],
+        timer: Optional[StageTimer] = None,
+        accumulator: Optional[ReportAccumulator] = None,
+    ) -> Optional[str]:
+        """Returns the content hash of the sample."""
+        timer = timer or StageTimer()
+        file_name: str = cast(str, sample.file_name)
+        if settings.COLUMNAR_CACHE_ENABLED and sample.content_hash:
+            # only samples ingested before (with a content hash) have a copy
+            with timer.stage("download"):
+                path: Optional[Path] = self.fetch_parquet(file_name)
+            if path:
+                if accumulator is not None:
+                    consumers = [TimedConsumer(accumulator, timer, "stats"), *consumers]
+                with timer.stage("parse") as metrics:
+                    metrics.num_rows = stream_parquet(
+                        path, consumers, chunk_rows=settings.CSV_CHUNK_ROWS
+                    )
+                    metrics.num_bytes = path.stat().st_size
+                INGESTED_ROWS.labels(source="parquet").inc(metrics.num_rows)
+                INGESTED_BYTES.labels(source="parquet").inc(metrics.num_bytes)
+                return sample.content_hash
+
+        digest: "hashlib._Hash" = hashlib.sha256()
+        if not settings.COLUMNAR_CACHE_ENABLED:
+            self.stream_csv(
+                file_name,
+                storage=sample.storage,
+                consumers=consumers,
+                digest=digest,
+                timer=timer,
+                accumulator=accumulator,
+            )
+            return digest.hexdigest()
+
+        sink: ParquetSink = ParquetSink()
+        self.stream_csv(
+            file_name,
+            storage=sample.storage,
+            consumers=[*consumers, TimedConsumer(sink, timer, "cache")],
+            digest=digest,
+            timer=timer,
+            accumulator=accumulator,
+        )
+        with sink.finish() as parquet, timer.stage("cache"):
+            try:
+                s3_upload_fileobj(
+                    parquet,
+                    file_name=parquet_file_name(file_name),
+                    bucket=settings.S3_CSVS_BUCKET_NAME,
+                )
+            except Exception as e:
+                # only a cache, the sample can still be processed
+                logger.warning(f"Unable to save columnar copy [{file_name=}]: {e}")
+        return digest.hexdigest()
+
+    def fetch_parquet(self, sample_file_name: str) -> Optional[Path]:
+        cache_dir: Path = Path(settings.COLUMNAR_CACHE_DIR)
+        path: Path = cache_dir / parquet_file_name(sample_file_name)
+        try:
+            # marks it as recently used
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
         try:
-            df: pd.DataFrame = pd.read_csv(
-                url,
-                parse_dates=parse_dates,
-                usecols=usecols,
-                header=0,
-                dtype=dtypes,
+            found: bool = s3_download_file(
+                parquet_file_name(sample_file_name),
+                bucket=settings.S3_CSVS_BUCKET_NAME,
+                path=path,
             )
+        except Exception as e:
+            logger.warning(f"Unable to fetch columnar copy [{sample_file_name=}]: {e}")
+            return None
+        if not found:
+            return None
+        evict_parquet_files(cache_dir, settings.COLUMNAR_CACHE_MAX_BYTES, keep=path)
+        return path
+
+    def load(
+        self, sample_file_name: str, columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        path: Optional[Path] = None
+        if settings.COLUMNAR_CACHE_ENABLED:
+            path = self.fetch_parquet(sample_file_name)
+        if path:
+            return read_parquet(path, columns=columns)
+        df: pd.DataFrame = self.read_csv(sample_file_name)
+        return df[columns] if columns else df
+
+    def read_csv(self, sample_file_name: str) -> pd.DataFrame:
+        collector: DataFrameCollector = DataFrameCollector()
+        self.stream_csv(sample_file_name, consumers=[collector])
+        return collector.result()
+
+    def stream_csv(
+        self,
+        sample_file_name: str,
+        consumers: Iterable[ChunkConsumer],
+        digest: Optional["hashlib._Hash"] = None,
+        timer: Optional[StageTimer] = None,
+        accumulator: Optional[ReportAccumulator] = None,
+        storage: Optional[StorageType] = None,
+    ) -> int:
+        timer = timer or StageTimer()
+        try:
+            with timer.stage("download"):
+                stream: Union[MappedFileReader, S3RangeReader] = self.open_csv(
+                    sample_file_name, storage=storage
+                )
         except Exception as e:
             raise ParsingCsvError(e)
 
-        return df
+        workers: Optional[StageTimer] = None
+        with stream, timer.stage("parse") as metrics:
+            downloaded: TimedReader = TimedReader(stream, timer, "download")
+            reader: ByteStream = downloaded
+            if digest is not None:
+                reader = HashingReader(reader, digest)
+            num_rows: int
+            if (
+                accumulator is not None
+                and settings.STATS_PARALLEL_WORKERS > 1
+                and stream.length > settings.STATS_PARTITION_BYTES
+            ):
+                with process_pool(settings.STATS_PARALLEL_WORKERS) as pool:
+                    num_rows, workers = stream_csv_partitioned(
+                        reader,
+                        accumulator,
+                        consumers,
+                        pool=pool,
+                        partition_bytes=settings.STATS_PARTITION_BYTES,
+                        max_pending=2 * settings.STATS_PARALLEL_WORKERS,
+                        chunk_rows=settings.CSV_CHUNK_ROWS,
+                    )
+            else:
+                if accumulator is not None:
+                    consumers = [TimedConsumer(accumulator, timer, "stats"), *consumers]
+                num_rows = stream_csv(
+                    reader,
+                    consumers,
+                    chunk_rows=settings.CSV_CHUNK_ROWS,
+                    chunk_bytes=settings.CSV_CHUNK_BYTES,
+                )
+            if isinstance(reader, HashingReader):
+                reader.drain()
+            metrics.num_rows = num_rows
+            # the download stage of `timer` adds up every csv ingested with it
+            metrics.num_bytes = downloaded.num_bytes
+        if workers is not None:
+            timer.merge(workers.stages)
+        INGESTED_ROWS.labels(source="csv").inc(num_rows)
+        INGESTED_BYTES.labels(source="csv").inc(metrics.num_bytes or 0)
+        return num_rows
+
+    def open_csv(
+        self, sample_file_name: str, storage: Optional[StorageType] = None
+    ) -> Union[MappedFileReader, S3RangeReader]:
+        """Memory mapped when tusd stored it on a filesystem this host shares."""
+        if storage == StorageType.S3:
+            return s3_open(sample_file_name, bucket=settings.S3_CSVS_BUCKET_NAME)
+        path: Optional[Path] = tusd_file_path(sample_file_name)
+        if path:
+            return MappedFileReader(path)
+        if storage == StorageType.FILE:
+            raise BadSampleError(
+                "Sample csv stored in a tusd filestore this host does not share "
+                f"[{sample_file_name=}, {settings.TUSD_FILESTORE_DIR=}]"
+            )
+        return s3_open(sample_file_name, bucket=settings.S3_CSVS_BUCKET_NAME)
 
     async def list(
         self,
         skip: Optional[int] = 0,
         limit: Optional[int] = 10,
         upload_id: Optional[uuid.UUID] = None,
+        cursor: Optional[str] = None,
+        include: Optional[List[SampleInclude]] = None,
     ) -> SampleReadListResponse:
+        """`skip` is kept for older clients, pages are walked with `cursor`."""
+        after: Optional[Cursor] = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError:
+                raise HTTP400BadRequestException(
+                    response=HTTP400BadRequestResponse(
+                        content=HTTP400BadRequestContent(
+                            msg=f"Invalid cursor [{cursor=}]"
+                        )
+                    )
+                )
+
+        # one extra row tells whether there is a next page
         samples: List[
             SampleDb
         ] = await crud_sample.get_multi_by_upload_id_with_relationships(
-            db=self.db, skip=skip, limit=limit, upload_id=upload_id
+            db=self.db,
+            skip=skip,
+            limit=limit + 1 if limit else None,
+            upload_id=upload_id,
+            after=after,
+            include=include,
         )
+        next_cursor: Optional[str] = None
+        if limit and len(samples) > limit:
+            samples = samples[:limit]
+            next_cursor = encode_cursor(samples[-1].created_at, samples[-1].id)
+
         sample_reads: List[SampleRead] = parse_obj_as(List[SampleRead], samples)
         sample_read_list_response: SampleReadListResponse = SampleReadListResponse(
-            sample_reads=sample_reads
+            sample_reads=sample_reads, next_cursor=next_cursor
         )
         return sample_read_list_response
 
@@ -1,15 +1,12 @@
 import logging
-import uuid
-from typing import Dict, List, Optional
+from typing import Dict, List
 
 import pandas as pd
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.crud.crud_sample import crud_sample
 from app.db.crud.crud_summary_statistics import crud_summary_statistics
 from app.db.session import get_db
-from app.error import BadSampleError
 from app.schemas.sample import SampleDb
 from app.schemas.summary_statistics import (
     DateInterval,
@@ -21,6 +18,7 @@ from app.schemas.summary_statistics import (
     SummaryStatisticsDbRead,
 )
 from app.services.base import BaseService
+from app.utils.accumulators import ReportAccumulator, grouped_mode
 
 logger: logging.Logger = logging.getLogger(__name__)
 
@@ -30,42 +28,27 @@ class SummaryStatisticsService(BaseService):
         super().__init__(db)
 
     async def create(
-        self, df: pd.DataFrame, sample_id: uuid.UUID
+        self, df: pd.DataFrame, sample: SampleDb, commit: bool = True
     ) -> SummaryStatisticsDbRead:
-        total_num_observations: int = self.get_total_num_observations(df)
-        teams: list = self.get_teams(df)
-        date_interval: DateInterval = self.get_date_interval(df)
-        stats: GroupStats = self.get_stats(df)
-        per_team: Dict[str, GroupStats] = self.get_per_team_stats(df)
-        num_prs_without_review: int = self.get_num_prs_without_review(df)
-        num_prs_without_ci: int = self.get_num_prs_without_ci(df)
-        num_missing_values: NumMissingValues = self.get_num_missing_values(df)
-
-        report: Report = Report(
-            total_num_observations=total_num_observations,
-            teams=teams,
-            date_interval=date_interval,
-            stats=stats,
-            per_team=per_team,
-            num_prs_without_review=num_prs_without_review,
-            num_prs_without_ci=num_prs_without_ci,
-            num_missing_values=num_missing_values,
+        report: Report = self.get_report(df)
+        return await self.create_from_report(
+            report=report, sample=sample, commit=commit
         )
 
+    async def create_from_report(
+        self, report: Report, sample: SampleDb, commit: bool = True
+    ) -> SummaryStatisticsDbRead:
         summary_statistics_db_create: SummaryStatisticsDbCreate = (
             SummaryStatisticsDbCreate(report=report)
         )
 
-        sample: Optional[SampleDb] = await crud_sample.get(db=self.db, id=sample_id)
-        if not sample:
-            raise BadSampleError(f"Unable to fetch sample [{sample_id=}]")
-
         summary_statistics_db: SummaryStatisticsDb = (
             await crud_summary_statistics.create(
                 db=self.db,
                 obj_in=summary_statistics_db_create,
                 sample=sample,
-                commit=True,
+                flush=commit,
+                commit=commit,
             )
         )
 
@@ -74,6 +57,13 @@ class SummaryStatisticsService(BaseService):
         )
         return summary_statistics_db_read
 
+    def get_report(self, df: pd.DataFrame) -> Report:
+        """Builds the whole report in a single pass over `df`. Equivalent to
+        combining all the `get_*` methods below, each one a full scan."""
+        accumulator: ReportAccumulator = ReportAccumulator()
+        accumulator.consume(df)
+        return accumulator.result()
+
     def get_total_num_observations(self, df: pd.DataFrame) -> int:
         return len(df)
 
@@ -88,7 +78,7 @@ class SummaryStatisticsService(BaseService):
 
     def get_stats(self, df: pd.DataFrame) -> GroupStats:
         sub: pd.DataFrame = df[["review_time", "merge_time"]].copy(deep=True)
-        sub["total_time"] = sub["review_time"] + sub["merge_time"]
+        sub["total_time"] = sub["review_time"].astype("int64") + sub["merge_time"]
         mean: pd.Series = sub.mean()
         mode: pd.Series = sub.mode()
         median: pd.Series = sub.median()
@@ -103,20 +93,18 @@ class SummaryStatisticsService(BaseService):
 
     def get_per_team_stats(self, df: pd.DataFrame) -> Dict[str, GroupStats]:
         sub: pd.DataFrame = df[["review_time", "merge_time", "team"]].copy(deep=True)
-        sub["total_time"] = sub["review_time"] + sub["merge_time"]
+        sub["total_time"] = sub["review_time"].astype("int64") + sub["merge_time"]
 
-        mean: pd.DataFrame = sub.groupby(by="team").mean()
+        mean: pd.DataFrame = sub.groupby(by="team", observed=True).mean()
         mean_t: pd.DataFrame = mean.transpose()
 
-        mode: pd.DataFrame = sub.groupby(by="team").agg(
-            lambda x: min(pd.Series.mode(x))
-        )
+        mode: pd.DataFrame = grouped_mode(sub, by="team")
         mode_t: pd.DataFrame = mode.transpose()
 
-        median: pd.DataFrame = sub.groupby(by="team").median()
+        median: pd.DataFrame = sub.groupby(by="team", observed=True).median()
         median_t: pd.DataFrame = median.transpose()
 
-        count: pd.Series[int] = sub.groupby(by="team").size()
+        count: pd.Series[int] = sub.groupby(by="team", observed=True).size()
 
         teams: List[str] = list(sub.team.unique())
 
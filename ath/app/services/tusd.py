@@ -1,19 +1,35 @@
+import datetime as dt
 import logging
+import uuid
+from pathlib import PurePath
+from typing import Optional, Union
 
+import pytz
 from fastapi import Depends
 from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import worker
-from app.core.exceptions import HTTP403ForbiddenException
+from app.core.config import Settings, get_settings
+from app.core.exceptions import HTTP400BadRequestException, HTTP403ForbiddenException
+from app.core.metrics import REJECTED_UPLOADS
 from app.db.session import get_db
 from app.enums.sample import Status
 from app.enums.tusd import HookName
-from app.schemas.http_errors import HTTP403ForbiddenContent, HTTP403ForbiddenResponse
+from app.error import BadSampleError
+from app.schemas.http_errors import (
+    HTTP400BadRequestContent,
+    HTTP400BadRequestResponse,
+    HTTP403ForbiddenContent,
+    HTTP403ForbiddenResponse,
+)
 from app.schemas.sample import SampleDbCreate, SampleDbRead, SampleDbUpdate
-from app.schemas.tusd import HookBody
+from app.schemas.tusd import FileStorage, HookBody, S3Storage
 from app.services.base import BaseService
 from app.services.sample import SampleService, get_sample_service
+from app.utils.tusd import upload_client, upload_rejection
+
+settings: Settings = get_settings()
 
 logger: logging.Logger = logging.getLogger(__name__)
 
@@ -24,12 +40,25 @@ class TusdService(BaseService):
         self.sample_svc: SampleService = sample_svc
 
     async def handle_notification(self, hook_body: HookBody, hook_name: HookName):
-        upload_id = hook_body.upload.metadata["upload_id"]
-
         if hook_name == HookName.PRE_CREATE:
+            client: str = await self.admit(hook_body)
+            upload_id = hook_body.upload.metadata["upload_id"]
+            parent_sample_id: Optional[uuid.UUID] = await self.get_parent_sample_id(
+                hook_body
+            )
             try:
                 await self.sample_svc.create(
-                    sample=SampleDbCreate(upload_id=upload_id, status=Status.UPLOADING)
+                    sample=SampleDbCreate(
+                        upload_id=upload_id,
+                        status=Status.UPLOADING,
+                        parent_sample_id=parent_sample_id,
+                        size=(
+                            None
+                            if hook_body.upload.size_is_deferred
+                            else hook_body.upload.size
+                        ),
+                        client=client,
+                    )
                 )
             except exc.IntegrityError:
                 logger.error(f"Duplicate upload id [{upload_id=}]")
@@ -42,16 +71,109 @@ class TusdService(BaseService):
                 )
 
         elif hook_name == HookName.POST_FINISH:
-            key: str = hook_body.upload.storage.key  # type: ignore
+            upload_id = hook_body.upload.metadata["upload_id"]
+            file_name: str = self.get_file_name(hook_body)
             sample_db_read: SampleDbRead = await self.sample_svc.update_by_upload_id(
-                upload_id=upload_id, sample_db_update=SampleDbUpdate(file_name=key)
+                upload_id=upload_id,
+                sample_db_update=SampleDbUpdate(
+                    file_name=file_name,
+                    storage=(
+                        hook_body.upload.storage.type
+                        if hook_body.upload.storage
+                        else None
+                    ),
+                ),
             )
 
             # run in the main thread
             # await self.sample_svc.process(sample_id=sample_db_read.id)
 
-            # run in a separate process
-            worker.process_sample(sample_id=sample_db_read.id)
+            # run in separate processes, a queued task per stage
+            size: Optional[int] = (
+                None if hook_body.upload.size_is_deferred else hook_body.upload.size
+            )
+            worker.enqueue_sample(sample_id=sample_db_read.id, size=size)
+
+    async def admit(self, hook_body: HookBody) -> str:
+        """Admission control of a new upload, returning the client it comes
+        from: what it declares is checked first (see `upload_rejection`), then
+        the quotas of its client (see `UPLOAD_CLIENT_MAX_ACTIVE` and
+        `UPLOAD_CLIENT_MAX_BYTES`), with a single query. Refused uploads are
+        answered right away and tusd never stores any of their bytes.
+
+        Quotas are soft: uploads created at the same time are checked against
+        the same usage."""
+        reason: Optional[str] = upload_rejection(hook_body.upload)
+        if reason:
+            logger.warning(f"Refused upload: {reason}")
+            REJECTED_UPLOADS.labels(reason="invalid").inc()
+            raise HTTP400BadRequestException(
+                response=HTTP400BadRequestResponse(
+                    content=HTTP400BadRequestContent(msg=reason)
+                )
+            )
+
+        client: str = upload_client(hook_body.http_request)
+        if (
+            settings.UPLOAD_CLIENT_MAX_ACTIVE is None
+            and settings.UPLOAD_CLIENT_MAX_BYTES is None
+        ):
+            return client
+        since: dt.datetime = dt.datetime.now(tz=pytz.utc) - dt.timedelta(
+            seconds=settings.UPLOAD_QUOTA_WINDOW
+        )
+        active, num_bytes = await self.sample_svc.get_client_usage(client, since)
+        size: int = 0 if hook_body.upload.size_is_deferred else hook_body.upload.size
+        if (
+            settings.UPLOAD_CLIENT_MAX_ACTIVE is not None
+            and active >= settings.UPLOAD_CLIENT_MAX_ACTIVE
+        ) or (
+            settings.UPLOAD_CLIENT_MAX_BYTES is not None
+            and num_bytes + size > settings.UPLOAD_CLIENT_MAX_BYTES
+        ):
+            logger.warning(
+                f"Upload quota exceeded [{client=}, {active=}, {num_bytes=}, {size=}]"
+            )
+            REJECTED_UPLOADS.labels(reason="quota").inc()
+            raise HTTP403ForbiddenException(
+                response=HTTP403ForbiddenResponse(
+                    content=HTTP403ForbiddenContent(
+                        msg=f"Upload quota exceeded [{client=}]"
+                    )
+                )
+            )
+        return client
+
+    def get_file_name(self, hook_body: HookBody) -> str:
+        """Name the csv of a finished upload is stored as: its S3 key, or the
+        name of its file in a tusd filestore, which the workers read in place
+        when they share it (see `TUSD_FILESTORE_DIR`)."""
+        storage: Optional[Union[FileStorage, S3Storage]] = hook_body.upload.storage
+        if isinstance(storage, FileStorage):
+            return PurePath(storage.path).name
+        if isinstance(storage, S3Storage):
+            return storage.key
+        return hook_body.upload.id
+
+    async def get_parent_sample_id(self, hook_body: HookBody) -> Optional[uuid.UUID]:
+        """Sample an upload appends its rows to, given as the `parent_sample_id`
+        metadata. Uploads without it are new samples."""
+        value: Optional[str] = hook_body.upload.metadata.get("parent_sample_id")
+        if not value:
+            return None
+        try:
+            parent_sample_id: uuid.UUID = uuid.UUID(value)
+            await self.sample_svc.get(sample_id=parent_sample_id)
+        except (ValueError, BadSampleError):
+            logger.error(f"Unknown parent sample [{value=}]")
+            raise HTTP400BadRequestException(
+                response=HTTP400BadRequestResponse(
+                    content=HTTP400BadRequestContent(
+                        msg=f"Unknown parent sample [{value=}]"
+                    )
+                )
+            )
+        return parent_sample_id
 
 
 # Facade #############################
@@ -1,76 +1,154 @@
+import asyncio
 import io
 import logging
 import uuid
-from typing import Any, List, Literal, Optional, cast
+from colorsys import rgb_to_hls
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    cast,
+)
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import seaborn as sns
 from fastapi import Depends
+from matplotlib import rcParams
 from matplotlib.axes import Axes
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_hex
 from matplotlib.figure import Figure
 from pydantic import parse_obj_as
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import Settings, get_settings
-from app.db.crud.crud_sample import crud_sample
 from app.db.crud.crud_visualization import crud_visualization
 from app.db.session import get_db
-from app.error import BadSampleError
-from app.schemas.plots import PlotDb, PlotDbRead
+from app.schemas.plots import PlotBase, PlotDb, PlotDbCreate, PlotDbRead
 from app.schemas.sample import SampleDb
 from app.schemas.visualization import (
+    FigureData,
     NamedFigure,
+    RenderedFigure,
     VisualizationDb,
     VisualizationDbCreate,
     VisualizationRead,
 )
 from app.services.base import BaseService
-from app.utils.s3 import s3_upload_file_from_memory
+from app.utils.accumulators import FIGURE_TIME_COLUMNS, GroupState, ReportAccumulator
+from app.utils.distributions import (
+    BinnedDistribution,
+    bin_distribution,
+    binned_kde,
+    binned_quantiles,
+    binned_whiskers,
+)
+from app.utils.pool import process_pool
+from app.utils.profiling import StageTimer
+from app.utils.s3 import (
+    s3_object_exists,
+    s3_upload_file_from_memory,
+    s3_upload_files_from_memory,
+)
 
 logger: logging.Logger = logging.getLogger(__name__)
 settings: Settings = get_settings()
 
+# the only columns of a sample the figures are built from
+FIGURE_COLUMNS: List[str] = ["review_time", "merge_time", "team"]
+
+# plots being rendered on demand in this process, by file name
+_lazy_renderings: Dict[str, asyncio.Future] = {}
+
+
+def plot_file_name(sample_file_name: str, figure_name: str) -> str:
+    return (
+        f"{sample_file_name}"
+        f"/{figure_name}"
+        f".{settings.VISUALIZATION_RENDERING_FORMAT}"
+    )
+
 
 class VisualizationService(BaseService):
     def __init__(self, db: AsyncSession) -> None:
         super().__init__(db)
 
-    async def create(self, df: pd.DataFrame, sample_id: uuid.UUID) -> VisualizationRead:
-        sample: Optional[SampleDb] = await crud_sample.get(db=self.db, id=sample_id)
-        if not sample:
-            raise BadSampleError(f"Unable to fetch sample by sample id [{sample_id=}]")
-
-        named_figures: List[NamedFigure] = self.create_named_figures(df)
+    async def create(
+        self,
+        data: Optional[FigureData],
+        sample: SampleDb,
+        commit: bool = True,
+        timer: Optional[StageTimer] = None,
+    ) -> VisualizationRead:
+        """Renders and uploads every figure of the sample, out of `data`, or,
+        with `VISUALIZATION_LAZY_RENDERING`, only links the sample to plots
+        rendered on their first request (see `render_lazily`), in which case
+        `data` is not used."""
+        sample_file_name: str = cast(str, sample.file_name)
+        if settings.VISUALIZATION_LAZY_RENDERING:
+            plots: List[PlotDbCreate] = [
+                PlotDbCreate(
+                    file_name=plot_file_name(sample_file_name, spec.name),
+                    url=self.gen_lazy_plot_url(sample_id=sample.id, name=spec.name),
+                )
+                for spec in FIGURE_SPECS
+            ]
+            return await self.create_from_plots(
+                plots=plots, sample=sample, commit=commit
+            )
 
-        self.upload_named_figures_to_s3(
-            named_figures=named_figures, sample_file_name=cast(str, sample.file_name)
+        timer = timer or StageTimer()
+        rendered_figures: List[RenderedFigure] = self.render_named_figures(
+            cast(FigureData, data)
         )
+        for rendered_figure in rendered_figures:
+            timer.merge(rendered_figure.stages)
 
-        def get_plot_file_name(named_figure_name: str) -> str:
-            return (
-                f"{sample.file_name}"  # type: ignore
-                f"/{named_figure_name}"
-                f".{settings.VISUALIZATION_RENDERING_FORMAT}"
+        with timer.stage("upload") as metrics:
+            self.upload_rendered_figures_to_s3(
+                rendered_figures=rendered_figures, sample_file_name=sample_file_name
             )
-
-        plots: List[PlotDb] = [
-            PlotDb(
-                file_name=get_plot_file_name(named_figure.name),
-                url=self.gen_plot_url(file_name=get_plot_file_name(named_figure.name)),
+            metrics.num_bytes = sum(len(figure.data) for figure in rendered_figures)
+
+        plots = [
+            PlotDbCreate(
+                file_name=plot_file_name(sample_file_name, rendered_figure.name),
+                url=self.gen_plot_url(
+                    file_name=plot_file_name(sample_file_name, rendered_figure.name)
+                ),
             )
-            for named_figure in named_figures
+            for rendered_figure in rendered_figures
+        ]
+        return await self.create_from_plots(plots=plots, sample=sample, commit=commit)
+
+    async def create_from_plots(
+        self, plots: Sequence[PlotBase], sample: SampleDb, commit: bool = True
+    ) -> VisualizationRead:
+        """Links `sample` to already rendered plots. The plot rows are new but
+        they point to the same S3 objects, which are never deleted."""
+        plots_db: List[PlotDb] = [
+            PlotDb(id=uuid.uuid4(), file_name=plot.file_name, url=plot.url)
+            for plot in plots
         ]
         visualization_db: VisualizationDb = await crud_visualization.create_with_plots(
             self.db,
             obj_in=VisualizationDbCreate(),
             sample=sample,
-            plots=plots,
-            commit=True,
+            plots=plots_db,
+            flush=commit,
+            commit=commit,
         )
 
-        plots_db_read: List[PlotDbRead] = parse_obj_as(List[PlotDbRead], plots)
+        plots_db_read: List[PlotDbRead] = parse_obj_as(List[PlotDbRead], plots_db)
 
         visualization_read: VisualizationRead = VisualizationRead(
             id=visualization_db.id, plots=plots_db_read
@@ -87,97 +165,160 @@ class VisualizationService(BaseService):
         )
         return url
 
-    def create_named_figures(self, df: pd.DataFrame) -> List[NamedFigure]:
-        mean_time_with_outliers_stacked_bar_plotfig: NamedFigure = (
-            self.create_mean_time_stacked_bar_fig(df)
-        )
-        mean_time_no_outliers_stacked_bar_plotfig: NamedFigure = (
-            self.create_mean_time_stacked_bar_fig(df, include_outliers=False)
-        )
-        num_prs_by_team_pie_chart_plotfig: NamedFigure = (
-            self.create_num_prs_by_team_pie_chart_fig(df)
-        )
-        num_prs_by_team_no_outliers_pie_chart_plotfig: NamedFigure = (
-            self.create_num_prs_by_team_pie_chart_fig(df, include_outliers=False)
-        )
-        review_time_distribution_violin_plotfig: NamedFigure = (
-            self.create_time_distribution_violin_fig(df, column="review_time")
-        )
-        merge_time_distribution_violin_plotfig: NamedFigure = (
-            self.create_time_distribution_violin_fig(df, column="merge_time")
+    def gen_lazy_plot_url(self, sample_id: uuid.UUID, name: str) -> str:
+        """Api endpoint rendering the plot, if needed, and redirecting to it."""
+        url: str = (
+            f"http://"
+            f"{settings.API_HOST_EXT}"
+            f":{settings.API_PORT_EXT}"
+            f"{settings.API_V1_STR}"
+            f"/samples/{sample_id}/plots/{name}"
         )
-        review_time_distribution_no_outliers_violin_plotfig: NamedFigure = (
-            self.create_time_distribution_violin_fig(
-                df, column="review_time", include_outliers=False
+        return url
+
+    async def render_lazily(
+        self,
+        spec: "FigureSpec",
+        file_name: str,
+        load: Callable[[], Awaitable[FigureData]],
+    ) -> None:
+        """Renders the `spec` figure of the data returned by `load` and stores
+        it as `file_name`, unless it already is, in which case `load` is not
+        called. Concurrent calls for the same plot in this process wait for a
+        single rendering, which outlives the call that started it, so `load`
+        must not use the session of a request. Other api processes may render
+        the same plot at the same time, storing the same file."""
+        rendering: Optional[asyncio.Future] = _lazy_renderings.get(file_name)
+        if rendering is None:
+            rendering = asyncio.ensure_future(
+                self._render_lazily(spec, file_name, load)
             )
-        )
-        merge_time_distribution_no_outliers_violin_plotfig: NamedFigure = (
-            self.create_time_distribution_violin_fig(
-                df, column="merge_time", include_outliers=False
+            _lazy_renderings[file_name] = rendering
+            rendering.add_done_callback(lambda _: _lazy_renderings.pop(file_name, None))
+        # a waiter going away must not cancel the rendering for the others
+        await asyncio.shield(rendering)
+
+    async def _render_lazily(
+        self,
+        spec: "FigureSpec",
+        file_name: str,
+        load: Callable[[], Awaitable[FigureData]],
+    ) -> None:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        if await loop.run_in_executor(
+            None, s3_object_exists, file_name, settings.S3_PLOTS_BUCKET_NAME
+        ):
+            return
+
+        logger.info(f"Rendering plot on demand [{file_name=}]")
+        data: FigureData = await load()
+        rendered_figure: RenderedFigure
+        if settings.VISUALIZATION_RENDERING_WORKERS > 1:
+            with process_pool(settings.VISUALIZATION_RENDERING_WORKERS) as pool:
+                rendered_figure = await loop.run_in_executor(
+                    pool, render_figure, spec, select_figure_data(data, spec)
+                )
+        else:
+            rendered_figure = await loop.run_in_executor(
+                None, render_figure, spec, data
             )
+        await loop.run_in_executor(
+            None,
+            s3_upload_file_from_memory,
+            rendered_figure.data,
+            file_name,
+            settings.S3_PLOTS_BUCKET_NAME,
         )
 
+    def create_named_figures(self, df: pd.DataFrame) -> List[NamedFigure]:
+        data: FigureData = get_figure_data(df)
         named_figures: List[NamedFigure] = [
-            mean_time_with_outliers_stacked_bar_plotfig,
-            mean_time_no_outliers_stacked_bar_plotfig,
-            num_prs_by_team_pie_chart_plotfig,
-            num_prs_by_team_no_outliers_pie_chart_plotfig,
-            review_time_distribution_violin_plotfig,
-            merge_time_distribution_violin_plotfig,
-            review_time_distribution_no_outliers_violin_plotfig,
-            merge_time_distribution_no_outliers_violin_plotfig,
+            getattr(self, spec.builder)(data, **spec.kwargs) for spec in FIGURE_SPECS
         ]
         return named_figures
 
+    def render_named_figures(self, data: FigureData) -> List[RenderedFigure]:
+        """Builds and rasterizes every figure, spreading them across a pool of
+        `VISUALIZATION_RENDERING_WORKERS` processes, so a sample takes about as
+        long as its slowest figure. Each worker is only sent the data its
+        figure is drawn from."""
+        num_workers: int = min(
+            settings.VISUALIZATION_RENDERING_WORKERS, len(FIGURE_SPECS)
+        )
+        if num_workers <= 1:
+            return [render_figure(spec, data) for spec in FIGURE_SPECS]
+
+        # the violins of a column, with and without outliers, share their rows
+        parts: Dict[Optional[str], FigureData] = {
+            spec.kwargs.get("column"): select_figure_data(data, spec)
+            for spec in FIGURE_SPECS
+        }
+        with process_pool(num_workers) as pool:
+            futures: List[Future] = [
+                pool.submit(render_figure, spec, parts[spec.kwargs.get("column")])
+                for spec in FIGURE_SPECS
+            ]
+            return [future.result() for future in futures]
+
     def upload_named_figures_to_s3(
         self, named_figures: List[NamedFigure], sample_file_name: str
     ) -> None:
-        for named_figure in named_figures:
-            fig_data: bytes = self.render_fig_to_memory(named_figure.figure)
-            plot_name: str = (
-                f"{sample_file_name}"
-                f"/{named_figure.name}"
-                f".{settings.VISUALIZATION_RENDERING_FORMAT}"
+        rendered_figures: List[RenderedFigure] = [
+            RenderedFigure(
+                name=named_figure.name,
+                data=self.render_fig_to_memory(named_figure.figure),
             )
-            # self.s3_upload_file_from_memory(
-            #     fig_data, plot_name, settings.S3_PLOTS_BUCKET_NAME
-            # )
-            s3_upload_file_from_memory(
-                fig_data, plot_name, settings.S3_PLOTS_BUCKET_NAME
+            for named_figure in named_figures
+        ]
+        for named_figure in named_figures:
+            self.release_figure(named_figure.figure)
+        self.upload_rendered_figures_to_s3(rendered_figures, sample_file_name)
+
+    def upload_rendered_figures_to_s3(
+        self, rendered_figures: List[RenderedFigure], sample_file_name: str
+    ) -> None:
+        files: List[Tuple[bytes, str]] = [
+            (
+                rendered_figure.data,
+                plot_file_name(sample_file_name, rendered_figure.name),
             )
+            for rendered_figure in rendered_figures
+        ]
+        s3_upload_files_from_memory(files, settings.S3_PLOTS_BUCKET_NAME)
 
     def create_mean_time_stacked_bar_fig(
-        self, df: pd.DataFrame, include_outliers=True
+        self, data: FigureData, include_outliers=True
     ) -> NamedFigure:
         title = "Mean review and merge time by team"
         outlier_token = "with_outliers" if include_outliers else "no_outliers"
         filename: str = f"mean_time_{outlier_token}_stacked_bar_plot"
-
-        sub: pd.DataFrame = df[["review_time", "merge_time", "team"]]
         if not include_outliers:
             title += "\nexcluding unreviewed and non-CI PRs"
-            sub = sub[(sub.review_time != 0) & (sub.merge_time != 0)]
 
-        mean_df: pd.DataFrame = sub.groupby(by="team").mean()
-        bar_plot: Axes = mean_df.plot(kind="bar", stacked=True, title=title)
+        mean_df: pd.DataFrame = data.per_team[include_outliers][
+            ["review_time", "merge_time"]
+        ]
+        fig: Figure = new_figure(simple=True)
+        bar_plot: Axes = mean_df.plot(
+            kind="bar", stacked=True, title=title, ax=fig.add_subplot()
+        )
         bar_plot.set_xticklabels(bar_plot.get_xticklabels(), rotation=35, ha="right")
         bar_plot.set_ylabel("time (s)")
-        fig: Figure = bar_plot.get_figure()
-        fig.tight_layout()
+        layout_figure(fig, simple=True)
         return NamedFigure(figure=fig, name=filename)
 
     def create_num_prs_by_team_pie_chart_fig(
-        self, df: pd.DataFrame, include_outliers=True
+        self, data: FigureData, include_outliers=True
     ) -> NamedFigure:
         title = "Number of PRs by team"
         outlier_token = "with_outliers" if include_outliers else "no_outliers"
         filename: str = f"num_prs_by_team_{outlier_token}_pie_chart_plot"
-        sub = df
         if not include_outliers:
             title += "\nexcluding unreviewed and non-CI PRs"
-            sub = df[(df.review_time != 0) & (df.merge_time != 0)]
-        num_prs: pd.Series[int] = sub.groupby(by="team").size()
-        fig: Figure = plt.figure()
+        num_prs: pd.Series[int] = data.per_team[include_outliers]["num_prs"].rename(
+            None
+        )
+        fig: Figure = new_figure(simple=True)
 
         def func(pct: int, vals):
             # FIXME: I should directly extract the number of PRs instead of computing it
@@ -185,14 +326,18 @@ class VisualizationService(BaseService):
             return f"{pct:.1f}%\n({absolute:d} PRs)"
 
         num_prs.plot(
-            kind="pie", y="team", title=title, autopct=lambda pct: func(pct, num_prs)
+            kind="pie",
+            y="team",
+            title=title,
+            autopct=lambda pct: func(pct, num_prs),
+            ax=fig.add_subplot(),
         )
-        fig.tight_layout()
+        layout_figure(fig, simple=True)
         return NamedFigure(figure=fig, name=filename)
 
     def create_time_distribution_violin_fig(
         self,
-        df: pd.DataFrame,
+        data: FigureData,
         column: Literal["review_time", "merge_time"],
         include_outliers=True,
     ) -> NamedFigure:
@@ -200,19 +345,30 @@ class VisualizationService(BaseService):
         title += " time distribution by team"
         outlier_token = "with_outliers" if include_outliers else "no_outliers"
         filename: str = f"{column}_distribution_{outlier_token}_violin_plot"
-        sub = df
         if not include_outliers:
             title += "\nexcluding unreviewed and non-CI PRs"
-            sub = df[(df.review_time != 0) & (df.merge_time != 0)]
 
-        fig: Figure = plt.figure()
-        sub = sub[(sub.review_time != 0) & (sub.merge_time != 0)]
-        violin_plot = sns.violinplot(data=sub, y=column, x="team", cut=0)
+        fig: Figure = new_figure()
+        # zero times squash the distributions, they are left out either way
+        violin_plot: Axes = fig.add_subplot()
+        if data.distributions is not None:
+            draw_binned_violins(violin_plot, data.distributions[column])
+            violin_plot.set_xlabel("team")
+        else:
+            sns.violinplot(
+                data=data.without_outliers, y=column, x="team", cut=0, ax=violin_plot
+            )
         violin_plot.set_title(title)
         violin_plot.set_ylabel("time (s)")
-        fig.tight_layout()
+        layout_figure(fig)
         return NamedFigure(figure=fig, name=filename)
 
+    def release_figure(self, fig: Figure) -> None:
+        """Drops the artists of a rendered figure right away. The figure itself
+        is out of pyplot's registry (see `new_figure`), so nothing keeps it
+        alive once its builder returns."""
+        fig.clear()
+
     def render_fig_to_memory(self, fig: Figure) -> bytes:
         buf: io.BytesIO = io.BytesIO()
         fig.savefig(buf, format=f"{settings.VISUALIZATION_RENDERING_FORMAT}")
@@ -237,6 +393,328 @@ class VisualizationService(BaseService):
     #         client.upload_fileobj(f, bucket, file_name)
 
 
+class FigureSpec(NamedTuple):
+    name: str
+    """Name of the figure, as set by its builder, and of the plot file."""
+
+    builder: str
+    """Name of the `VisualizationService` method that builds the figure."""
+
+    kwargs: Dict[str, Any] = {}
+
+
+FIGURE_SPECS: List[FigureSpec] = [
+    FigureSpec(
+        "mean_time_with_outliers_stacked_bar_plot",
+        "create_mean_time_stacked_bar_fig",
+    ),
+    FigureSpec(
+        "mean_time_no_outliers_stacked_bar_plot",
+        "create_mean_time_stacked_bar_fig",
+        {"include_outliers": False},
+    ),
+    FigureSpec(
+        "num_prs_by_team_with_outliers_pie_chart_plot",
+        "create_num_prs_by_team_pie_chart_fig",
+    ),
+    FigureSpec(
+        "num_prs_by_team_no_outliers_pie_chart_plot",
+        "create_num_prs_by_team_pie_chart_fig",
+        {"include_outliers": False},
+    ),
+    FigureSpec(
+        "review_time_distribution_with_outliers_violin_plot",
+        "create_time_distribution_violin_fig",
+        {"column": "review_time"},
+    ),
+    FigureSpec(
+        "merge_time_distribution_with_outliers_violin_plot",
+        "create_time_distribution_violin_fig",
+        {"column": "merge_time"},
+    ),
+    FigureSpec(
+        "review_time_distribution_no_outliers_violin_plot",
+        "create_time_distribution_violin_fig",
+        {"column": "review_time", "include_outliers": False},
+    ),
+    FigureSpec(
+        "merge_time_distribution_no_outliers_violin_plot",
+        "create_time_distribution_violin_fig",
+        {"column": "merge_time", "include_outliers": False},
+    ),
+]
+FIGURE_SPECS_BY_NAME: Dict[str, FigureSpec] = {spec.name: spec for spec in FIGURE_SPECS}
+
+
+def new_figure(simple: bool = False) -> Figure:
+    """Figure drawn on its own Agg canvas, out of pyplot's registry of figures,
+    so nothing keeps it alive once rendered. With
+    `VISUALIZATION_SIMPLE_RENDERING`, `simple` figures (bars, pies) are drawn at
+    the lower `VISUALIZATION_SIMPLE_DPI`."""
+    dpi: Optional[float] = None
+    if simple and settings.VISUALIZATION_SIMPLE_RENDERING:
+        dpi = settings.VISUALIZATION_SIMPLE_DPI
+    fig: Figure = Figure(dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def layout_figure(fig: Figure, simple: bool = False) -> None:
+    """Fits the axes, labels and titles in the figure. `tight_layout` draws the
+    whole figure once more to measure them, with
+    `VISUALIZATION_SIMPLE_RENDERING` `simple` figures get fixed margins
+    instead."""
+    if simple and settings.VISUALIZATION_SIMPLE_RENDERING:
+        fig.subplots_adjust(left=0.16, right=0.95, bottom=0.22, top=0.86)
+        return
+    fig.tight_layout()
+
+
+def aggregate_per_team(rows: pd.DataFrame) -> pd.DataFrame:
+    return rows.groupby(by="team", observed=True).agg(
+        review_time=("review_time", "mean"),
+        merge_time=("merge_time", "mean"),
+        num_prs=("review_time", "size"),
+    )
+
+
+def get_figure_data(df: pd.DataFrame) -> FigureData:
+    """Everything the figures are drawn from, in a single pass over the figure
+    columns of `df`: one mask of the outliers, i.e. unreviewed or non-CI PRs,
+    and one groupby per variant. With `VISUALIZATION_FAST_DISTRIBUTIONS` the
+    rows the violins are drawn from are reduced to histograms per team."""
+    sub: pd.DataFrame = df[FIGURE_COLUMNS]
+    without_outliers: pd.DataFrame = sub[(sub.review_time != 0) & (sub.merge_time != 0)]
+    if settings.VISUALIZATION_FAST_DISTRIBUTIONS:
+        return FigureData(
+            per_team={
+                True: aggregate_per_team(sub),
+                False: aggregate_per_team(without_outliers),
+            },
+            num_rows=len(sub),
+            distributions={
+                column: bin_distribution(
+                    without_outliers[column],
+                    without_outliers["team"],
+                    bins=settings.VISUALIZATION_DISTRIBUTION_BINS,
+                )
+                for column in ("review_time", "merge_time")
+            },
+        )
+
+    return FigureData(
+        per_team={
+            True: aggregate_per_team(sub),
+            False: aggregate_per_team(without_outliers),
+        },
+        num_rows=len(sub),
+        without_outliers=without_outliers,
+    )
+
+
+def get_state_figure_data(accumulator: ReportAccumulator) -> FigureData:
+    """`get_figure_data` of every row merged into `accumulator`, out of its per
+    team states: the means and sizes are kept as moments and the violins only
+    depend on the values of each team, kept as histograms. Drawing the figures
+    of a sample neither reads its rows nor, when it appends to others, theirs,
+    and holds at most `VISUALIZATION_VIOLIN_MAX_ROWS` rows per team.
+    """
+    accumulator.flush()
+    per_team: Dict[bool, pd.DataFrame] = {
+        True: state_per_team(cast(GroupState, accumulator.per_team)),
+        False: state_per_team(cast(GroupState, accumulator.without_outliers)),
+    }
+    histograms: Dict[str, pd.Series] = cast(
+        GroupState, accumulator.without_outliers
+    ).histograms
+    # every team gets a violin slot, as the categorical team column of the rows
+    teams: List[str] = sorted(accumulator.teams)
+    if settings.VISUALIZATION_FAST_DISTRIBUTIONS:
+        return FigureData(
+            per_team=per_team,
+            num_rows=accumulator.num_observations,
+            distributions={
+                column: bin_distribution(
+                    histogram_values(histograms[column]),
+                    histogram_teams(histograms[column], teams),
+                    bins=settings.VISUALIZATION_DISTRIBUTION_BINS,
+                    weights=histograms[column].to_numpy(),
+                )
+                for column in FIGURE_TIME_COLUMNS
+            },
+        )
+
+    # one row per value of a column, the violins of a column skip the others
+    rng: np.random.Generator = np.random.default_rng(0)
+    without_outliers: pd.DataFrame = pd.concat(
+        [
+            histogram_rows(column, histogram, teams, rng)
+            for column, histogram in histograms.items()
+        ],
+        ignore_index=True,
+    )
+    return FigureData(
+        per_team=per_team,
+        num_rows=accumulator.num_observations,
+        without_outliers=without_outliers,
+    )
+
+
+def state_per_team(state: GroupState) -> pd.DataFrame:
+    """`aggregate_per_team` of the rows of a per team state."""
+    mean: pd.DataFrame = state.mean()
+    per_team: pd.DataFrame = pd.DataFrame(
+        {
+            "review_time": mean["review_time"],
+            "merge_time": mean["merge_time"],
+            "num_prs": state.size,
+        }
+    )
+    per_team.index = per_team.index.astype(str).rename("team")
+    return per_team.sort_index()
+
+
+def histogram_rows(
+    column: str, histogram: pd.Series, teams: List[str], rng: np.random.Generator
+) -> pd.DataFrame:
+    """Rows of the values counted by a per team `histogram`, at most
+    `VISUALIZATION_VIOLIN_MAX_ROWS` per team: larger teams get a sample, without
+    replacement, of their values."""
+    counts: np.ndarray = histogram.to_numpy().astype("int64")
+    codes: np.ndarray = histogram_teams(histogram, teams).cat.codes.to_numpy()
+    sizes: np.ndarray = np.bincount(codes, weights=counts, minlength=len(teams))
+    max_rows: int = settings.VISUALIZATION_VIOLIN_MAX_ROWS
+    for code in np.flatnonzero(sizes > max_rows):
+        members: np.ndarray = codes == code
+        counts[members] = rng.multivariate_hypergeometric(
+            counts[members], max_rows, method="marginals"
+        )
+    return pd.DataFrame(
+        {
+            column: np.repeat(histogram_values(histogram).to_numpy(), counts),
+            "team": pd.Categorical.from_codes(
+                np.repeat(codes, counts), categories=teams
+            ),
+        }
+    )
+
+
+def histogram_values(histogram: pd.Series) -> pd.Series:
+    return pd.Series(histogram.index.get_level_values("value"), dtype="float64")
+
+
+def histogram_teams(histogram: pd.Series, teams: List[str]) -> pd.Series:
+    groups: pd.Index = histogram.index.get_level_values("group").astype(str)
+    return pd.Series(pd.Categorical(groups, categories=teams))
+
+
+def draw_binned_violins(ax: Axes, distribution: BinnedDistribution) -> None:
+    """Violins, as drawn by `sns.violinplot(cut=0)`, of the KDE of binned
+    distributions: the same colors, area scaling and inner box, but at a cost
+    that does not grow with the number of rows.
+
+    The styling mirrors the private defaults of seaborn 0.12 (desaturated
+    palette, gray outlines), it has to be checked against the violins of
+    seaborn whenever it is upgraded."""
+    num_groups: int = len(distribution.groups)
+    colors: List[Any] = (
+        sns.color_palette(n_colors=num_groups)
+        if num_groups <= len(sns.color_palette())
+        else sns.color_palette("husl", num_groups)
+    )
+    colors = sns.color_palette(colors, desat=0.75)
+    gray: str = to_hex([min(rgb_to_hls(*color)[1] for color in colors) * 0.6] * 3)
+    linewidth: float = rcParams["lines.linewidth"]
+    half_width: float = 0.4
+
+    densities: List[Tuple[int, np.ndarray, np.ndarray]] = []
+    for group in range(num_groups):
+        if distribution.size[group] == 0:
+            continue
+        if distribution.min[group] == distribution.max[group]:
+            # a single value, drawn as a line
+            ax.plot(
+                [group - half_width, group + half_width],
+                [distribution.min[group]] * 2,
+                color=gray,
+                linewidth=linewidth,
+            )
+            continue
+        support, density = binned_kde(distribution, group)
+        densities.append((group, support, density))
+
+    # every violin has the same area, the widest one fills its slot
+    max_density: float = max(
+        (density.max() for _, _, density in densities), default=0.0
+    )
+    if max_density <= 0:
+        max_density = 1.0
+    for group, support, density in densities:
+        width: np.ndarray = density / max_density * half_width
+        ax.fill_betweenx(
+            support,
+            group - width,
+            group + width,
+            facecolor=colors[group],
+            edgecolor=gray,
+            linewidth=linewidth,
+        )
+        q25, q50, q75 = binned_quantiles(distribution, group, [0.25, 0.5, 0.75])
+        low, high = binned_whiskers(distribution, group, q25, q75)
+        ax.plot([group, group], [low, high], linewidth=linewidth, color=gray)
+        ax.plot([group, group], [q25, q75], linewidth=linewidth * 3, color=gray)
+        ax.scatter(
+            group,
+            q50,
+            zorder=3,
+            color="white",
+            edgecolor=gray,
+            s=np.square(linewidth * 2),
+        )
+
+    ax.set_xticks(np.arange(num_groups))
+    ax.set_xticklabels(distribution.groups)
+    ax.xaxis.grid(False)
+    ax.set_xlim(-0.5, num_groups - 0.5, auto=None)
+
+
+def select_figure_data(data: FigureData, spec: FigureSpec) -> FigureData:
+    """The part of `data` the `spec` figure is drawn from: the bars and pies
+    only need the per team aggregates, the violins the values of their
+    column."""
+    column: Optional[str] = spec.kwargs.get("column")
+    if column is None:
+        return data._replace(without_outliers=None, distributions=None)
+    rows: Optional[pd.DataFrame] = data.without_outliers
+    return data._replace(
+        without_outliers=(
+            None if rows is None else rows.loc[rows[column].notna(), [column, "team"]]
+        ),
+        distributions=(
+            None if data.distributions is None else {column: data.distributions[column]}
+        ),
+    )
+
+
+def render_figure(spec: FigureSpec, data: FigureData) -> RenderedFigure:
+    """Builds and rasterizes a single figure. Lives at module level so it can
+    run in a worker process."""
+    timer: StageTimer = StageTimer()
+    visualization_svc: VisualizationService = VisualizationService(
+        db=None  # type: ignore  # figure builders never touch the db
+    )
+    with timer.stage("build_figures") as metrics:
+        named_figure: NamedFigure = getattr(visualization_svc, spec.builder)(
+            data, **spec.kwargs
+        )
+        metrics.num_rows = data.num_rows
+    with timer.stage("rasterize") as metrics:
+        image: bytes = visualization_svc.render_fig_to_memory(named_figure.figure)
+        metrics.num_bytes = len(image)
+    visualization_svc.release_figure(named_figure.figure)
+    return RenderedFigure(name=named_figure.name, data=image, stages=timer.stages)
+
+
 # Facade #############################
 
 
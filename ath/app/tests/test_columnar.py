@@ -0,0 +1,70 @@
+import io
+import os
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+import pytest
+from app.utils.columnar import (
+    ParquetSink,
+    evict_parquet_files,
+    read_parquet,
+    stream_parquet,
+)
+from app.utils.ingestion import DataFrameCollector, iter_csv_chunks, stream_csv
+
+DATA_DIR: Path = Path(__file__).parent / "data"
+
+
+@pytest.fixture
+def sample() -> pd.DataFrame:
+    (df,) = iter_csv_chunks(io.BytesIO((DATA_DIR / "t1.csv").read_bytes()))
+    return df
+
+
+@pytest.fixture
+def parquet_path(tmp_path: Path) -> Path:
+    sink: ParquetSink = ParquetSink()
+    stream_csv(
+        io.BytesIO((DATA_DIR / "t1.csv").read_bytes()),
+        consumers=[sink],
+        chunk_rows=10,
+    )
+    path: Path = tmp_path / "t1.csv.parquet"
+    with sink.finish() as parquet:
+        path.write_bytes(parquet.read())
+    return path
+
+
+def test_read_parquet_matches_csv(sample, parquet_path) -> None:
+    df: pd.DataFrame = read_parquet(parquet_path)
+    pd.testing.assert_frame_equal(df[sample.columns], sample)
+
+
+def test_read_parquet_columns(sample, parquet_path) -> None:
+    df: pd.DataFrame = read_parquet(parquet_path, columns=["team", "review_time"])
+    assert list(df.columns) == ["team", "review_time"]
+    pd.testing.assert_frame_equal(df, sample[["team", "review_time"]])
+
+
+@pytest.mark.parametrize("chunk_rows", [None, 7])
+def test_stream_parquet_matches_csv(sample, parquet_path, chunk_rows) -> None:
+    collector: DataFrameCollector = DataFrameCollector()
+    num_rows: int = stream_parquet(
+        parquet_path, consumers=[collector], chunk_rows=chunk_rows
+    )
+    assert num_rows == len(sample)
+    pd.testing.assert_frame_equal(collector.result()[sample.columns], sample)
+
+
+def test_least_recently_used_files_are_evicted(tmp_path: Path) -> None:
+    paths: List[Path] = [tmp_path / "a" / f"{i}.csv.parquet" for i in range(4)]
+    for i, path in enumerate(paths):
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (i, i))
+    # used last, then kept even if the oldest
+    os.utime(paths[1], (10, 10))
+
+    assert evict_parquet_files(tmp_path, max_bytes=250, keep=paths[0]) == 200
+    assert [path.exists() for path in paths] == [True, True, False, False]
@@ -0,0 +1,206 @@
+import hashlib
+import io
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import pytest
+from app.core.config import get_settings
+from app.error import ParsingCsvError, RowError
+from app.utils import tusd
+from app.utils.ingestion import (
+    MAX_ROW_ERRORS,
+    DataFrameCollector,
+    HashingReader,
+    MappedFileReader,
+    iter_csv_chunks,
+    stream_csv,
+)
+
+DATA_DIR: Path = Path(__file__).parent / "data"
+
+
+def with_values(raw: bytes, values: Dict[Tuple[int, str], str]) -> bytes:
+    """`raw` csv with the values at each `(line, column)` replaced."""
+    lines: List[bytes] = raw.splitlines()
+    header: List[str] = lines[0].decode().split(",")
+    for (line, column), value in values.items():
+        fields: List[bytes] = lines[line - 1].split(b",")
+        fields[header.index(column)] = value.encode()
+        lines[line - 1] = b",".join(fields)
+    return b"\n".join(lines) + b"\n"
+
+
+@pytest.mark.parametrize(
+    "chunk_rows, chunk_bytes", [(None, None), (7, None), (None, 64), (None, 1)]
+)
+def test_stream_csv_matches_full_read(
+    chunk_rows: Optional[int], chunk_bytes: Optional[int]
+) -> None:
+    raw: bytes = (DATA_DIR / "t1.csv").read_bytes()
+    (expected,) = iter_csv_chunks(io.BytesIO(raw))
+
+    collector: DataFrameCollector = DataFrameCollector()
+    num_rows: int = stream_csv(
+        io.BytesIO(raw),
+        consumers=[collector],
+        chunk_rows=chunk_rows,
+        chunk_bytes=chunk_bytes,
+    )
+
+    assert num_rows == len(expected)
+    pd.testing.assert_frame_equal(collector.result(), expected)
+
+
+def test_stream_csv_chunks_are_bounded() -> None:
+    raw: bytes = (DATA_DIR / "t1.csv").read_bytes()
+    chunks = list(iter_csv_chunks(io.BytesIO(raw), chunk_rows=10))
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert sum(len(chunk) for chunk in chunks) == 96
+
+
+def test_stream_csv_bad_file() -> None:
+    raw: bytes = b"review_time,team,date,merge_time\nabc,A,2023-01-01,1\n"
+    with pytest.raises(ParsingCsvError):
+        stream_csv(io.BytesIO(raw), consumers=[DataFrameCollector()])
+
+
+def test_stream_csv_reports_invalid_values() -> None:
+    raw: bytes = with_values(
+        (DATA_DIR / "t1.csv").read_bytes(),
+        {
+            (50, "review_time"): "abc",
+            (60, "date"): "14/01/2023",
+            (70, "merge_time"): "",
+            (80, "merge_time"): "1.5",
+        },
+    )
+    with pytest.raises(ParsingCsvError) as e:
+        stream_csv(io.BytesIO(raw), consumers=[DataFrameCollector()])
+
+    assert e.value.errors == [
+        RowError(line=50, column="review_time", value="abc"),
+        RowError(line=60, column="date", value="14/01/2023"),
+        RowError(line=70, column="merge_time", value=""),
+        RowError(line=80, column="merge_time", value="1.5"),
+    ]
+    assert str(e.value).startswith("4 invalid values [line 50, review_time: 'abc';")
+
+
+@pytest.mark.parametrize("chunk_rows, chunk_bytes", [(7, None), (None, 64), (None, 1)])
+def test_stream_csv_invalid_value_lines_across_chunks(
+    chunk_rows: Optional[int], chunk_bytes: Optional[int]
+) -> None:
+    raw: bytes = with_values(
+        (DATA_DIR / "t1.csv").read_bytes(), {(50, "review_time"): "abc"}
+    )
+    with pytest.raises(ParsingCsvError) as e:
+        stream_csv(
+            io.BytesIO(raw),
+            consumers=[DataFrameCollector()],
+            chunk_rows=chunk_rows,
+            chunk_bytes=chunk_bytes,
+        )
+    assert e.value.errors == [RowError(line=50, column="review_time", value="abc")]
+
+
+def test_stream_csv_invalid_values_are_bounded() -> None:
+    raw: bytes = with_values(
+        (DATA_DIR / "t1.csv").read_bytes(),
+        {(line, "date"): "x" * 1000 for line in range(2, 98)},
+    )
+    with pytest.raises(ParsingCsvError) as e:
+        stream_csv(io.BytesIO(raw), consumers=[DataFrameCollector()])
+
+    assert str(e.value).startswith("96 invalid values")
+    assert [error.line for error in e.value.errors] == list(
+        range(2, 2 + MAX_ROW_ERRORS)
+    )
+    assert all(len(error.value) < 100 for error in e.value.errors)
+
+
+def test_stream_csv_aborts_early() -> None:
+    raw: bytes = b"review_time,team,date,merge_time\n" + b"x,A,2023-01-14,1\n" * 500_000
+    stream: io.BytesIO = io.BytesIO(raw)
+    with pytest.raises(ParsingCsvError):
+        stream_csv(stream, consumers=[DataFrameCollector()], chunk_rows=100_000)
+    assert stream.tell() < len(raw) // 10
+
+    # a missing column fails on the header, after a single read of the parser
+    raw = b"id,value\n" + b"1,2\n" * 2_000_000
+    stream = io.BytesIO(raw)
+    with pytest.raises(ParsingCsvError):
+        stream_csv(stream, consumers=[DataFrameCollector()], chunk_rows=100_000)
+    assert stream.tell() < len(raw) // 10
+
+
+@pytest.mark.parametrize(
+    "chunk_rows, chunk_bytes", [(None, None), (7, None), (None, 64)]
+)
+def test_hashing_reader_digests_whole_file(
+    chunk_rows: Optional[int], chunk_bytes: Optional[int]
+) -> None:
+    raw: bytes = (DATA_DIR / "t1.csv").read_bytes()
+    digest = hashlib.sha256()
+    reader: HashingReader = HashingReader(io.BytesIO(raw), digest)
+    stream_csv(
+        reader,
+        consumers=[DataFrameCollector()],
+        chunk_rows=chunk_rows,
+        chunk_bytes=chunk_bytes,
+    )
+    reader.drain()
+    assert digest.hexdigest() == hashlib.sha256(raw).hexdigest()
+
+
+def test_compact_schema_across_chunks() -> None:
+    raw: bytes = (
+        b"review_time,team,date,merge_time\n"
+        b"1,A,2023-01-14,10\n"
+        b"70000,B,2023-01-15,20\n"
+        b"3,C,2023-01-16,300\n"
+    )
+    collector: DataFrameCollector = DataFrameCollector()
+    stream_csv(io.BytesIO(raw), consumers=[collector], chunk_rows=1)
+    df: pd.DataFrame = collector.result()
+
+    assert df.review_time.dtype == "int32"
+    assert df.merge_time.dtype == "int16"
+    assert list(df.team.cat.categories) == ["A", "B", "C"]
+    assert list(df.team) == ["A", "B", "C"]
+    assert df.date.dtype == "datetime64[ns]"
+
+
+def test_stream_csv_bad_date_format() -> None:
+    raw: bytes = b"review_time,team,date,merge_time\n1,A,14/01/2023,1\n"
+    with pytest.raises(ParsingCsvError):
+        stream_csv(io.BytesIO(raw), consumers=[DataFrameCollector()])
+
+
+@pytest.mark.parametrize("chunk_bytes", [None, 1, 64])
+def test_mapped_file_reader_feeds_the_parser(chunk_bytes: Optional[int]) -> None:
+    path: Path = DATA_DIR / "t1.csv"
+    (expected,) = iter_csv_chunks(io.BytesIO(path.read_bytes()))
+
+    collector: DataFrameCollector = DataFrameCollector()
+    with MappedFileReader(path) as reader:
+        assert reader.length == path.stat().st_size
+        stream_csv(reader, consumers=[collector], chunk_bytes=chunk_bytes)
+
+    pd.testing.assert_frame_equal(collector.result(), expected)
+
+
+def test_mapped_file_reader_empty_file(tmp_path: Path) -> None:
+    path: Path = tmp_path / "empty"
+    path.touch()
+    with MappedFileReader(path) as reader:
+        assert reader.read() == b""
+
+
+def test_tusd_file_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    (tmp_path / "upload").write_bytes(b"csv")
+    assert tusd.tusd_file_path("upload") is None
+
+    monkeypatch.setattr(get_settings(), "TUSD_FILESTORE_DIR", str(tmp_path))
+    assert tusd.tusd_file_path("upload") == tmp_path / "upload"
+    assert tusd.tusd_file_path("missing") is None
@@ -0,0 +1,48 @@
+from typing import Optional
+
+import pytest
+from app.core.metrics import HueyQueueCollector, instrument_huey
+from huey import MemoryHuey
+from huey.exceptions import TaskException
+from prometheus_client import REGISTRY, Metric
+
+
+def task_count(task: str, outcome: str) -> float:
+    count: Optional[float] = REGISTRY.get_sample_value(
+        "ath_task_duration_seconds_count", {"task": task, "outcome": outcome}
+    )
+    return count or 0.0
+
+
+def test_task_durations_are_recorded() -> None:
+    huey: MemoryHuey = MemoryHuey("metrics-test", immediate=True)
+    instrument_huey(huey)
+
+    @huey.task()
+    def ok() -> None:
+        ...
+
+    @huey.task()
+    def fails() -> None:
+        raise ValueError()
+
+    ok()
+    with pytest.raises(TaskException):
+        fails().get()
+
+    assert task_count("ok", "complete") == 1
+    assert task_count("fails", "error") == 1
+
+
+def test_queue_depth_is_collected() -> None:
+    huey: MemoryHuey = MemoryHuey("metrics-test")
+
+    @huey.task()
+    def ok() -> None:
+        ...
+
+    for _ in range(3):
+        ok()
+    depth: Metric = next(iter(HueyQueueCollector(huey).collect()))
+    assert depth.samples[0].labels == {"queue": "metrics-test"}
+    assert depth.samples[0].value == 3
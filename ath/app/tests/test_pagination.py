@@ -0,0 +1,19 @@
+import datetime as dt
+import uuid
+
+import pytest
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip() -> None:
+    created_at: dt.datetime = dt.datetime(
+        2023, 3, 2, 1, 18, 53, 535537, dt.timezone.utc
+    )
+    id: uuid.UUID = uuid.uuid4()
+    assert decode_cursor(encode_cursor(created_at, id)) == (created_at, id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "e30="])
+def test_invalid_cursor(cursor) -> None:
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,40 @@
+import io
+import time
+
+import pandas as pd
+from app.utils.ingestion import DataFrameCollector, stream_csv
+from app.utils.profiling import StageTimer, TimedConsumer, TimedReader
+
+
+def test_nested_stages_are_exclusive() -> None:
+    timer: StageTimer = StageTimer()
+    with timer.stage("parse") as metrics:
+        time.sleep(0.02)
+        for _ in range(2):
+            with timer.stage("download") as download:
+                time.sleep(0.05)
+                download.num_bytes = 10
+        metrics.num_rows = 3
+
+    assert timer.stages["download"].num_bytes == 20
+    assert timer.stages["download"].wall_seconds >= 0.1
+    assert 0.02 <= timer.stages["parse"].wall_seconds < 0.1
+    assert timer.stages["parse"].num_rows == 3
+    assert timer.stages["parse"].peak_rss_bytes
+
+
+def test_timed_reader_and_consumer() -> None:
+    raw: bytes = b"review_time,team,date,merge_time\n" + b"1,A,2023-01-14,10\n" * 50
+    timer: StageTimer = StageTimer()
+    collector: DataFrameCollector = DataFrameCollector()
+    with timer.stage("parse"):
+        stream_csv(
+            TimedReader(io.BytesIO(raw), timer, "download"),  # type: ignore
+            consumers=[TimedConsumer(collector, timer, "collect")],
+            chunk_rows=7,
+        )
+
+    assert timer.stages["download"].num_bytes == len(raw)
+    assert timer.stages["collect"].num_rows == 50
+    assert isinstance(collector.result(), pd.DataFrame)
+    assert set(timer.dict()) == {"parse", "download", "collect"}
@@ -0,0 +1,111 @@
+import io
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Set
+
+import pandas as pd
+import pytest
+from app.core.config import get_settings
+from app.utils import s3
+from app.utils.ingestion import DataFrameCollector, iter_csv_chunks, stream_csv
+from app.utils.s3 import S3RangeReader
+
+DATA_DIR: Path = Path(__file__).parent / "data"
+
+
+def serve_ranges(monkeypatch: pytest.MonkeyPatch, data: bytes) -> List[int]:
+    """Serves `data` to `S3RangeReader`, the later parts first, and returns the
+    number of parts in flight, as they are requested."""
+    lock: threading.Lock = threading.Lock()
+    in_flight: List[int] = [0]
+    seen: List[int] = []
+
+    def download_range(file_name: str, bucket: str, start: int, end: int, *args):
+        with lock:
+            in_flight[0] += 1
+            seen.append(in_flight[0])
+        time.sleep(0.001 * (len(data) - start) / len(data))
+        with lock:
+            in_flight[0] -= 1
+        return bytearray(data[start:end])
+
+    monkeypatch.setattr(s3, "s3_download_range", download_range)
+    return seen
+
+
+@pytest.mark.parametrize("part_bytes, concurrency", [(1, 1), (7, 4), (1 << 20, 8)])
+def test_range_reader_streams_the_object_in_order(
+    part_bytes: int, concurrency: int, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    data: bytes = bytes(range(256)) * 16
+    in_flight: List[int] = serve_ranges(monkeypatch, data)
+
+    with S3RangeReader(
+        "sample", "csvs", size=len(data), part_bytes=part_bytes, concurrency=concurrency
+    ) as reader:
+        assert reader.read() == data
+
+    assert max(in_flight) <= concurrency
+
+
+def test_range_reader_feeds_the_parser(monkeypatch: pytest.MonkeyPatch) -> None:
+    raw: bytes = (DATA_DIR / "t1.csv").read_bytes()
+    (expected,) = iter_csv_chunks(io.BytesIO(raw))
+    serve_ranges(monkeypatch, raw)
+
+    collector: DataFrameCollector = DataFrameCollector()
+    with S3RangeReader(
+        "sample", "csvs", size=len(raw), part_bytes=100, concurrency=4
+    ) as reader:
+        stream_csv(reader, consumers=[collector], chunk_bytes=256)
+
+    pd.testing.assert_frame_equal(collector.result(), expected)
+
+
+def test_files_are_uploaded_by_the_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    lock: threading.Lock = threading.Lock()
+    uploads: Dict[str, bytes] = {}
+    threads: Set[str] = set()
+
+    def upload(data: bytes, file_name: str, bucket: str) -> None:
+        with lock:
+            uploads[file_name] = data
+            threads.add(threading.current_thread().name)
+
+    monkeypatch.setattr(s3, "s3_upload_file_from_memory", upload)
+    s3.s3_upload_files_from_memory(
+        [(str(i).encode(), f"plot-{i}.png") for i in range(16)], bucket="plots"
+    )
+
+    assert uploads == {f"plot-{i}.png": str(i).encode() for i in range(16)}
+    assert all(name.startswith("s3-upload") for name in threads)
+    assert len(threads) <= get_settings().S3_UPLOAD_CONCURRENCY
+
+
+def test_client_is_replaced_in_forked_processes(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    runtime: s3.S3Runtime = s3.get_s3_runtime()
+    assert s3.get_s3_runtime() is runtime
+
+    monkeypatch.setattr(s3.os, "getpid", lambda: runtime.pid + 1)
+    forked: s3.S3Runtime = s3.get_s3_runtime()
+
+    assert forked is not runtime and forked.client is not runtime.client
+    assert s3.get_s3_runtime() is forked
+
+
+def test_failed_downloads_leave_no_partial_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class FailingClient:
+        def download_file(self, bucket: str, file_name: str, path: str) -> None:
+            Path(path).write_bytes(b"partial")
+            raise ConnectionError("reset by peer")
+
+    monkeypatch.setattr(s3, "get_s3_client", FailingClient)
+
+    with pytest.raises(ConnectionError):
+        s3.s3_download_file("sample.parquet", "csvs", tmp_path / "sample.parquet")
+    assert list(tmp_path.iterdir()) == []
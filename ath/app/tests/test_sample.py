@@ -0,0 +1,142 @@
+import io
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import pytest
+from app.core.config import get_settings
+from app.core.exceptions import HTTP404NotFoundException
+from app.db.crud.crud_sample import crud_sample
+from app.enums.sample import Status
+from app.error import BadSampleError
+from app.schemas.sample import SampleDb
+from app.schemas.tusd import StorageType
+from app.services import sample as sample_module
+from app.services.sample import SampleService
+from app.services.visualization import FIGURE_SPECS
+from app.utils.accumulators import ReportAccumulator
+from app.utils.ingestion import MappedFileReader
+from app.utils.profiling import StageTimer
+from prometheus_client import REGISTRY
+
+DATA_DIR: Path = Path(__file__).parent / "data"
+
+
+@pytest.fixture()
+def sample_svc() -> SampleService:
+    return SampleService(
+        db=None, summary_statistics_svc=None, visualization_svc=None  # type: ignore
+    )
+
+
+async def test_plot_of_a_deleted_source_is_not_found(
+    sample_svc: SampleService, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    sample: SampleDb = SampleDb(
+        id=uuid.uuid4(),
+        upload_id=uuid.uuid4(),
+        file_name="sample",
+        status=Status.DONE,
+        source_sample_id=uuid.uuid4(),
+    )
+    samples: Dict[uuid.UUID, SampleDb] = {sample.id: sample}
+
+    async def get(db: Any, id: uuid.UUID) -> Optional[SampleDb]:
+        return samples.get(id)
+
+    monkeypatch.setattr(crud_sample, "get", get)
+
+    with pytest.raises(HTTP404NotFoundException):
+        await sample_svc.get_plot_url(sample.id, FIGURE_SPECS[0].name)
+
+
+async def test_lineage_of_a_lazy_plot_is_read_in_a_session_of_its_own(
+    sample_svc: SampleService, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    sample: SampleDb = SampleDb(id=uuid.uuid4(), upload_id=uuid.uuid4())
+    own_db: object = object()
+    sessions: List[Any] = []
+
+    @asynccontextmanager
+    async def session_factory() -> AsyncIterator[object]:
+        yield own_db
+
+    async def get_lineage(db: Any, sample: SampleDb) -> List[SampleDb]:
+        sessions.append(db)
+        return [sample]
+
+    monkeypatch.setattr(sample_module, "async_session_factory", session_factory)
+    monkeypatch.setattr(crud_sample, "get_lineage", get_lineage)
+    monkeypatch.setattr(sample_svc, "read_state", lambda *args: None)
+    monkeypatch.setattr(sample_svc, "accumulate", lambda *args: ReportAccumulator())
+    monkeypatch.setattr(sample_module, "get_state_figure_data", lambda *args: None)
+
+    await sample_svc.load_figure_data(sample)
+
+    # not the session of the request, which may be closed before the rendering
+    assert sessions == [own_db]
+
+
+@pytest.mark.parametrize(
+    "storage, local, source",
+    [
+        (StorageType.FILE, True, "file"),
+        (StorageType.S3, True, "s3"),
+        (None, True, "file"),
+        (None, False, "s3"),
+    ],
+)
+def test_csv_is_read_from_the_storage_of_its_upload(
+    sample_svc: SampleService,
+    tmp_path: Path,
+    storage: Optional[StorageType],
+    local: bool,
+    source: str,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    opened: List[str] = []
+    monkeypatch.setattr(get_settings(), "TUSD_FILESTORE_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        sample_module, "s3_open", lambda *args, **kwargs: opened.append("s3")
+    )
+    if local:
+        (tmp_path / "upload").write_bytes(b"a,b\n1,2\n")
+
+    stream: Any = sample_svc.open_csv("upload", storage=storage)
+    if isinstance(stream, MappedFileReader):
+        opened.append("file")
+        stream.close()
+
+    assert opened == [source]
+
+
+def test_csv_of_an_unshared_filestore_is_refused(
+    sample_svc: SampleService, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(get_settings(), "TUSD_FILESTORE_DIR", str(tmp_path))
+
+    with pytest.raises(BadSampleError, match="filestore this host does not share"):
+        sample_svc.open_csv("upload", storage=StorageType.FILE)
+
+
+def test_csvs_ingested_with_the_same_timer_count_their_own_bytes(
+    sample_svc: SampleService, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    raw: bytes = (DATA_DIR / "t1.csv").read_bytes()
+    monkeypatch.setattr(sample_svc, "open_csv", lambda *args, **kwargs: io.BytesIO(raw))
+    timer: StageTimer = StageTimer()
+
+    def ingested_bytes() -> float:
+        count: Optional[float] = REGISTRY.get_sample_value(
+            "ath_ingested_bytes_total", {"source": "csv"}
+        )
+        return count or 0.0
+
+    before: float = ingested_bytes()
+    # an append, ingesting its parent and then its own csv
+    for file_name in ["parent", "sample"]:
+        sample_svc.stream_csv(file_name, consumers=[], timer=timer)
+
+    assert ingested_bytes() - before == 2 * len(raw)
+    assert timer.stages["parse"].num_bytes == 2 * len(raw)
@@ -0,0 +1,191 @@
+import io
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+from app.error import ParsingCsvError, RowError
+from app.schemas.summary_statistics import Report
+from app.services.summary_statistics import SummaryStatisticsService
+from app.utils import accumulators
+from app.utils.accumulators import DENSE_MODE_MAX_CELLS, ReportAccumulator, grouped_mode
+from app.utils.ingestion import DataFrameCollector, iter_csv_chunks, narrow_int
+from app.utils.partitions import stream_csv_partitioned
+from app.utils.pool import get_process_pool
+
+DATA_DIR: Path = Path(__file__).parent / "data"
+
+
+def read_sample(file_name: str, chunk_rows=None) -> List[pd.DataFrame]:
+    raw: bytes = (DATA_DIR / file_name).read_bytes()
+    return list(iter_csv_chunks(io.BytesIO(raw), chunk_rows=chunk_rows))
+
+
+def multi_scan_report(df: pd.DataFrame) -> Report:
+    svc: SummaryStatisticsService = SummaryStatisticsService(db=None)  # type: ignore
+    return Report(
+        total_num_observations=svc.get_total_num_observations(df),
+        teams=svc.get_teams(df),
+        date_interval=svc.get_date_interval(df),
+        stats=svc.get_stats(df),
+        per_team=svc.get_per_team_stats(df),
+        num_prs_without_review=svc.get_num_prs_without_review(df),
+        num_prs_without_ci=svc.get_num_prs_without_ci(df),
+        num_missing_values=svc.get_num_missing_values(df),
+    )
+
+
+@pytest.mark.parametrize("file_name", ["t1.csv", "t2.csv", "t3.csv"])
+def test_single_pass_report_matches_multi_scan(file_name: str) -> None:
+    (df,) = read_sample(file_name)
+    svc: SummaryStatisticsService = SummaryStatisticsService(db=None)  # type: ignore
+    assert svc.get_report(df) == multi_scan_report(df)
+
+
+def test_narrowed_times_add_up_without_overflow() -> None:
+    (df,) = read_sample("t1.csv")
+    # narrowed to int16, their sum is not
+    df["review_time"] = narrow_int(pd.Series(30_000, index=df.index))
+    df["merge_time"] = narrow_int(pd.Series(30_000, index=df.index))
+    svc: SummaryStatisticsService = SummaryStatisticsService(db=None)  # type: ignore
+
+    report: Report = multi_scan_report(df)
+
+    assert df.review_time.dtype == "int16"
+    assert report.stats.mean.total_time == 60_000
+    assert report.per_team
+    assert {stats.mode.total_time for stats in report.per_team.values()} == {60_000}
+    assert svc.get_report(df) == report
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 25])
+def test_merged_accumulators_match_single_pass(chunk_rows: int) -> None:
+    (df,) = read_sample("t1.csv")
+    chunks: List[pd.DataFrame] = read_sample("t1.csv", chunk_rows=chunk_rows)
+
+    consumed: ReportAccumulator = ReportAccumulator()
+    for chunk in chunks:
+        consumed.consume(chunk)
+    # combined as a binary tree: at most a pending state per level
+    assert len(consumed.pending) <= len(chunks).bit_length()
+
+    # partial states built independently (e.g. by different workers)
+    merged: ReportAccumulator = ReportAccumulator()
+    for chunk in reversed(chunks):
+        merged.merge(ReportAccumulator.from_frame(chunk))
+
+    expected: Report = multi_scan_report(df)
+    assert consumed.result() == expected
+    assert merged.result().dict(exclude={"teams"}) == expected.dict(exclude={"teams"})
+
+
+def test_saved_state_appends_to_the_same_report() -> None:
+    (df,) = read_sample("t1.csv")
+    parent: ReportAccumulator = ReportAccumulator.from_frame(df.iloc[:30])
+    delta: ReportAccumulator = ReportAccumulator.from_frame(df.iloc[30:])
+
+    appended: ReportAccumulator = ReportAccumulator.loads(parent.dumps()).merge(delta)
+
+    assert appended.result() == multi_scan_report(df)
+
+
+@pytest.mark.parametrize("data", [pickle.dumps((1, {})), b"PAR1", b""])
+def test_foreign_states_are_refused(data: bytes) -> None:
+    with pytest.raises(ValueError):
+        ReportAccumulator.loads(data)
+
+
+def test_empty_state_round_trips() -> None:
+    loaded: ReportAccumulator = ReportAccumulator.loads(ReportAccumulator().dumps())
+    assert loaded.overall is None and loaded.per_team is None
+
+
+@pytest.mark.parametrize("partition_bytes", [64, 512, 1 << 20])
+def test_partitioned_report_matches_single_pass(partition_bytes: int) -> None:
+    raw: bytes = (DATA_DIR / "t1.csv").read_bytes()
+    (df,) = read_sample("t1.csv")
+
+    accumulator: ReportAccumulator = ReportAccumulator()
+    collector: DataFrameCollector = DataFrameCollector()
+    num_rows, workers = stream_csv_partitioned(
+        io.BytesIO(raw),
+        accumulator,
+        consumers=[collector],
+        pool=get_process_pool(2),
+        partition_bytes=partition_bytes,
+        max_pending=4,
+    )
+
+    assert num_rows == len(df)
+    assert {"parse", "stats"} <= set(workers.stages)
+    assert accumulator.result() == multi_scan_report(df)
+    # in the column order of the columnar copy
+    pd.testing.assert_frame_equal(collector.result(), df, check_like=True)
+
+
+def test_partitioned_invalid_value_lines() -> None:
+    raw: bytes = (DATA_DIR / "t1.csv").read_bytes()
+    lines: List[bytes] = raw.splitlines(keepends=True)
+    lines[79] = b"abc," + lines[79].split(b",", 1)[1]
+
+    with pytest.raises(ParsingCsvError) as e:
+        stream_csv_partitioned(
+            io.BytesIO(b"".join(lines)),
+            ReportAccumulator(),
+            consumers=[],
+            pool=get_process_pool(2),
+            partition_bytes=512,
+            max_pending=4,
+        )
+    assert e.value.errors == [RowError(line=80, column="review_time", value="abc")]
+
+
+class SlowReader(io.BytesIO):
+    """Stream taking a while for every read, as a download does."""
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        time.sleep(0.01)
+        return super().read(size)
+
+
+def test_partitioned_stream_aborts_early() -> None:
+    raw: bytes = (
+        b"review_time,team,date,merge_time\n"
+        + b"abc,A,2023-01-14,1\n"
+        + b"1,A,2023-01-14,1\n" * 20_000
+    )
+    stream: SlowReader = SlowReader(raw)
+
+    with ThreadPoolExecutor(2) as pool, pytest.raises(ParsingCsvError) as e:
+        stream_csv_partitioned(
+            stream,
+            ReportAccumulator(),
+            consumers=[],
+            pool=pool,
+            partition_bytes=4096,
+            max_pending=1000,
+        )
+    assert e.value.errors == [RowError(line=2, column="review_time", value="abc")]
+    assert stream.tell() < len(raw) // 2
+
+
+@pytest.mark.parametrize("dense_max_cells", [0, DENSE_MODE_MAX_CELLS])
+@pytest.mark.parametrize("num_teams", [1, 3, 40])
+def test_grouped_mode_keeps_smallest_of_ties(
+    num_teams: int, dense_max_cells: int, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(accumulators, "DENSE_MODE_MAX_CELLS", dense_max_cells)
+    rng: np.random.Generator = np.random.default_rng(num_teams)
+    df: pd.DataFrame = pd.DataFrame(
+        {
+            "team": rng.choice([f"team-{i}" for i in range(num_teams)], 500),
+            "review_time": rng.integers(0, 6, 500),
+            "merge_time": rng.integers(0, 60, 500),
+        }
+    )
+    expected: pd.DataFrame = df.groupby(by="team").agg(lambda x: min(pd.Series.mode(x)))
+    pd.testing.assert_frame_equal(grouped_mode(df, by="team"), expected)
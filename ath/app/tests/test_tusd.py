@@ -0,0 +1,118 @@
+import datetime as dt
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+from app.core.config import get_settings
+from app.core.exceptions import HTTP400BadRequestException, HTTP403ForbiddenException
+from app.schemas.tusd import HookBody, HttpRequest
+from app.services.tusd import TusdService
+from app.utils.tusd import upload_client, upload_rejection
+
+
+def hook_body(
+    size: int = 1000,
+    size_is_deferred: bool = False,
+    remote_addr: str = "10.0.0.1:51234",
+    **metadata: str,
+) -> HookBody:
+    return HookBody.parse_obj(
+        {
+            "Upload": {
+                "ID": "",
+                "Size": size,
+                "SizeIsDeferred": size_is_deferred,
+                "Offset": 0,
+                "IsFinal": False,
+                "IsPartial": False,
+                "PartialUploads": None,
+                "MetaData": {
+                    "upload_id": str(uuid.uuid4()),
+                    "filename": "sample.csv",
+                    "filetype": "text/csv",
+                    "row_count": "10",
+                    **metadata,
+                },
+            },
+            "HTTPRequest": {
+                "Method": "POST",
+                "URI": "/files/",
+                "RemoteAddr": remote_addr,
+                "Header": {},
+            },
+        }
+    )
+
+
+class UsageSampleService:
+    """Sample service stand-in, only reporting the usage of a client."""
+
+    def __init__(self, active: int, num_bytes: int) -> None:
+        self.usage: Tuple[int, int] = (active, num_bytes)
+        self.calls: List[str] = []
+
+    async def get_client_usage(self, client: str, since: dt.datetime):
+        self.calls.append(client)
+        return self.usage
+
+
+def test_upload_is_admitted() -> None:
+    assert upload_rejection(hook_body().upload) is None
+
+
+@pytest.mark.parametrize(
+    "kwargs, reason",
+    [
+        ({"filename": ""}, "Missing upload metadata"),
+        ({"upload_id": "not-an-id"}, "Invalid upload id"),
+        ({"size": (2 << 30) + 1}, "Upload too large"),
+        ({"size_is_deferred": True}, "Upload size must be declared"),
+        ({"filetype": "application/zip"}, "Unsupported file type"),
+        ({"row_count": "-1"}, "Invalid row count"),
+    ],
+)
+def test_upload_is_refused(kwargs: Dict[str, Any], reason: str) -> None:
+    rejection: Optional[str] = upload_rejection(hook_body(**kwargs).upload)
+    assert rejection is not None and rejection.startswith(reason)
+
+
+def test_upload_row_limit(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "UPLOAD_MAX_ROWS", 10)
+    assert upload_rejection(hook_body(row_count="10").upload) is None
+    rejection: Optional[str] = upload_rejection(hook_body(row_count="11").upload)
+    assert rejection is not None and rejection.startswith("Too many rows")
+
+
+@pytest.mark.parametrize(
+    "remote_addr, client",
+    [("10.0.0.1:51234", "10.0.0.1"), ("[::1]:51234", "::1"), ("10.0.0.1", "10.0.0.1")],
+)
+def test_upload_client(remote_addr: str, client: str) -> None:
+    http_request: HttpRequest = hook_body(remote_addr=remote_addr).http_request
+    assert upload_client(http_request) == client
+
+
+async def test_refused_upload_is_answered_before_any_query() -> None:
+    sample_svc: UsageSampleService = UsageSampleService(active=0, num_bytes=0)
+    tusd_svc: TusdService = TusdService(db=None, sample_svc=sample_svc)  # type: ignore
+
+    with pytest.raises(HTTP400BadRequestException):
+        await tusd_svc.admit(hook_body(filetype="application/zip"))
+    assert sample_svc.calls == []
+
+
+@pytest.mark.parametrize(
+    "active, num_bytes, admitted",
+    [(0, 0, True), (7, 0, True), (8, 0, False), (0, (16 << 30) - 1000, True)]
+    + [(0, (16 << 30) - 999, False)],
+)
+async def test_upload_quotas(active: int, num_bytes: int, admitted: bool) -> None:
+    sample_svc: UsageSampleService = UsageSampleService(active, num_bytes)
+    tusd_svc: TusdService = TusdService(db=None, sample_svc=sample_svc)  # type: ignore
+
+    if admitted:
+        assert await tusd_svc.admit(hook_body(size=1000)) == "10.0.0.1"
+    else:
+        with pytest.raises(HTTP403ForbiddenException):
+            await tusd_svc.admit(hook_body(size=1000))
+    assert sample_svc.calls == ["10.0.0.1"]
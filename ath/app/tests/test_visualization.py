@@ -0,0 +1,286 @@
+import asyncio
+import gc
+import io
+import weakref
+from pathlib import Path
+from typing import List, cast
+
+import numpy as np
+import pandas as pd
+import pytest
+from app.core.config import get_settings
+from app.schemas.visualization import FigureData, NamedFigure, RenderedFigure
+from app.services import visualization
+from app.services.visualization import FIGURE_SPECS, FigureSpec, VisualizationService
+from app.utils.accumulators import ReportAccumulator
+from app.utils.distributions import (
+    BinnedDistribution,
+    bin_distribution,
+    binned_kde,
+    binned_quantiles,
+)
+from app.utils.ingestion import iter_csv_chunks
+from matplotlib.axes import Axes
+from matplotlib.collections import PolyCollection
+
+DATA_DIR: Path = Path(__file__).parent / "data"
+
+
+@pytest.fixture(scope="module")
+def visualization_svc() -> VisualizationService:
+    return VisualizationService(db=None)  # type: ignore
+
+
+@pytest.fixture()
+def df() -> pd.DataFrame:
+    raw: bytes = (DATA_DIR / "t1.csv").read_bytes()
+    (df,) = iter_csv_chunks(io.BytesIO(raw))
+    return df
+
+
+@pytest.mark.parametrize("fast_distributions", [False, True])
+def test_parallel_rendering_matches_serial(
+    visualization_svc: VisualizationService,
+    df: pd.DataFrame,
+    fast_distributions: bool,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        get_settings(), "VISUALIZATION_FAST_DISTRIBUTIONS", fast_distributions
+    )
+    monkeypatch.setattr(get_settings(), "VISUALIZATION_RENDERING_WORKERS", 1)
+    serial: List[RenderedFigure] = visualization_svc.render_named_figures(
+        visualization.get_figure_data(df)
+    )
+    monkeypatch.setattr(get_settings(), "VISUALIZATION_RENDERING_WORKERS", 2)
+    parallel: List[RenderedFigure] = visualization_svc.render_named_figures(
+        visualization.get_figure_data(df)
+    )
+
+    assert len(serial) == len(FIGURE_SPECS)
+    assert [figure.name for figure in parallel] == [figure.name for figure in serial]
+    assert [figure.data for figure in parallel] == [figure.data for figure in serial]
+
+
+def test_figures_are_only_sent_the_data_they_draw(df: pd.DataFrame) -> None:
+    data: FigureData = visualization.get_figure_data(df)
+
+    for spec in FIGURE_SPECS:
+        part: FigureData = visualization.select_figure_data(data, spec)
+        assert part.per_team is data.per_team
+        if "column" in spec.kwargs:
+            rows: pd.DataFrame = cast(pd.DataFrame, part.without_outliers)
+            assert list(rows.columns) == [spec.kwargs["column"], "team"]
+            assert len(rows) == len(cast(pd.DataFrame, data.without_outliers))
+        else:
+            assert part.without_outliers is None
+
+
+def test_figure_specs_are_named_after_their_figures(
+    visualization_svc: VisualizationService, df: pd.DataFrame
+) -> None:
+    named_figures: List[NamedFigure] = visualization_svc.create_named_figures(df)
+    assert [figure.name for figure in named_figures] == [
+        spec.name for spec in FIGURE_SPECS
+    ]
+    for named_figure in named_figures:
+        visualization_svc.release_figure(named_figure.figure)
+
+
+async def test_concurrent_lazy_renderings_render_once(
+    visualization_svc: VisualizationService,
+    df: pd.DataFrame,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    uploads: List[str] = []
+    loads: List[int] = []
+
+    async def load() -> FigureData:
+        loads.append(1)
+        return visualization.get_figure_data(df)
+
+    monkeypatch.setattr(get_settings(), "VISUALIZATION_RENDERING_WORKERS", 1)
+    monkeypatch.setattr(visualization, "s3_object_exists", lambda *args: False)
+    monkeypatch.setattr(
+        visualization,
+        "s3_upload_file_from_memory",
+        lambda data, file_name, bucket: uploads.append(file_name),
+    )
+    spec: FigureSpec = FIGURE_SPECS[0]
+
+    await asyncio.gather(
+        *(
+            visualization_svc.render_lazily(spec, "sample/plot.png", load)
+            for _ in range(3)
+        )
+    )
+
+    assert loads == [1]
+    assert uploads == ["sample/plot.png"]
+
+    # stored plots are neither loaded nor rendered again
+    monkeypatch.setattr(visualization, "s3_object_exists", lambda *args: True)
+    await visualization_svc.render_lazily(spec, "sample/plot.png", load)
+    assert loads == [1]
+    assert uploads == ["sample/plot.png"]
+
+
+@pytest.mark.parametrize("simple_rendering", [False, True])
+def test_rendered_figures_are_collected(
+    visualization_svc: VisualizationService,
+    df: pd.DataFrame,
+    simple_rendering: bool,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        get_settings(), "VISUALIZATION_SIMPLE_RENDERING", simple_rendering
+    )
+    named_figures: List[NamedFigure] = visualization_svc.create_named_figures(df)
+    figures: List[weakref.ref] = [
+        weakref.ref(named_figure.figure) for named_figure in named_figures
+    ]
+
+    for named_figure in named_figures:
+        assert visualization_svc.render_fig_to_memory(named_figure.figure)
+        visualization_svc.release_figure(named_figure.figure)
+    del named_figure, named_figures
+    gc.collect()
+
+    assert [figure() for figure in figures] == [None] * len(FIGURE_SPECS)
+
+
+def exact_kde(values: np.ndarray, support: np.ndarray) -> np.ndarray:
+    """Gaussian KDE of `values` with Scott's bandwidth, as seaborn's."""
+    bandwidth: float = values.std(ddof=1) * len(values) ** (-1 / 5)
+    z: np.ndarray = (support[:, None] - values[None, :]) / bandwidth
+    return np.exp(-0.5 * z**2).sum(axis=1) / (
+        len(values) * bandwidth * np.sqrt(2 * np.pi)
+    )
+
+
+def test_binned_distribution_approximates_the_rows() -> None:
+    rng: np.random.Generator = np.random.default_rng(0)
+    rows: pd.DataFrame = pd.DataFrame(
+        {
+            "team": rng.choice(["a", "b", "c"], size=20_000),
+            "review_time": rng.exponential(3600, size=20_000).round(),
+        }
+    )
+    distribution: BinnedDistribution = bin_distribution(
+        rows.review_time, rows.team, bins=512
+    )
+    group: int = int(distribution.size.argmax())
+    values: np.ndarray = rows.review_time[
+        rows.team == distribution.groups[group]
+    ].to_numpy(dtype="float64")
+
+    support, density = binned_kde(distribution, group)
+    exact: np.ndarray = exact_kde(values, support)
+    bin_width: float = distribution.edges[group, 1] - distribution.edges[group, 0]
+
+    assert distribution.size.sum() == len(rows)
+    assert np.abs(density - exact).max() < 0.02 * exact.max()
+    assert np.allclose(
+        binned_quantiles(distribution, group, [0.25, 0.5, 0.75]),
+        np.quantile(values, [0.25, 0.5, 0.75]),
+        atol=bin_width,
+    )
+
+
+def test_narrow_groups_keep_their_violins_next_to_heavy_tailed_ones() -> None:
+    rng: np.random.Generator = np.random.default_rng(0)
+    narrow: np.ndarray = rng.integers(1, 100, size=1_000).astype("float64")
+    rows: pd.DataFrame = pd.DataFrame(
+        {
+            "team": ["a"] * len(narrow) + ["b"] * (len(narrow) + 1),
+            "review_time": np.concatenate([narrow, narrow, [1e6]]),
+        }
+    )
+    distribution: BinnedDistribution = bin_distribution(
+        rows.review_time, rows.team, bins=512
+    )
+
+    support, density = binned_kde(distribution, 0)
+    exact: np.ndarray = exact_kde(narrow, support)
+    assert np.abs(density - exact).max() < 0.02 * exact.max()
+
+    ax: Axes = visualization.new_figure().add_subplot()
+    visualization.draw_binned_violins(ax, distribution)
+    widths: List[float] = [
+        np.ptp(collection.get_paths()[0].vertices[:, 0])
+        for collection in ax.collections
+        if isinstance(collection, PolyCollection)
+    ]
+    assert len(widths) == 2
+    assert min(widths) > 0
+
+
+def test_fast_distributions_render_without_the_rows(
+    visualization_svc: VisualizationService,
+    df: pd.DataFrame,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(get_settings(), "VISUALIZATION_RENDERING_WORKERS", 1)
+    monkeypatch.setattr(get_settings(), "VISUALIZATION_FAST_DISTRIBUTIONS", True)
+
+    data: FigureData = visualization.get_figure_data(df)
+    rendered: List[RenderedFigure] = visualization_svc.render_named_figures(
+        visualization.get_figure_data(df)
+    )
+
+    assert data.without_outliers is None
+    assert data.distributions is not None
+    assert len(rendered) == len(FIGURE_SPECS)
+    assert all(figure.data for figure in rendered)
+
+
+@pytest.mark.parametrize("fast_distributions", [False, True])
+def test_state_figure_data_matches_the_rows(
+    visualization_svc: VisualizationService,
+    df: pd.DataFrame,
+    fast_distributions: bool,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(get_settings(), "VISUALIZATION_RENDERING_WORKERS", 1)
+    monkeypatch.setattr(
+        get_settings(), "VISUALIZATION_FAST_DISTRIBUTIONS", fast_distributions
+    )
+    accumulator: ReportAccumulator = ReportAccumulator.from_frame(df[:40])
+    accumulator.merge(ReportAccumulator.from_frame(df[40:]))
+
+    data: FigureData = visualization.get_figure_data(df)
+    state_data: FigureData = visualization.get_state_figure_data(accumulator)
+
+    assert state_data.num_rows == data.num_rows
+    for include_outliers in [True, False]:
+        per_team: pd.DataFrame = data.per_team[include_outliers]
+        pd.testing.assert_frame_equal(
+            state_data.per_team[include_outliers],
+            per_team.set_axis(per_team.index.astype(str)),
+        )
+    assert [
+        figure.data for figure in visualization_svc.render_named_figures(state_data)
+    ] == [figure.data for figure in visualization_svc.render_named_figures(data)]
+
+
+def test_state_violins_are_drawn_from_a_bounded_sample_of_large_teams(
+    df: pd.DataFrame, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(get_settings(), "VISUALIZATION_VIOLIN_MAX_ROWS", 15)
+    data: FigureData = visualization.get_figure_data(df)
+    rows: pd.DataFrame = cast(pd.DataFrame, data.without_outliers)
+
+    state_data: FigureData = visualization.get_state_figure_data(
+        ReportAccumulator.from_frame(df)
+    )
+    sample: pd.DataFrame = cast(pd.DataFrame, state_data.without_outliers)
+
+    for column in ["review_time", "merge_time"]:
+        counts: pd.Series = rows.groupby("team")[column].value_counts()
+        sampled: pd.Series = sample.groupby("team")[column].value_counts()
+        assert sampled.groupby(level="team").sum().to_dict() == {
+            "Application": 15,
+            "Data Service": 15,
+            "Platform": 12,
+        }
+        assert (sampled <= counts.reindex(sampled.index)).all()
@@ -0,0 +1,140 @@
+import datetime as dt
+import os
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+import pytest
+from app import worker
+from app.consumer import get_stage_worker_type
+from app.core.config import get_settings
+from app.enums.worker import Lane, Stage
+from app.error import SampleNotReadyError
+from app.utils.pool import get_process_pool, process_pool
+from app.worker import QUEUES, get_lane, parse_sample, render_sample, summarize_sample
+from huey import MemoryHuey
+from huey.api import TaskWrapper
+
+
+def test_samples_are_routed_by_size(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(get_settings(), "WORKER_FAST_LANE_MAX_BYTES", 1024)
+
+    assert get_lane(1024) == Lane.FAST
+    assert get_lane(1025) == Lane.BULK
+    assert get_lane(None) == Lane.BULK
+
+
+def test_every_stage_is_queued_on_its_own_queue_per_lane() -> None:
+    tasks: Dict[Stage, Dict[Lane, TaskWrapper]] = {
+        Stage.PARSE: parse_sample,
+        Stage.STATS: summarize_sample,
+        Stage.RENDER: render_sample,
+    }
+
+    assert len({queue.name for queue in QUEUES.values()}) == len(Stage) * len(Lane)
+    for stage, task in tasks.items():
+        for lane in Lane:
+            assert task[lane].huey is QUEUES[stage, lane]
+
+
+def test_stages_using_a_process_pool_run_thread_workers(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(get_settings(), "STATS_PARALLEL_WORKERS", 1)
+    monkeypatch.setattr(get_settings(), "VISUALIZATION_RENDERING_WORKERS", 4)
+
+    assert get_stage_worker_type(Stage.PARSE) == "process"
+    assert get_stage_worker_type(Stage.STATS) == "process"
+    assert get_stage_worker_type(Stage.RENDER) == "thread"
+
+
+def test_broken_process_pool_is_replaced() -> None:
+    with pytest.raises(BrokenProcessPool):
+        with process_pool(2) as pool:
+            # a worker dying, e.g. killed for running out of memory
+            pool.submit(os._exit, 1).result()
+
+    assert get_process_pool(2) is not pool
+    assert get_process_pool(2).submit(str, 1).result() == "1"
+
+
+class NotReadySampleService:
+    """Sample service stand-in, whose samples wait for their parent forever."""
+
+    def __init__(self) -> None:
+        self.parsed: List[uuid.UUID] = []
+        self.failed: List[uuid.UUID] = []
+
+    async def parse(self, sample_id: uuid.UUID) -> None:
+        self.parsed.append(sample_id)
+        raise SampleNotReadyError("Parent sample is not processed yet")
+
+    async def fail(self, sample_id: uuid.UUID, error: str) -> None:
+        self.failed.append(sample_id)
+
+
+def test_appends_stop_waiting_after_max_retries(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    sample_svc: NotReadySampleService = NotReadySampleService()
+
+    @asynccontextmanager
+    async def sample_service() -> AsyncIterator[NotReadySampleService]:
+        yield sample_svc
+
+    queue: MemoryHuey = MemoryHuey(immediate=True)
+    monkeypatch.setattr(worker, "sample_service", sample_service)
+    monkeypatch.setattr(
+        worker, "parse_sample", {Lane.FAST: queue.task()(parse_sample[Lane.FAST].func)}
+    )
+    monkeypatch.setattr(get_settings(), "SAMPLE_APPEND_MAX_RETRIES", 3)
+    sample_id: uuid.UUID = uuid.uuid4()
+
+    worker.parse_sample[Lane.FAST](sample_id=sample_id, lane=Lane.FAST)
+    while queue.scheduled_count():
+        assert sample_svc.failed == []
+        later: dt.datetime = dt.datetime.utcnow() + dt.timedelta(
+            seconds=get_settings().SAMPLE_APPEND_RETRY_DELAY
+        )
+        for task in queue.read_schedule(later):
+            queue.execute(task, later)
+
+    assert sample_svc.parsed == [sample_id] * 4
+    assert sample_svc.failed == [sample_id]
+
+
+class BrokenSampleService(NotReadySampleService):
+    """Sample service stand-in, whose stages fail unexpectedly."""
+
+    async def parse(self, sample_id: uuid.UUID) -> None:
+        raise RuntimeError("Disk full")
+
+    async def summarize(self, sample_id: uuid.UUID) -> None:
+        raise RuntimeError("Disk full")
+
+    async def render(self, sample_id: uuid.UUID) -> None:
+        raise RuntimeError("Disk full")
+
+
+@pytest.mark.parametrize("stage", list(Stage))
+def test_samples_fail_along_with_their_stage(
+    stage: Stage, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    sample_svc: BrokenSampleService = BrokenSampleService()
+
+    @asynccontextmanager
+    async def sample_service() -> AsyncIterator[BrokenSampleService]:
+        yield sample_svc
+
+    monkeypatch.setattr(worker, "sample_service", sample_service)
+    tasks: Dict[Stage, Dict[Lane, TaskWrapper]] = {
+        Stage.PARSE: parse_sample,
+        Stage.STATS: summarize_sample,
+        Stage.RENDER: render_sample,
+    }
+    sample_id: uuid.UUID = uuid.uuid4()
+
+    with pytest.raises(RuntimeError):
+        tasks[stage][Lane.FAST].call_local(sample_id=sample_id, lane=Lane.FAST)
+    assert sample_svc.failed == [sample_id]
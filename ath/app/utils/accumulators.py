@@ -0,0 +1,427 @@
+import io
+import json
+from typing import Any, Dict, List, Optional, Set, Tuple, Union, cast
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.schemas.summary_statistics import (
+    DateInterval,
+    GroupStats,
+    NumMissingValues,
+    Report,
+)
+
+FIGURE_TIME_COLUMNS: List[str] = ["review_time", "merge_time"]
+MISSING_COLUMNS: List[str] = ["review_time", "merge_time", "date", "team"]
+# how each moment of two partial states is combined
+MOMENTS: Dict[str, str] = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+# largest count matrix `grouped_mode` builds before hashing (group, value) pairs
+DENSE_MODE_MAX_CELLS: int = 1 << 22
+
+# bumped whenever the saved state changes, older ones are recomputed
+STATE_VERSION: int = 3
+STATE_METADATA_KEY: bytes = b"ath.state"
+
+GroupKeys = Union[pd.Series, np.ndarray]
+
+
+class GroupState:
+    """Mergeable moments and value histograms of time columns, per group."""
+
+    def __init__(
+        self,
+        size: pd.Series,
+        moments: Dict[str, pd.DataFrame],
+        histograms: Dict[str, pd.Series],
+    ) -> None:
+        self.size: pd.Series = size
+        self.moments: Dict[str, pd.DataFrame] = moments
+        self.histograms: Dict[str, pd.Series] = histograms
+
+    @classmethod
+    def from_frame(cls, times: pd.DataFrame, by: GroupKeys) -> "GroupState":
+        grouped = times.groupby(by, sort=False, observed=True)
+        size: pd.Series = grouped.size()
+        moments: Dict[str, pd.DataFrame] = {
+            moment: grouped.agg(moment) for moment in MOMENTS
+        }
+        histograms: Dict[str, pd.Series] = {
+            column: times[column]
+            .groupby([by, times[column]], sort=False, observed=True)
+            .size()
+            .rename_axis(["group", "value"])
+            for column in times.columns
+        }
+        return cls(size=size, moments=moments, histograms=histograms)
+
+    def merge(self, other: "GroupState") -> "GroupState":
+        size: pd.Series = (
+            pd.concat([self.size, other.size])
+            .groupby(level=0, sort=False, observed=True)
+            .sum()
+        )
+
+        moments: Dict[str, pd.DataFrame] = {
+            moment: pd.concat([self.moments[moment], other.moments[moment]])
+            .groupby(level=0, sort=False, observed=True)
+            .agg(how)
+            for moment, how in MOMENTS.items()
+        }
+
+        histograms: Dict[str, pd.Series] = {
+            column: pd.concat([self.histograms[column], other.histograms[column]])
+            .groupby(level=["group", "value"], sort=False, observed=True)
+            .sum()
+            for column in self.histograms
+        }
+        return GroupState(size=size, moments=moments, histograms=histograms)
+
+    def dump(self) -> Tuple[Dict[str, Any], pd.DataFrame]:
+        groups: pd.Index = self.size.index
+        columns: List[str] = list(self.histograms)
+        state: Dict[str, Any] = {
+            "columns": columns,
+            "groups": groups.tolist(),
+            "size": self.size.tolist(),
+            "moments": {
+                moment: frame.reindex(groups)[columns].to_numpy().tolist()
+                for moment, frame in self.moments.items()
+            },
+        }
+        histograms: pd.DataFrame = pd.concat(
+            [
+                pd.DataFrame(
+                    {
+                        "column": column,
+                        "group": groups.get_indexer(
+                            histogram.index.get_level_values("group")
+                        ),
+                        "value": histogram.index.get_level_values("value").astype(
+                            "float64"
+                        ),
+                        "count": histogram.to_numpy(dtype="int64"),
+                    }
+                )
+                for column, histogram in self.histograms.items()
+            ],
+            ignore_index=True,
+        )
+        return state, histograms
+
+    @classmethod
+    def load(cls, state: Dict[str, Any], histograms: pd.DataFrame) -> "GroupState":
+        groups: pd.Index = pd.Index(state["groups"])
+        columns: List[str] = state["columns"]
+        by_column: Dict[str, pd.DataFrame] = {
+            column: histograms[histograms.column == column] for column in columns
+        }
+        return cls(
+            size=pd.Series(state["size"], index=groups, dtype="int64"),
+            moments={
+                moment: pd.DataFrame(values, index=groups, columns=columns)
+                for moment, values in state["moments"].items()
+            },
+            histograms={
+                column: pd.Series(
+                    rows["count"].to_numpy(),
+                    index=histogram_index(groups, rows["group"], rows["value"]),
+                )
+                for column, rows in by_column.items()
+            },
+        )
+
+    def mean(self) -> pd.DataFrame:
+        return self.moments["sum"] / self.moments["count"]
+
+    def mode(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                column: histogram_mode(histogram)
+                for column, histogram in self.histograms.items()
+            }
+        )
+
+    def median(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                column: histogram_median(histogram)
+                for column, histogram in self.histograms.items()
+            }
+        )
+
+    def stats(self) -> Dict[str, GroupStats]:
+        mean: pd.DataFrame = self.mean()
+        mode: pd.DataFrame = self.mode()
+        median: pd.DataFrame = self.median()
+        return {
+            group: GroupStats(
+                mean=dict(mean.loc[group]),
+                mode=dict(mode.loc[group]),
+                median=dict(median.loc[group]),
+                count=self.size[group],
+            )
+            for group in self.size.index
+        }
+
+
+def grouped_mode(
+    df: pd.DataFrame, by: str, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """Vectorized `df.groupby(by).agg(lambda x: min(pd.Series.mode(x)))`."""
+    columns = columns or [column for column in df.columns if column != by]
+    codes, groups = pd.factorize(df[by], sort=True)
+    modes: Dict[str, pd.Series] = {}
+    for column in columns:
+        value_codes, values = pd.factorize(df[column], sort=True)
+        valid: np.ndarray = (codes >= 0) & (value_codes >= 0)
+        if len(groups) * len(values) <= DENSE_MODE_MAX_CELLS:
+            # values are sorted, so argmax picks the smallest of the ties
+            counts: np.ndarray = np.bincount(
+                codes[valid] * len(values) + value_codes[valid],
+                minlength=len(groups) * len(values),
+            ).reshape(len(groups), len(values))
+            mode: pd.Series = pd.Series(
+                values[counts.argmax(axis=1)], index=groups
+            ).where(counts.max(axis=1) > 0)
+        else:
+            histogram: pd.Series = (
+                pd.Series(values[value_codes[valid]])
+                .groupby([codes[valid], values[value_codes[valid]]], sort=False)
+                .size()
+                .rename_axis(["group", "value"])
+            )
+            mode = histogram_mode(histogram).reindex(range(len(groups)))
+            mode.index = groups
+        modes[column] = mode
+    return pd.DataFrame(modes).rename_axis(by)
+
+
+def histogram_index(
+    groups: pd.Index, group_codes: pd.Series, values: pd.Series
+) -> pd.MultiIndex:
+    value_codes, uniques = pd.factorize(values)
+    return pd.MultiIndex(
+        levels=[groups, uniques],
+        codes=[group_codes.to_numpy(), value_codes],
+        names=["group", "value"],
+        verify_integrity=False,
+    )
+
+
+def histogram_mode(histogram: pd.Series) -> pd.Series:
+    top: pd.Series = histogram.groupby(
+        level="group", sort=False, observed=True
+    ).transform("max")
+    values: pd.DataFrame = histogram[histogram == top].index.to_frame(index=False)
+    return values.groupby("group", observed=True)["value"].min()
+
+
+def histogram_median(histogram: pd.Series) -> pd.Series:
+    histogram = histogram.sort_index()
+    grouped = histogram.groupby(level="group", observed=True)
+    total: np.ndarray = grouped.transform("sum").to_numpy()
+    frame: pd.DataFrame = pd.DataFrame(
+        {
+            "value": histogram.index.get_level_values("value"),
+            "cum": grouped.cumsum().to_numpy(),
+            "lo": (total - 1) // 2,
+            "hi": total // 2,
+        },
+        index=histogram.index.get_level_values("group"),
+    )
+    lo: pd.Series = (
+        frame[frame.cum > frame.lo].groupby(level=0, observed=True)["value"].first()
+    )
+    hi: pd.Series = (
+        frame[frame.cum > frame.hi].groupby(level=0, observed=True)["value"].first()
+    )
+    return (lo + hi) / 2
+
+
+class ReportAccumulator:
+    """Builds a summary statistics `Report` in a single pass over a sample."""
+
+    def __init__(self) -> None:
+        self.num_observations: int = 0
+        self.teams: List[str] = []
+        self.date_begin: Optional[pd.Timestamp] = None
+        self.date_end: Optional[pd.Timestamp] = None
+        self.num_prs_without_review: int = 0
+        self.num_prs_without_ci: int = 0
+        self.num_missing_values: pd.Series = pd.Series(0, index=MISSING_COLUMNS)
+        self.overall: Optional[GroupState] = None
+        self.per_team: Optional[GroupState] = None
+        # rows with both a review and a merge time, as drawn by the figures
+        self.without_outliers: Optional[GroupState] = None
+        # states merged but not combined yet, as (tree level, state), in order
+        self.pending: List[Tuple[int, "ReportAccumulator"]] = []
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "ReportAccumulator":
+        accumulator: ReportAccumulator = cls()
+        times: pd.DataFrame = df[["review_time", "merge_time"]].copy()
+        # the time columns are narrowed to their values, their sum may not fit
+        times["total_time"] = times["review_time"].astype("int64") + times["merge_time"]
+
+        accumulator.num_observations = len(df)
+        accumulator.teams = list(df.team.dropna().unique())
+        accumulator.date_begin = df.date.min()
+        accumulator.date_end = df.date.max()
+        accumulator.num_prs_without_review = int((df.review_time == 0).sum())
+        accumulator.num_prs_without_ci = int((df.merge_time == 0).sum())
+        accumulator.num_missing_values = df[MISSING_COLUMNS].isna().sum()
+        accumulator.overall = GroupState.from_frame(times, np.zeros(len(df), int))
+        accumulator.per_team = GroupState.from_frame(times, df.team)
+        inliers: pd.Series = (df.review_time != 0) & (df.merge_time != 0)
+        accumulator.without_outliers = GroupState.from_frame(
+            df.loc[inliers, FIGURE_TIME_COLUMNS], df.team[inliers]
+        )
+        return accumulator
+
+    def consume(self, chunk: pd.DataFrame) -> None:
+        if len(chunk):
+            self.merge(ReportAccumulator.from_frame(chunk))
+
+    def merge(self, other: "ReportAccumulator") -> "ReportAccumulator":
+        # combined pairwise, as a binary tree, the rest is left to `flush`
+        other.flush()
+        level: int = 0
+        while self.pending and self.pending[-1][0] == level:
+            _, previous = self.pending.pop()
+            other = previous.combine(other)
+            level += 1
+        self.pending.append((level, other))
+        return self
+
+    def flush(self) -> "ReportAccumulator":
+        pending: List[Tuple[int, ReportAccumulator]] = self.pending
+        self.pending = []
+        for _, other in pending:
+            self.combine(other)
+        return self
+
+    def combine(self, other: "ReportAccumulator") -> "ReportAccumulator":
+        if other.overall is None or other.per_team is None:
+            return self
+        if self.overall is None or self.per_team is None:
+            self.__dict__.update(other.__dict__)
+            self.teams = list(other.teams)
+            self.pending = []
+            return self
+
+        self.num_observations += other.num_observations
+        seen: Set[str] = set(self.teams)
+        self.teams += [team for team in other.teams if team not in seen]
+        self.date_begin = pd.Series([self.date_begin, other.date_begin]).min()
+        self.date_end = pd.Series([self.date_end, other.date_end]).max()
+        self.num_prs_without_review += other.num_prs_without_review
+        self.num_prs_without_ci += other.num_prs_without_ci
+        self.num_missing_values = self.num_missing_values + other.num_missing_values
+        self.overall = self.overall.merge(other.overall)
+        self.per_team = self.per_team.merge(other.per_team)
+        self.without_outliers = cast(GroupState, self.without_outliers).merge(
+            cast(GroupState, other.without_outliers)
+        )
+        return self
+
+    def dumps(self) -> bytes:
+        # the histograms as a parquet table, the rest as json in its metadata
+        self.flush()
+        state: Dict[str, Any] = {
+            "version": STATE_VERSION,
+            "num_observations": self.num_observations,
+            "teams": self.teams,
+            "date_begin": None if self.date_begin is None else str(self.date_begin),
+            "date_end": None if self.date_end is None else str(self.date_end),
+            "num_prs_without_review": self.num_prs_without_review,
+            "num_prs_without_ci": self.num_prs_without_ci,
+            "num_missing_values": {
+                column: int(count) for column, count in self.num_missing_values.items()
+            },
+            "groups": {},
+        }
+        histograms: List[pd.DataFrame] = []
+        for name, group_state in [
+            ("overall", self.overall),
+            ("per_team", self.per_team),
+            ("without_outliers", self.without_outliers),
+        ]:
+            if group_state is not None:
+                state["groups"][name], rows = group_state.dump()
+                histograms.append(rows.assign(state=name))
+
+        frame: pd.DataFrame = pd.DataFrame()
+        if histograms:
+            frame = pd.concat(histograms, ignore_index=True)
+            # dictionary encoded, read back as categoricals
+            frame = frame.astype({"column": "category", "state": "category"})
+        table: pa.Table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {STATE_METADATA_KEY: json.dumps(state).encode()}
+        )
+        buffer: io.BytesIO = io.BytesIO()
+        pq.write_table(table, buffer)
+        return buffer.getvalue()
+
+    @classmethod
+    def loads(cls, data: bytes) -> "ReportAccumulator":
+        try:
+            table: pa.Table = pq.read_table(pa.BufferReader(data))
+            state: Dict[str, Any] = json.loads(
+                table.schema.metadata[STATE_METADATA_KEY]
+            )
+        except (pa.ArrowException, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid accumulator state: {e}")
+        version: Any = state.get("version")
+        if version != STATE_VERSION:
+            raise ValueError(f"Unsupported accumulator state [{version=}]")
+
+        accumulator: ReportAccumulator = cls()
+        accumulator.num_observations = state["num_observations"]
+        accumulator.teams = state["teams"]
+        for name in ["date_begin", "date_end"]:
+            if state[name] is not None:
+                setattr(accumulator, name, pd.Timestamp(state[name]))
+        accumulator.num_prs_without_review = state["num_prs_without_review"]
+        accumulator.num_prs_without_ci = state["num_prs_without_ci"]
+        accumulator.num_missing_values = pd.Series(
+            state["num_missing_values"], index=MISSING_COLUMNS
+        )
+        if state["groups"]:
+            histograms: pd.DataFrame = table.to_pandas()
+            for name in ["overall", "per_team", "without_outliers"]:
+                setattr(
+                    accumulator,
+                    name,
+                    GroupState.load(
+                        state["groups"][name], histograms[histograms.state == name]
+                    ),
+                )
+        return accumulator
+
+    def result(self) -> Report:
+        self.flush()
+        if self.overall is None or self.per_team is None:
+            raise ValueError("Unable to build a report out of an empty sample")
+
+        (stats,) = self.overall.stats().values()
+        per_team: Dict[str, GroupStats] = self.per_team.stats()
+        return Report(
+            total_num_observations=self.num_observations,
+            teams=self.teams,
+            date_interval=DateInterval(
+                begin=self.date_begin.to_pydatetime(),  # type: ignore
+                end=self.date_end.to_pydatetime(),  # type: ignore
+            ),
+            stats=stats,
+            per_team={team: per_team[team] for team in self.teams},
+            num_prs_without_review=self.num_prs_without_review,
+            num_prs_without_ci=self.num_prs_without_ci,
+            num_missing_values=NumMissingValues.parse_obj(
+                dict(self.num_missing_values)
+            ),
+        )
@@ -0,0 +1,131 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.error import ParsingCsvError
+from app.utils.ingestion import ChunkConsumer, apply_schema
+
+SAMPLE_SCHEMA: pa.Schema = pa.schema(
+    [
+        ("review_time", pa.int64()),
+        ("merge_time", pa.int64()),
+        ("team", pa.dictionary(pa.int32(), pa.string())),
+        ("date", pa.timestamp("us")),
+    ]
+)
+
+# parquet files being written are kept in memory up to this size, then spilled
+# to a temporary file
+SPOOL_MAX_BYTES: int = 64 << 20
+
+
+def parquet_file_name(sample_file_name: str) -> str:
+    """Name of the columnar copy of a sample, stored next to its csv."""
+    return f"{sample_file_name}.parquet"
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    return pa.Table.from_pandas(
+        df[SAMPLE_SCHEMA.names], schema=SAMPLE_SCHEMA, preserve_index=False
+    )
+
+
+def from_arrow(table: pa.Table) -> pd.DataFrame:
+    # same representation as a sample parsed from csv
+    return apply_schema(table.to_pandas())
+
+
+class ParquetSink:
+    """Consumer writing each chunk as a row group of a parquet file, typed with
+    `SAMPLE_SCHEMA` (dictionary encoded teams, timestamp dates)."""
+
+    def __init__(self) -> None:
+        self.file: IO[bytes] = tempfile.SpooledTemporaryFile(
+            max_size=SPOOL_MAX_BYTES
+        )  # type: ignore
+        self.writer: pq.ParquetWriter = pq.ParquetWriter(self.file, SAMPLE_SCHEMA)
+
+    def consume(self, chunk: pd.DataFrame) -> None:
+        if len(chunk):
+            self.writer.write_table(to_arrow(chunk))
+
+    def finish(self) -> IO[bytes]:
+        """Closes the parquet file and returns it, rewound. The caller owns (and
+        has to close) it from then on."""
+        self.writer.close()
+        self.file.seek(0)
+        return self.file
+
+
+def iter_parquet_chunks(
+    path: Path, columns: Optional[List[str]] = None, chunk_rows: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """Yields the sample in the (memory mapped) parquet file at `path`, one
+    row group, or `chunk_rows` rows, at a time. Only `columns` are read."""
+    try:
+        parquet_file: pq.ParquetFile = pq.ParquetFile(path, memory_map=True)
+        if chunk_rows is None:
+            for index in range(parquet_file.num_row_groups):
+                yield from_arrow(parquet_file.read_row_group(index, columns=columns))
+            return
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield from_arrow(pa.Table.from_batches([batch]))
+    except Exception as e:
+        raise ParsingCsvError(e)
+
+
+def read_parquet(path: Path, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    try:
+        table: pa.Table = pq.read_table(path, columns=columns, memory_map=True)
+    except Exception as e:
+        raise ParsingCsvError(e)
+    return from_arrow(table)
+
+
+def stream_parquet(
+    path: Path,
+    consumers: List[ChunkConsumer],
+    columns: Optional[List[str]] = None,
+    chunk_rows: Optional[int] = None,
+) -> int:
+    """`stream_csv` counterpart for the columnar copy of a sample."""
+    num_rows: int = 0
+    for chunk in iter_parquet_chunks(path, columns=columns, chunk_rows=chunk_rows):
+        num_rows += len(chunk)
+        for consumer in consumers:
+            consumer.consume(chunk)
+    return num_rows
+
+
+def evict_parquet_files(
+    directory: Path, max_bytes: int, keep: Optional[Path] = None
+) -> int:
+    """Deletes the least recently used parquet files under `directory` (by
+    modification time, which users bump) until the rest add up to `max_bytes`
+    at most, other than `keep`. Returns the number of bytes freed.
+
+    Files memory mapped by other processes stay readable until unmapped."""
+    files: List[Tuple[float, int, Path]] = []
+    for path in directory.rglob("*.parquet"):
+        try:
+            stat: os.stat_result = path.stat()
+        except FileNotFoundError:
+            # evicted by another process meanwhile
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+
+    total_bytes: int = sum(size for _, size, _ in files)
+    freed: int = 0
+    for _, size, path in sorted(files):
+        if total_bytes - freed <= max_bytes:
+            break
+        if path == keep:
+            continue
+        path.unlink(missing_ok=True)
+        freed += size
+    return freed
@@ -0,0 +1,144 @@
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# points each density is evaluated at, as seaborn's violins
+KDE_GRID_SIZE: int = 100
+
+
+class BinnedDistribution(NamedTuple):
+    """Distribution of a column within each group, reduced to a histogram over
+    fixed bins plus the exact moments of the group. Its size, and the cost of
+    anything derived from it, only depends on the number of groups and bins,
+    not on the number of rows."""
+
+    groups: List[str]
+    edges: np.ndarray
+    """`groups x (bins + 1)` edges, spanning the values of each group, so a
+    group keeps its resolution whatever the range of the others."""
+    counts: np.ndarray
+    """`groups x bins` number of values in each bin."""
+    size: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+    """Unbiased standard deviation, `nan` for groups of less than 2 values."""
+    min: np.ndarray
+    max: np.ndarray
+
+
+def bin_distribution(
+    values: pd.Series,
+    groups: pd.Series,
+    bins: int,
+    weights: Optional[np.ndarray] = None,
+) -> BinnedDistribution:
+    """Histograms of `values` within each of the `groups`, in a single
+    vectorized pass. Categorical groups keep every category, in order.
+    `weights` are the number of times each value occurs, when the values come
+    out of a histogram themselves."""
+    valid: np.ndarray = (values.notna() & groups.notna()).to_numpy()
+    values, groups = values[valid], groups[valid]
+    if isinstance(groups.dtype, pd.CategoricalDtype):
+        codes: np.ndarray = groups.cat.codes.to_numpy()
+        uniques: pd.Index = groups.cat.categories
+    else:
+        codes, uniques = pd.factorize(groups, sort=True)
+    num_groups: int = len(uniques)
+
+    x: np.ndarray = values.to_numpy(dtype="float64")
+    w: np.ndarray = (
+        np.ones(len(x)) if weights is None else np.asarray(weights, "float64")[valid]
+    )
+    extremes: pd.DataFrame = (
+        pd.Series(x).groupby(codes).agg(["min", "max"]).reindex(range(num_groups))
+    )
+    lo: np.ndarray = extremes["min"].fillna(0.0).to_numpy()
+    hi: np.ndarray = np.maximum(extremes["max"].fillna(0.0).to_numpy(), lo)
+    # groups of a single value get a unit range, their bins are never drawn
+    width: np.ndarray = np.where(hi > lo, hi - lo, 1.0)
+    edges: np.ndarray = lo[:, None] + width[:, None] * np.linspace(0, 1, bins + 1)
+    bin_codes: np.ndarray = np.minimum(
+        ((x - lo[codes]) / width[codes] * bins).astype("int64"), bins - 1
+    )
+    counts: np.ndarray = (
+        np.bincount(codes * bins + bin_codes, weights=w, minlength=num_groups * bins)
+        .astype("int64")
+        .reshape(num_groups, bins)
+    )
+
+    size: np.ndarray = np.bincount(codes, weights=w, minlength=num_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean: np.ndarray = (
+            np.bincount(codes, weights=w * x, minlength=num_groups) / size
+        )
+        squares: np.ndarray = np.bincount(
+            codes, weights=w * np.square(x - mean[codes]), minlength=num_groups
+        )
+        std: np.ndarray = np.where(size > 1, np.sqrt(squares / (size - 1)), np.nan)
+    return BinnedDistribution(
+        groups=[str(group) for group in uniques],
+        edges=edges,
+        counts=counts,
+        size=size.astype("int64"),
+        mean=mean,
+        std=std,
+        min=extremes["min"].to_numpy(),
+        max=extremes["max"].to_numpy(),
+    )
+
+
+def binned_kde(
+    distribution: BinnedDistribution, group: int, grid_size: int = KDE_GRID_SIZE
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Gaussian KDE of a group, over `grid_size` points spanning its values, as
+    `scipy.stats.gaussian_kde` (Scott's bandwidth) would estimate out of the
+    raw values, but with every value moved to the center of its bin."""
+    support: np.ndarray = np.linspace(
+        distribution.min[group], distribution.max[group], grid_size
+    )
+    counts: np.ndarray = distribution.counts[group]
+    nonzero: np.ndarray = counts > 0
+    edges: np.ndarray = distribution.edges[group]
+    centers: np.ndarray = (edges[:-1] + edges[1:]) / 2
+    size: int = int(distribution.size[group])
+    bandwidth: float = distribution.std[group] * size ** (-1 / 5)
+    z: np.ndarray = (support[:, None] - centers[nonzero][None, :]) / bandwidth
+    density: np.ndarray = (np.exp(-0.5 * z**2) @ counts[nonzero]) / (
+        size * bandwidth * np.sqrt(2 * np.pi)
+    )
+    return support, density
+
+
+def binned_quantiles(
+    distribution: BinnedDistribution, group: int, q: List[float]
+) -> np.ndarray:
+    """Quantiles of a group, interpolated within the bins they fall in, so off
+    by at most a bin width."""
+    cumulative: np.ndarray = np.concatenate(
+        [[0], np.cumsum(distribution.counts[group])]
+    )
+    quantiles: np.ndarray = np.interp(
+        np.asarray(q) * cumulative[-1], cumulative, distribution.edges[group]
+    )
+    return np.clip(quantiles, distribution.min[group], distribution.max[group])
+
+
+def binned_whiskers(
+    distribution: BinnedDistribution, group: int, q25: float, q75: float
+) -> Tuple[float, float]:
+    """Ends of the boxplot whiskers: the most extreme values within 1.5 IQR of
+    the quartiles, to a bin width."""
+    limit: float = 1.5 * (q75 - q25)
+    edges: np.ndarray = distribution.edges[group]
+    centers: np.ndarray = (edges[:-1] + edges[1:]) / 2
+    inside: np.ndarray = (
+        (distribution.counts[group] > 0)
+        & (centers >= q25 - limit)
+        & (centers <= q75 + limit)
+    )
+    if not inside.any():
+        return q25, q75
+    low: float = max(centers[inside].min(), distribution.min[group])
+    high: float = min(centers[inside].max(), distribution.max[group])
+    return low, high
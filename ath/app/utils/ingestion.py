@@ -0,0 +1,292 @@
+import hashlib
+import io
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Protocol
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from app.error import ParsingCsvError, RowError
+
+CSV_USECOLS: List[str] = ["review_time", "merge_time", "team", "date"]
+# the integer columns are inferred, as fast as when declared, and then validated
+# (see `validate_chunk`), so bad values are reported along with their lines
+CSV_DTYPES: Dict[str, str] = {
+    "date": "str",
+    "team": "category",
+}
+CSV_DATE_FORMAT: str = "%Y-%m-%d"
+# narrowed, once parsed, to the smallest integer type holding their values
+INT_COLUMNS: List[str] = ["review_time", "merge_time"]
+# the first chunk is kept small, so a malformed csv fails before much of it is
+# downloaded and parsed
+FIRST_CHUNK_ROWS: int = 1_000
+# values at fault kept by the `ParsingCsvError` of a malformed chunk, and their
+# length, so that they fit in `parsing_error` whatever the csv holds
+MAX_ROW_ERRORS: int = 10
+MAX_ERROR_VALUE_CHARS: int = 64
+
+
+class ByteStream(Protocol):
+    """Anything a csv sample can be read from: binary files, and the
+    `io.RawIOBase` readers (`S3RangeReader`...), which are no `IO[bytes]`."""
+
+    def read(self, __size: int = ...) -> Optional[bytes]:
+        ...
+
+    def readline(self, __size: int = ...) -> bytes:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class ChunkConsumer(Protocol):
+    """Anything that can be fed, one at a time, the chunks of a csv sample."""
+
+    def consume(self, chunk: pd.DataFrame) -> None:
+        ...
+
+
+def apply_schema(chunk: pd.DataFrame) -> pd.DataFrame:
+    """In memory representation of (a chunk of) a sample, shared by every
+    service: narrowest integer times, categorical teams and `CSV_DATE_FORMAT`
+    dates."""
+    for column in INT_COLUMNS:
+        if column in chunk:
+            chunk[column] = narrow_int(chunk[column])
+    if "date" in chunk and not pd.api.types.is_datetime64_any_dtype(chunk["date"]):
+        chunk["date"] = pd.to_datetime(chunk["date"], format=CSV_DATE_FORMAT)
+    if "team" in chunk and not pd.api.types.is_categorical_dtype(chunk["team"]):
+        chunk["team"] = chunk["team"].astype("category")
+    return chunk
+
+
+def narrow_int(series: pd.Series) -> pd.Series:
+    """Smallest signed integer type holding every value of `series`."""
+    return pd.to_numeric(series, downcast="integer")
+
+
+class DataFrameCollector:
+    """Consumer that keeps every chunk and glues them back together. Only use
+    it when the whole sample is really needed in memory."""
+
+    def __init__(self) -> None:
+        self.chunks: List[pd.DataFrame] = []
+
+    def consume(self, chunk: pd.DataFrame) -> None:
+        self.chunks.append(chunk)
+
+    def result(self) -> pd.DataFrame:
+        if not self.chunks:
+            return pd.DataFrame(columns=CSV_USECOLS)
+        if len(self.chunks) > 1 and "team" in self.chunks[0]:
+            # chunks only know about their own teams, concatenating categoricals
+            # with different categories would fall back to python strings
+            teams: pd.Index = union_categoricals(
+                [chunk["team"] for chunk in self.chunks], sort_categories=True
+            ).categories
+            self.chunks = [
+                chunk.assign(team=chunk["team"].cat.set_categories(teams))
+                for chunk in self.chunks
+            ]
+        df: pd.DataFrame = pd.concat(self.chunks, ignore_index=True)
+        self.chunks = [df]
+        return df
+
+
+class HashingReader(io.RawIOBase):
+    """Read only stream wrapper feeding every byte read from `stream` to
+    `digest`, so a sample can be fingerprinted in the same pass it's parsed."""
+
+    def __init__(self, stream: ByteStream, digest: "hashlib._Hash") -> None:
+        self.stream: ByteStream = stream
+        self.digest: "hashlib._Hash" = digest
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data: bytes = self.stream.read(len(buffer)) or b""
+        buffer[: len(data)] = data
+        self.digest.update(data)
+        return len(data)
+
+    def drain(self, chunk_bytes: int = 1 << 20) -> None:
+        """Hashes whatever the parser left unread."""
+        while self.read(chunk_bytes):
+            pass
+
+
+class MappedFileReader(io.RawIOBase):
+    """Read only stream of a local file, memory mapped: reads are copied from
+    the page cache straight into the caller's buffer, without a syscall or an
+    intermediate copy each."""
+
+    def __init__(self, path: Path) -> None:
+        with path.open("rb") as file:
+            self.length: int = os.fstat(file.fileno()).st_size
+            """Size of the file, as `S3RangeReader.length`."""
+            # empty files can't be mapped
+            self.map: Optional[mmap.mmap] = (
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                if self.length
+                else None
+            )
+        if self.map is not None and hasattr(self.map, "madvise"):
+            self.map.madvise(mmap.MADV_SEQUENTIAL)
+        self.view: memoryview = memoryview(self.map or b"")
+        self.position: int = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        start: int = self.position
+        stop: int = min(start + len(buffer), self.length)
+        size: int = stop - start
+        buffer[:size] = self.view[start:stop]
+        self.position = stop
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self.view.release()
+            if self.map is not None:
+                self.map.close()
+        super().close()
+
+
+def validate_chunk(chunk: pd.DataFrame, first_line: int) -> pd.DataFrame:
+    """Checks every value of a freshly parsed chunk, whose first row is at line
+    `first_line`, and converts it to the in memory schema (see
+    `apply_schema`). Integer times must be whole numbers and dates in
+    `CSV_DATE_FORMAT`, the first `MAX_ROW_ERRORS` values that are not are
+    reported by the `ParsingCsvError` raised.
+
+    Whole numbers are checked by value, once parsed, so they may be written as
+    floats ("1.0", "1e3"), which declaring the columns as int64 used to refuse.
+    """
+    invalid: Dict[str, np.ndarray] = {}
+    for column in INT_COLUMNS:
+        if not pd.api.types.is_integer_dtype(chunk[column]):
+            values: pd.Series = pd.to_numeric(chunk[column], errors="coerce")
+            invalid[column] = (values.isna() | (values % 1 != 0)).to_numpy()
+            if not invalid[column].any():
+                chunk[column] = values.astype("int64")
+    dates: pd.Series = pd.to_datetime(
+        chunk["date"], format=CSV_DATE_FORMAT, errors="coerce"
+    )
+    invalid["date"] = (dates.isna() & chunk["date"].notna()).to_numpy()
+
+    num_invalid: int = sum(int(mask.sum()) for mask in invalid.values())
+    if num_invalid:
+        errors: List[RowError] = sorted(
+            RowError(
+                line=first_line + int(position),
+                column=column,
+                value="" if pd.isna(value) else str(value)[:MAX_ERROR_VALUE_CHARS],
+            )
+            for column, mask in invalid.items()
+            for position in np.flatnonzero(mask)[:MAX_ROW_ERRORS]
+            for value in [chunk[column].iat[position]]
+        )[:MAX_ROW_ERRORS]
+        raise ParsingCsvError(f"{num_invalid} invalid values", errors=errors)
+    chunk["date"] = dates
+    return apply_schema(chunk)
+
+
+def parse_csv(
+    buffer: ByteStream, chunk_rows: Optional[int] = None, first_line: int = 2
+) -> Iterator[pd.DataFrame]:
+    """Parses, and validates, the csv in `buffer`, whose first row is at line
+    `first_line`, the header being the line before. With `chunk_rows` the
+    first chunk is only of `FIRST_CHUNK_ROWS` rows, so the reading stops
+    early on a malformed csv."""
+    try:
+        reader = pd.read_csv(
+            buffer,
+            usecols=CSV_USECOLS,
+            header=0,
+            dtype=CSV_DTYPES,
+            chunksize=chunk_rows,
+        )
+        if chunk_rows is None:
+            yield validate_chunk(reader, first_line)
+            return
+        with reader:
+            size: int = min(chunk_rows, FIRST_CHUNK_ROWS)
+            while True:
+                try:
+                    chunk: pd.DataFrame = reader.get_chunk(size)
+                except StopIteration:
+                    return
+                yield validate_chunk(chunk, first_line)
+                first_line += len(chunk)
+                size = chunk_rows
+    except ParsingCsvError:
+        raise
+    except Exception as e:
+        raise ParsingCsvError(e)
+
+
+def iter_byte_blocks(stream: ByteStream, chunk_bytes: int) -> Iterator[bytes]:
+    """Reads `stream` in blocks of roughly `chunk_bytes` bytes, each one ending
+    on a line boundary. The csv header is repeated at the top of every block so
+    each of them can be parsed on its own."""
+    header: bytes = stream.readline()
+    remainder: bytes = b""
+    while True:
+        data: bytes = stream.read(chunk_bytes) or b""
+        if not data:
+            break
+        data = remainder + data
+        cut: int = data.rfind(b"\n") + 1
+        if not cut:
+            remainder = data
+            continue
+        remainder = data[cut:]
+        yield header + data[:cut]
+    if remainder.strip():
+        yield header + remainder
+
+
+def iter_csv_chunks(
+    stream: ByteStream,
+    chunk_rows: Optional[int] = None,
+    chunk_bytes: Optional[int] = None,
+) -> Iterator[pd.DataFrame]:
+    """Yields the sample in `stream` as bounded DataFrame chunks, either of
+    `chunk_rows` rows or of about `chunk_bytes` bytes of raw csv (the latter
+    takes precedence). With neither set the whole sample is a single chunk."""
+    if chunk_bytes:
+        first_line: int = 2
+        for block in iter_byte_blocks(stream, chunk_bytes):
+            with io.BytesIO(block) as buffer:
+                for chunk in parse_csv(buffer, first_line=first_line):
+                    first_line += len(chunk)
+                    yield chunk
+    else:
+        yield from parse_csv(stream, chunk_rows=chunk_rows)
+
+
+def stream_csv(
+    stream: ByteStream,
+    consumers: Iterable[ChunkConsumer],
+    chunk_rows: Optional[int] = None,
+    chunk_bytes: Optional[int] = None,
+) -> int:
+    """Feeds every chunk of `stream` to each of the `consumers`, in order, and
+    returns the total number of rows read."""
+    consumers = list(consumers)
+    num_rows: int = 0
+    for chunk in iter_csv_chunks(
+        stream, chunk_rows=chunk_rows, chunk_bytes=chunk_bytes
+    ):
+        num_rows += len(chunk)
+        for consumer in consumers:
+            consumer.consume(chunk)
+    return num_rows
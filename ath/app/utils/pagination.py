@@ -0,0 +1,22 @@
+import base64
+import datetime as dt
+import json
+import uuid
+from typing import Tuple
+
+Cursor = Tuple[dt.datetime, uuid.UUID]
+
+
+def encode_cursor(created_at: dt.datetime, id: uuid.UUID) -> str:
+    """Opaque keyset pagination cursor pointing right after `(created_at, id)`."""
+    data: bytes = json.dumps([created_at.isoformat(), str(id)]).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Raises `ValueError` on malformed cursors."""
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return dt.datetime.fromisoformat(created_at), uuid.UUID(id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor [{cursor=}]") from e
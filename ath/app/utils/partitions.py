@@ -0,0 +1,120 @@
+import io
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from app.error import ParsingCsvError
+from app.schemas.profiling import StageMetrics
+from app.utils.accumulators import ReportAccumulator
+from app.utils.columnar import from_arrow, to_arrow
+from app.utils.ingestion import (
+    ByteStream,
+    ChunkConsumer,
+    DataFrameCollector,
+    iter_byte_blocks,
+    stream_csv,
+)
+from app.utils.profiling import StageTimer, TimedConsumer
+
+
+class PartialReport(NamedTuple):
+    """Statistics of a partition of a sample, computed by a worker process."""
+
+    accumulator: ReportAccumulator
+    num_rows: int
+    table: Optional[pa.Table]
+    """The rows of the partition, when the caller needs them too (columnar copy,
+    plots...), typed as the columnar copy so they travel back cheaply."""
+    stages: Dict[str, StageMetrics]
+
+
+def accumulate_partition(
+    block: bytes, keep_rows: bool = False, chunk_rows: Optional[int] = None
+) -> PartialReport:
+    """Parses a block of csv lines, header included, into the statistics state
+    of its rows. Meant to run in a worker process."""
+    timer: StageTimer = StageTimer()
+    accumulator: ReportAccumulator = ReportAccumulator()
+    collector: DataFrameCollector = DataFrameCollector()
+    consumers: List[ChunkConsumer] = [TimedConsumer(accumulator, timer, "stats")]
+    if keep_rows:
+        consumers.append(collector)
+    # only timed, the rows and bytes are counted once, by the caller
+    with timer.stage("parse"), io.BytesIO(block) as buffer:
+        num_rows: int = stream_csv(buffer, consumers, chunk_rows=chunk_rows)
+    return PartialReport(
+        accumulator=accumulator,
+        num_rows=num_rows,
+        table=to_arrow(collector.result()) if keep_rows else None,
+        stages=timer.stages,
+    )
+
+
+def stream_csv_partitioned(
+    stream: ByteStream,
+    accumulator: ReportAccumulator,
+    consumers: Iterable[ChunkConsumer],
+    pool: Executor,
+    partition_bytes: int,
+    max_pending: int,
+    chunk_rows: Optional[int] = None,
+) -> Tuple[int, StageTimer]:
+    """`stream_csv` counterpart computing the statistics of the sample in
+    `pool`: `stream` is cut in partitions of about `partition_bytes` bytes of
+    whole lines, each one parsed and summarized by a worker, at most
+    `max_pending` at a time, and merged back into `accumulator` in order, so the
+    report is exactly the one a single pass builds. `consumers` are fed the
+    rows of each partition, in order too.
+
+    Returns the number of rows read and the stages of the workers."""
+    consumers = list(consumers)
+    workers: StageTimer = StageTimer()
+    pending: Deque["Future[PartialReport]"] = deque()
+    num_rows: int = 0
+
+    def result(future: "Future[PartialReport]") -> PartialReport:
+        try:
+            return future.result()
+        except ParsingCsvError as e:
+            # the lines of a partition are counted from its own top
+            e.errors = [
+                error._replace(line=error.line + num_rows) for error in e.errors
+            ]
+            raise
+
+    def merge(partial: PartialReport) -> None:
+        nonlocal num_rows
+        num_rows += partial.num_rows
+        accumulator.merge(partial.accumulator)
+        workers.merge(partial.stages)
+        if partial.table is not None:
+            chunk: pd.DataFrame = from_arrow(partial.table)
+            for consumer in consumers:
+                consumer.consume(chunk)
+
+    def failed(future: "Future[PartialReport]") -> bool:
+        return future.done() and future.exception() is not None
+
+    try:
+        blocks: Iterator[bytes] = iter_byte_blocks(stream, partition_bytes)
+        # a malformed csv stops the reading as soon as a worker reports it, its
+        # error is raised once the partitions before it are merged
+        while not any(failed(future) for future in pending):
+            block: Optional[bytes] = next(blocks, None)
+            if block is None:
+                break
+            pending.append(
+                pool.submit(accumulate_partition, block, bool(consumers), chunk_rows)
+            )
+            if len(pending) >= max_pending:
+                merge(result(pending.popleft()))
+        while pending:
+            merge(result(pending.popleft()))
+    finally:
+        # on failure, the partitions not started yet are dropped
+        for future in pending:
+            future.cancel()
+    return num_rows, workers
@@ -0,0 +1,53 @@
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+process_pools: Dict[int, ProcessPoolExecutor] = {}
+process_pools_lock: threading.Lock = threading.Lock()
+
+
+def get_process_pool(max_workers: int) -> Executor:
+    """Long lived, per process, pool of `max_workers` worker processes, shared
+    by every thread.
+
+    Workers are spawned (not forked) so they never inherit threads, sockets or
+    event loops from the caller. Daemonic processes, as huey's process workers,
+    cannot have any: the consumers of the stages using a pool run thread
+    workers instead (see `app.consumer`)."""
+    with process_pools_lock:
+        pool: Optional[ProcessPoolExecutor] = process_pools.get(max_workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            process_pools[max_workers] = pool
+        return pool
+
+
+@contextmanager
+def process_pool(max_workers: int) -> Iterator[Executor]:
+    """`get_process_pool`, dropped when one of its workers dies (e.g. killed
+    for running out of memory), as a broken pool fails every later task. The
+    next caller gets a new one."""
+    pool: Executor = get_process_pool(max_workers)
+    try:
+        yield pool
+    except BrokenProcessPool:
+        with process_pools_lock:
+            if process_pools.get(max_workers) is pool:
+                del process_pools[max_workers]
+        pool.shutdown(wait=False)
+        raise
+
+
+def shutdown_process_pools() -> None:
+    """Stops the workers of every pool of this process."""
+    with process_pools_lock:
+        pools: List[ProcessPoolExecutor] = list(process_pools.values())
+        process_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
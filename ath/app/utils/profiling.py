@@ -0,0 +1,129 @@
+import io
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from app.schemas.profiling import StageMetrics
+from app.utils.ingestion import ByteStream, ChunkConsumer
+
+try:
+    import resource
+except ImportError:  # pragma: no cover, not available on windows
+    resource = None  # type: ignore
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """High water mark of the resident memory of the current process."""
+    if resource is None:
+        return None
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _Frame:
+    def __init__(self) -> None:
+        self.wall: float = time.perf_counter()
+        self.cpu: float = time.process_time()
+        self.nested_wall: float = 0.0
+        self.nested_cpu: float = 0.0
+
+
+class StageTimer:
+    """Wall time, cpu time, peak RSS and rows/bytes processed by each named
+    stage of a job. Recording a stage more than once accumulates it.
+
+    Stages may be nested, e.g. the chunks consumed while parsing, in which case
+    the time of the inner ones is not counted in the outer one.
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, StageMetrics] = {}
+        self._frames: List[_Frame] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        """Times the body of the `with` block, the yielded metrics can be used
+        to report the rows/bytes it processed."""
+        metrics: StageMetrics = StageMetrics()
+        frame: _Frame = _Frame()
+        self._frames.append(frame)
+        try:
+            yield metrics
+        finally:
+            self._frames.pop()
+            wall: float = time.perf_counter() - frame.wall
+            cpu: float = time.process_time() - frame.cpu
+            metrics.wall_seconds = wall - frame.nested_wall
+            metrics.cpu_seconds = cpu - frame.nested_cpu
+            metrics.peak_rss_bytes = peak_rss_bytes()
+            self.add(name, metrics, nested_wall=wall, nested_cpu=cpu)
+
+    def add(
+        self,
+        name: str,
+        metrics: StageMetrics,
+        nested_wall: Optional[float] = None,
+        nested_cpu: Optional[float] = None,
+    ) -> None:
+        if self._frames:
+            # excluded from the stage it is nested in
+            self._frames[-1].nested_wall += (
+                metrics.wall_seconds if nested_wall is None else nested_wall
+            )
+            self._frames[-1].nested_cpu += (
+                metrics.cpu_seconds if nested_cpu is None else nested_cpu
+            )
+        if name not in self.stages:
+            self.stages[name] = metrics.copy()
+            return
+        self.stages[name] = self.stages[name].merge(metrics)
+
+    def merge(self, stages: Dict[str, StageMetrics]) -> None:
+        """Adds stages recorded elsewhere, e.g. by a worker process."""
+        for name, metrics in stages.items():
+            self.add(name, metrics)
+
+    def dict(self) -> Dict[str, Dict[str, Any]]:
+        return {name: metrics.dict() for name, metrics in self.stages.items()}
+
+
+class TimedReader(io.RawIOBase):
+    """Read only stream wrapper recording the time spent waiting on, and the
+    bytes read from, `stream` as the `name` stage of `timer`."""
+
+    def __init__(self, stream: ByteStream, timer: StageTimer, name: str) -> None:
+        self.stream: ByteStream = stream
+        self.timer: StageTimer = timer
+        self.name: str = name
+        self.num_bytes: int = 0
+        """Bytes read through this reader, `timer` may count other reads too."""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        with self.timer.stage(self.name) as metrics:
+            data: bytes = self.stream.read(len(buffer)) or b""
+            metrics.num_bytes = len(data)
+        buffer[: len(data)] = data
+        self.num_bytes += len(data)
+        return len(data)
+
+
+class TimedConsumer:
+    """`ChunkConsumer` wrapper recording the time `consumer` spends on, and
+    the rows of, every chunk as the `name` stage of `timer`."""
+
+    def __init__(self, consumer: ChunkConsumer, timer: StageTimer, name: str) -> None:
+        self.consumer: ChunkConsumer = consumer
+        self.timer: StageTimer = timer
+        self.name: str = name
+
+    def consume(self, chunk: pd.DataFrame) -> None:
+        with self.timer.stage(self.name) as metrics:
+            self.consumer.consume(chunk)
+            metrics.num_rows = len(chunk)
@@ -1,7 +1,14 @@
 import io
-from typing import Any
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Any, Deque, Iterable, Iterator, List, Optional, Tuple
 
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
 from app.core.config import Settings, get_settings
 
@@ -33,15 +40,234 @@ def s3_csv_url(filename) -> str:
     return url
 
 
-def s3_upload_file_from_memory(data: bytes, file_name: str, bucket: str) -> None:
-    s3_url: str = f"http://" f"{settings.S3_HOST}:{settings.S3_PORT}"
-    s3 = boto3.resource(
-        "s3",
-        endpoint_url=s3_url,
-        region_name=settings.S3_REGION,
-        aws_access_key_id=settings.S3_ACCESS_KEY,
-        aws_secret_access_key=settings.S3_SECRET_KEY,
+class S3Runtime:
+    """Long lived S3 client, shared by every caller (and thread) of the current
+    process: a single session, credentials lookup and http connection pool, and
+    the threads transferring over it."""
+
+    def __init__(self) -> None:
+        self.pid: int = os.getpid()
+        s3_url: str = f"http://" f"{settings.S3_HOST}:{settings.S3_PORT}"
+        session: boto3.session.Session = boto3.session.Session()
+        self.client: Any = session.client(
+            "s3",
+            endpoint_url=s3_url,
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY,
+            aws_secret_access_key=settings.S3_SECRET_KEY,
+            config=Config(
+                max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": settings.S3_MAX_ATTEMPTS, "mode": "standard"},
+            ),
+        )
+        self.upload_pool: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=settings.S3_UPLOAD_CONCURRENCY, thread_name_prefix="s3-upload"
+        )
+        self.download_pool: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=settings.S3_DOWNLOAD_CONCURRENCY,
+            thread_name_prefix="s3-download",
+        )
+
+
+s3_runtime: Optional[S3Runtime] = None
+s3_runtime_lock: threading.Lock = threading.Lock()
+
+
+def get_s3_runtime() -> S3Runtime:
+    global s3_runtime
+    with s3_runtime_lock:
+        if s3_runtime is None or s3_runtime.pid != os.getpid():
+            # forked processes never reuse their parent's connections
+            s3_runtime = S3Runtime()
+        return s3_runtime
+
+
+def reset_s3_runtime() -> None:
+    """Drops the client of the current process, e.g. once the settings it was
+    created with change."""
+    global s3_runtime
+    with s3_runtime_lock:
+        s3_runtime = None
+
+
+def get_s3_client() -> Any:
+    return get_s3_runtime().client
+
+
+def s3_download_range(
+    file_name: str,
+    bucket: str,
+    start: int,
+    end: int,
+    cancelled: Optional[threading.Event] = None,
+) -> bytearray:
+    """Bytes `[start, end)` of an object, read into a buffer allocated once.
+    The transfer is dropped, and `IOError` raised, once `cancelled` is set."""
+    client: Any = get_s3_client()
+    response: Any = client.get_object(
+        Bucket=bucket, Key=file_name, Range=f"bytes={start}-{end - 1}"
+    )
+    part: bytearray = bytearray(end - start)
+    with memoryview(part) as view:
+        offset: int = 0
+        for data in response["Body"].iter_chunks(1 << 20):
+            if cancelled is not None and cancelled.is_set():
+                response["Body"].close()
+                break
+            stop: int = offset + len(data)
+            view[offset:stop] = data
+            offset = stop
+    if offset != len(part):
+        raise IOError(f"Short read [{file_name=}, {start=}, {end=}, {offset=}]")
+    return part
+
+
+class S3RangeReader(io.RawIOBase):
+    """Read only stream of an S3 object, downloaded as range requests of
+    `part_bytes` bytes, up to `concurrency` of them at once, ahead of the
+    reader. Parts are read in order, so memory is bounded by `concurrency`
+    parts whatever the size of the object.
+
+    A single http stream is capped by the throughput of one connection, which
+    is far below that of the object store, or of the network."""
+
+    def __init__(
+        self,
+        file_name: str,
+        bucket: str,
+        size: int,
+        part_bytes: int,
+        concurrency: int,
+    ) -> None:
+        self.file_name: str = file_name
+        self.bucket: str = bucket
+        self.length: int = size
+        """Size of the object, as `http.client.HTTPResponse.length`."""
+        self.part_bytes: int = part_bytes
+        self.concurrency: int = max(concurrency, 1)
+        self.parts: Iterator[int] = iter(range(0, size, part_bytes))
+        self.pending: Deque["Future[bytearray]"] = deque()
+        self.current: memoryview = memoryview(b"")
+        self.cancelled: threading.Event = threading.Event()
+        self.fill()
+
+    def fill(self) -> None:
+        pool: ThreadPoolExecutor = get_s3_runtime().download_pool
+        while len(self.pending) < self.concurrency:
+            start: Optional[int] = next(self.parts, None)
+            if start is None:
+                return
+            end: int = min(start + self.part_bytes, self.length)
+            self.pending.append(
+                pool.submit(
+                    s3_download_range,
+                    self.file_name,
+                    self.bucket,
+                    start,
+                    end,
+                    self.cancelled,
+                )
+            )
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        while not self.current:
+            if not self.pending:
+                return 0
+            self.current = memoryview(self.pending.popleft().result())
+            self.fill()
+        size: int = min(len(buffer), len(self.current))
+        buffer[:size] = self.current[:size]
+        self.current = self.current[size:]
+        return size
+
+    def close(self) -> None:
+        self.cancelled.set()
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.current = memoryview(b"")
+        super().close()
+
+
+def s3_open(file_name: str, bucket: str) -> S3RangeReader:
+    """Streams an object, downloaded in parallel range requests of
+    `S3_DOWNLOAD_PART_BYTES` bytes, `S3_DOWNLOAD_CONCURRENCY` at a time."""
+    client: Any = get_s3_client()
+    size: int = client.head_object(Bucket=bucket, Key=file_name)["ContentLength"]
+    return S3RangeReader(
+        file_name,
+        bucket,
+        size=size,
+        part_bytes=settings.S3_DOWNLOAD_PART_BYTES,
+        concurrency=settings.S3_DOWNLOAD_CONCURRENCY,
     )
-    client: Any = s3.meta.client
-    with io.BytesIO(data) as f:
-        client.upload_fileobj(f, bucket, file_name)
+
+
+def s3_upload_file_from_memory(data: bytes, file_name: str, bucket: str) -> None:
+    client: Any = get_s3_client()
+    client.put_object(Bucket=bucket, Key=file_name, Body=data)
+
+
+def s3_upload_fileobj(fileobj: IO[bytes], file_name: str, bucket: str) -> None:
+    """Uploads a (possibly large) file object, in parallel parts past the
+    client multipart threshold."""
+    client: Any = get_s3_client()
+    client.upload_fileobj(fileobj, bucket, file_name)
+
+
+def s3_download_file(file_name: str, bucket: str, path: Path) -> bool:
+    """Downloads an object to `path`, atomically, returning whether it exists."""
+    client: Any = get_s3_client()
+    partial: Path = path.with_name(f"{path.name}.part")
+    try:
+        client.download_file(bucket, file_name, str(partial))
+        os.replace(partial, path)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return False
+        raise
+    finally:
+        # left behind by failed downloads
+        partial.unlink(missing_ok=True)
+    return True
+
+
+def s3_object_exists(file_name: str, bucket: str) -> bool:
+    client: Any = get_s3_client()
+    try:
+        client.head_object(Bucket=bucket, Key=file_name)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return False
+        raise
+    return True
+
+
+def s3_download_to_memory(file_name: str, bucket: str) -> Optional[bytes]:
+    """Contents of a (small) object, `None` if it does not exist."""
+    client: Any = get_s3_client()
+    try:
+        response: Any = client.get_object(Bucket=bucket, Key=file_name)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return None
+        raise
+    return response["Body"].read()
+
+
+def s3_upload_files_from_memory(
+    files: Iterable[Tuple[bytes, str]], bucket: str
+) -> None:
+    """Uploads every `(data, file_name)` pair at once, at most
+    `S3_UPLOAD_CONCURRENCY` at a time, over the shared client connection pool.
+    Failed requests are retried by the client (`S3_MAX_ATTEMPTS`)."""
+    pool: ThreadPoolExecutor = get_s3_runtime().upload_pool
+    futures: List[Future] = [
+        pool.submit(s3_upload_file_from_memory, data, file_name, bucket)
+        for data, file_name in files
+    ]
+    for future in futures:
+        future.result()
@@ -1,4 +1,9 @@
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
 from app.core.config import Settings, get_settings
+from app.schemas.tusd import HttpRequest, Upload
 
 settings: Settings = get_settings()
 
@@ -11,3 +16,57 @@ def tusd_upload_url() -> str:
         f"{settings.TUSD_ENDPOINT}"
     )
     return url
+
+
+def tusd_file_path(file_name: str) -> Optional[Path]:
+    """Local path of an upload tusd stored on a filesystem this host shares
+    (see `TUSD_FILESTORE_DIR`), `None` if it is not there."""
+    if not settings.TUSD_FILESTORE_DIR:
+        return None
+    path: Path = Path(settings.TUSD_FILESTORE_DIR) / Path(file_name).name
+    return path if path.is_file() else None
+
+
+def upload_rejection(upload: Upload) -> Optional[str]:
+    """Why an upload is refused out of what it declares, its size and metadata
+    (see `UPLOAD_*`), `None` if it is admitted. Only looks at the hook body, so
+    bad uploads are turned down before anything else is done."""
+    metadata: dict = upload.metadata
+    missing: List[str] = [
+        key
+        for key in ["upload_id", *settings.UPLOAD_REQUIRED_METADATA]
+        if not metadata.get(key)
+    ]
+    if missing:
+        return f"Missing upload metadata [{missing=}]"
+    try:
+        uuid.UUID(metadata["upload_id"])
+    except ValueError:
+        return f"Invalid upload id [upload_id={metadata['upload_id']!r}]"
+
+    if settings.UPLOAD_MAX_BYTES is not None:
+        if upload.size_is_deferred:
+            return "Upload size must be declared upfront"
+        if upload.size > settings.UPLOAD_MAX_BYTES:
+            return f"Upload too large [{upload.size=}, {settings.UPLOAD_MAX_BYTES=}]"
+
+    filetype: Optional[str] = metadata.get("filetype")
+    if filetype and filetype not in settings.UPLOAD_FILETYPES:
+        return f"Unsupported file type [{filetype=}]"
+
+    row_count: Optional[str] = metadata.get("row_count")
+    if row_count:
+        if not row_count.isdigit():
+            return f"Invalid row count [{row_count=}]"
+        if settings.UPLOAD_MAX_ROWS is not None and (
+            int(row_count) > settings.UPLOAD_MAX_ROWS
+        ):
+            return f"Too many rows [{row_count=}, {settings.UPLOAD_MAX_ROWS=}]"
+    return None
+
+
+def upload_client(http_request: HttpRequest) -> str:
+    """Address of the client behind an upload request (`host:port`), as seen
+    by tusd."""
+    host, _, _ = http_request.remote_addr.rpartition(":")
+    return (host or http_request.remote_addr).strip("[]")
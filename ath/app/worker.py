@@ -1,11 +1,24 @@
 import asyncio
 import logging
+import os
+import threading
 import uuid
+from contextlib import asynccontextmanager
 from functools import wraps
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
 
 from huey import RedisHuey
+from huey.api import TaskWrapper
+from redis import ConnectionPool  # type: ignore
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import sessionmaker
 
-from app.db.session import async_session_factory, engine
+from app.core.config import Settings, get_settings
+from app.core.metrics import instrument_huey, mark_process_dead
+from app.db.session import create_engine, create_session_factory
+from app.enums.worker import Lane, Stage
+from app.error import SampleNotReadyError
+from app.schemas.sample import ParsedSample
 from app.services.sample import SampleService
 from app.services.sample import create_service as create_sample_service
 from app.services.summary_statistics import SummaryStatisticsService
@@ -14,39 +27,185 @@ from app.services.summary_statistics import (
 )
 from app.services.visualization import VisualizationService
 from app.services.visualization import create_service as create_visualization_service
+from app.utils.pool import shutdown_process_pools
+
+settings: Settings = get_settings()
 
 logger: logging.Logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 logger.handlers = []
 
 
-huey: RedisHuey = RedisHuey("nbapi", immediate=False, host="redis")
+# Every stage of the processing of a sample is a task of its own queues, one
+# per lane (by size of the sample), each drained by its own consumer (see
+# `app.consumer`), so that small samples are never queued behind large ones
+redis_pool: ConnectionPool = ConnectionPool(host="redis")
+QUEUES: Dict[Tuple[Stage, Lane], RedisHuey] = {
+    (stage, lane): RedisHuey(
+        f"ath-{stage.value}-{lane.value}",
+        immediate=False,
+        connection_pool=redis_pool,
+    )
+    for stage in Stage
+    for lane in Lane
+}
+for queue in QUEUES.values():
+    instrument_huey(queue)
+
+
+class WorkerRuntime(threading.local):
+    """One event loop per worker (a process, or a thread, see `app.consumer`),
+    kept for the life of the worker, with its own async engine (its pool of warm
+    db connections is bound to the loop they were opened on), so they can be
+    reused by every task."""
+
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    engine: Optional[AsyncEngine] = None
+    session_factory: Optional[sessionmaker] = None
+
+
+worker_runtime: WorkerRuntime = WorkerRuntime()
+# workers running in this process, the last one to stop releases what they share
+worker_runtimes: int = 0
+worker_runtimes_lock: threading.Lock = threading.Lock()
+
+
+def get_worker_event_loop() -> asyncio.AbstractEventLoop:
+    if worker_runtime.loop is None or worker_runtime.loop.is_closed():
+        worker_runtime.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(worker_runtime.loop)
+    return worker_runtime.loop
 
 
-def run_on_new_event_loop(aio_func):
+def get_worker_session_factory() -> sessionmaker:
+    if worker_runtime.session_factory is None:
+        worker_runtime.engine = create_engine()
+        worker_runtime.session_factory = create_session_factory(worker_runtime.engine)
+    return worker_runtime.session_factory
+
+
+def run_on_worker_event_loop(aio_func):
     @wraps(aio_func)
     def wrapper_decorator(*args, **kwargs):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        ret = loop.run_until_complete(aio_func(*args, **kwargs))
-        loop.close()
-
-        return ret
+        loop: asyncio.AbstractEventLoop = get_worker_event_loop()
+        return loop.run_until_complete(aio_func(*args, **kwargs))
 
     return wrapper_decorator
 
 
-@huey.task()
-@run_on_new_event_loop
-async def process_sample(sample_id: uuid.UUID) -> None:
-    async with async_session_factory() as db:
+def start_worker_runtime() -> None:
+    global worker_runtimes
+    with worker_runtimes_lock:
+        worker_runtimes += 1
+    get_worker_event_loop()
+
+
+def stop_worker_runtime() -> None:
+    global worker_runtimes
+    with worker_runtimes_lock:
+        worker_runtimes -= 1
+        last: bool = worker_runtimes <= 0
+    if last:
+        mark_process_dead(os.getpid())
+        shutdown_process_pools()
+
+    loop: Optional[asyncio.AbstractEventLoop] = worker_runtime.loop
+    if loop is None or loop.is_closed():
+        return
+    if worker_runtime.engine is not None:
+        logger.debug("Disposing db engine...")
+        loop.run_until_complete(worker_runtime.engine.dispose())
+    loop.run_until_complete(loop.shutdown_asyncgens())
+    loop.close()
+    worker_runtime.loop = None
+    worker_runtime.engine = None
+    worker_runtime.session_factory = None
+
+
+for queue in QUEUES.values():
+    queue.on_startup()(start_worker_runtime)
+    queue.on_shutdown()(stop_worker_runtime)
+
+
+def stage_task(stage: Stage, **kwargs: Any) -> Callable[..., Dict[Lane, TaskWrapper]]:
+    """Registers the decorated function as a task of every lane of `stage`,
+    enqueued with `task[lane](...)`."""
+
+    def decorator(func: Callable) -> Dict[Lane, TaskWrapper]:
+        return {lane: QUEUES[stage, lane].task(**kwargs)(func) for lane in Lane}
+
+    return decorator
+
+
+@asynccontextmanager
+async def sample_service() -> AsyncIterator[SampleService]:
+    async with get_worker_session_factory()() as db:
         summary_statistics_svc: SummaryStatisticsService = (
             await create_summary_statistics_service(db)
         )
         visualization_svc: VisualizationService = await create_visualization_service(db)
-        sample_svc: SampleService = await create_sample_service(
-            db, summary_statistics_svc, visualization_svc
-        )
-        await sample_svc.process(sample_id=sample_id)
+        yield await create_sample_service(db, summary_statistics_svc, visualization_svc)
+
+
+def get_lane(size: Optional[int]) -> Lane:
+    """Lane of a sample of `size` bytes, the bulk one when it is unknown."""
+    if size is not None and size <= settings.WORKER_FAST_LANE_MAX_BYTES:
+        return Lane.FAST
+    return Lane.BULK
+
+
+def enqueue_sample(sample_id: uuid.UUID, size: Optional[int] = None) -> None:
+    """Queues the processing of a sample, every stage on the lane of its
+    size."""
+    lane: Lane = get_lane(size)
+    parse_sample[lane](sample_id=sample_id, lane=lane)
+
+
+@stage_task(Stage.PARSE)
+@run_on_worker_event_loop
+async def parse_sample(sample_id: uuid.UUID, lane: Lane, attempt: int = 0) -> None:
+    async with sample_service() as sample_svc:
+        try:
+            parsed: Optional[ParsedSample] = await sample_svc.parse(sample_id)
+        except SampleNotReadyError as e:
+            # appends wait for the sample they append to, for so long. Counted
+            # here, huey's retry count of a requeued task stays the same
+            if attempt >= settings.SAMPLE_APPEND_MAX_RETRIES:
+                logger.warning(f"Giving up, {e}")
+                await sample_svc.fail(sample_id, error=f"Timed out waiting, {e}")
+                return
+            logger.info(f"Retrying later, {e}")
+            parse_sample[lane].schedule(
+                kwargs={"sample_id": sample_id, "lane": lane, "attempt": attempt + 1},
+                delay=settings.SAMPLE_APPEND_RETRY_DELAY,
+            )
+            return
+        except Exception as e:
+            # not left at the status of an unfinished stage
+            await sample_svc.fail(sample_id, error=f"Parsing failed, {e}")
+            raise
+    if parsed is not None:
+        summarize_sample[lane](sample_id=sample_id, lane=lane)
+
+
+@stage_task(Stage.STATS)
+@run_on_worker_event_loop
+async def summarize_sample(sample_id: uuid.UUID, lane: Lane) -> None:
+    async with sample_service() as sample_svc:
+        try:
+            await sample_svc.summarize(sample_id)
+        except Exception as e:
+            await sample_svc.fail(sample_id, error=f"Summarizing failed, {e}")
+            raise
+    render_sample[lane](sample_id=sample_id, lane=lane)
+
 
-    await engine.dispose()
+@stage_task(Stage.RENDER)
+@run_on_worker_event_loop
+async def render_sample(sample_id: uuid.UUID, lane: Lane) -> None:
+    async with sample_service() as sample_svc:
+        try:
+            await sample_svc.render(sample_id)
+        except Exception as e:
+            await sample_svc.fail(sample_id, error=f"Rendering failed, {e}")
+            raise
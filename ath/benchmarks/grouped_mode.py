@@ -0,0 +1,69 @@
+"""Per team mode: `groupby().agg(lambda)` vs the vectorized `grouped_mode`.
+
+Usage (from the `ath` directory):
+
+    python -m benchmarks.grouped_mode --num-rows 1000000 --teams 10 100 1000 10000
+"""
+import argparse
+import timeit
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+from rich import print
+from rich.table import Table
+
+from app.utils.accumulators import grouped_mode
+
+
+def gen_sample(num_rows: int, num_teams: int, seed: int = 0) -> pd.DataFrame:
+    rng: np.random.Generator = np.random.default_rng(seed)
+    df: pd.DataFrame = pd.DataFrame(
+        {
+            "review_time": rng.integers(0, 10_000, num_rows),
+            "merge_time": rng.integers(0, 10_000, num_rows),
+            "team": rng.integers(0, num_teams, num_rows).astype(str),
+        }
+    )
+    df["total_time"] = df["review_time"] + df["merge_time"]
+    return df
+
+
+def lambda_mode(df: pd.DataFrame) -> pd.DataFrame:
+    return df.groupby(by="team").agg(lambda x: min(pd.Series.mode(x)))
+
+
+def vectorized_mode(df: pd.DataFrame) -> pd.DataFrame:
+    return grouped_mode(df, by="team")
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main(num_rows: int, teams: List[int], repeat: int) -> None:
+    table: Table = Table(title=f"Per team mode, {num_rows} rows (best of {repeat})")
+    for column in ("teams", "lambda (s)", "vectorized (s)", "speedup"):
+        table.add_column(column, justify="right")
+
+    for num_teams in teams:
+        df: pd.DataFrame = gen_sample(num_rows, num_teams)
+        pd.testing.assert_frame_equal(vectorized_mode(df), lambda_mode(df))
+        t_lambda: float = best_of(lambda: lambda_mode(df), repeat)
+        t_vectorized: float = best_of(lambda: vectorized_mode(df), repeat)
+        table.add_row(
+            f"{num_teams}",
+            f"{t_lambda:.3f}",
+            f"{t_vectorized:.3f}",
+            f"{t_lambda / t_vectorized:.1f}x",
+        )
+    print(table)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-rows", type=int, default=1_000_000)
+    parser.add_argument("--teams", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args: argparse.Namespace = parser.parse_args()
+    main(num_rows=args.num_rows, teams=args.teams, repeat=args.repeat)
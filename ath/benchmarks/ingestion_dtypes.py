@@ -0,0 +1,105 @@
+"""Sample representation: 64 bit ints, object teams and inferred dates vs the
+ingestion schema (narrowest ints, categorical teams, fixed format dates).
+
+Usage (from the `ath` directory):
+
+    python -m benchmarks.ingestion_dtypes --num-rows 10000000 --teams 100
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+from rich import print
+from rich.table import Table
+
+from app.utils.accumulators import grouped_mode
+from app.utils.ingestion import CSV_USECOLS, iter_csv_chunks
+
+from .grouped_mode import best_of
+from .synthetic import write_sample_csv
+
+
+def read_legacy(path: Path) -> pd.DataFrame:
+    """How samples were parsed before the ingestion schema."""
+    return pd.read_csv(
+        path,
+        parse_dates=["date"],
+        usecols=CSV_USECOLS,
+        header=0,
+        dtype={"review_time": "int", "merge_time": "int", "date": "str", "team": "str"},
+    )
+
+
+def read_compact(path: Path) -> pd.DataFrame:
+    with open(path, "rb") as stream:
+        (df,) = iter_csv_chunks(stream)
+    return df
+
+
+def timed(func: Callable[[], pd.DataFrame]) -> Tuple[pd.DataFrame, float]:
+    start: float = time.perf_counter()
+    df: pd.DataFrame = func()
+    return df, time.perf_counter() - start
+
+
+def groupbys(df: pd.DataFrame) -> Dict[str, Callable[[], object]]:
+    sub: pd.DataFrame = df[["review_time", "merge_time", "team"]]
+    return {
+        "groupby mean": lambda: sub.groupby("team", observed=True).mean(),
+        "groupby median": lambda: sub.groupby("team", observed=True).median(),
+        "groupby size": lambda: sub.groupby("team", observed=True).size(),
+        "grouped_mode": lambda: grouped_mode(sub, by="team"),
+    }
+
+
+def main(num_rows: int, num_teams: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path: Path = Path(tmp) / "sample.csv"
+        write_sample_csv(path, num_rows, num_teams)
+        legacy, t_legacy = timed(lambda: read_legacy(path))
+        compact, t_compact = timed(lambda: read_compact(path))
+
+    table: Table = Table(
+        title=f"{num_rows} rows, {num_teams} teams (timings best of {repeat})"
+    )
+    for column in ("", "legacy", "compact", "ratio"):
+        table.add_column(column, justify="right")
+
+    mb_legacy: float = legacy.memory_usage(deep=True).sum() / 2**20
+    mb_compact: float = compact.memory_usage(deep=True).sum() / 2**20
+    table.add_row(
+        "memory (MiB)",
+        f"{mb_legacy:.0f}",
+        f"{mb_compact:.0f}",
+        f"{mb_legacy / mb_compact:.1f}x",
+    )
+    table.add_row(
+        "parse (s)",
+        f"{t_legacy:.2f}",
+        f"{t_compact:.2f}",
+        f"{t_legacy / t_compact:.1f}x",
+    )
+    legacy_groupbys: Dict[str, Callable[[], object]] = groupbys(legacy)
+    compact_groupbys: Dict[str, Callable[[], object]] = groupbys(compact)
+    for name in legacy_groupbys:
+        t_before: float = best_of(legacy_groupbys[name], repeat)
+        t_after: float = best_of(compact_groupbys[name], repeat)
+        table.add_row(
+            f"{name} (s)",
+            f"{t_before:.3f}",
+            f"{t_after:.3f}",
+            f"{t_before / t_after:.1f}x",
+        )
+    print(table)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-rows", type=int, default=10_000_000)
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args: argparse.Namespace = parser.parse_args()
+    main(num_rows=args.num_rows, num_teams=args.teams, repeat=args.repeat)
@@ -0,0 +1,119 @@
+"""Statistics of a large csv: a single pass vs `stream_csv_partitioned` over a
+pool of 1 to N worker processes.
+
+Usage (from the `ath` directory):
+
+    python -m benchmarks.parallel_stats --num-rows 10000000 --workers 1 2 4 8 16 32
+
+The csv is read from a local file, so the timings are those of parsing and
+summarizing it, not of downloading it. Pools are started, and warmed up, before
+being timed.
+"""
+import argparse
+import os
+import tempfile
+import timeit
+from pathlib import Path
+from typing import Callable, List
+
+from rich import print
+from rich.table import Table
+
+from app.schemas.summary_statistics import Report
+from app.utils.accumulators import ReportAccumulator
+from app.utils.ingestion import stream_csv
+from app.utils.partitions import stream_csv_partitioned
+from app.utils.pool import get_process_pool
+
+from .synthetic import write_sample_csv
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def single_pass(path: Path, chunk_rows: int) -> Report:
+    accumulator: ReportAccumulator = ReportAccumulator()
+    with path.open("rb") as stream:
+        stream_csv(stream, [accumulator], chunk_rows=chunk_rows)
+    return accumulator.result()
+
+
+def partitioned(
+    path: Path, workers: int, partition_bytes: int, chunk_rows: int
+) -> Report:
+    accumulator: ReportAccumulator = ReportAccumulator()
+    with path.open("rb") as stream:
+        stream_csv_partitioned(
+            stream,
+            accumulator,
+            consumers=[],
+            pool=get_process_pool(workers),
+            partition_bytes=partition_bytes,
+            max_pending=2 * workers,
+            chunk_rows=chunk_rows,
+        )
+    return accumulator.result()
+
+
+def main(
+    num_rows: int,
+    num_teams: int,
+    workers: List[int],
+    partition_bytes: int,
+    chunk_rows: int,
+    repeat: int,
+) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path: Path = write_sample_csv(Path(tmp) / "sample.csv", num_rows, num_teams)
+        size: int = path.stat().st_size
+        table: Table = Table(
+            title=(
+                f"Statistics of {num_rows} rows, {size / 2**20:.0f} MiB, in "
+                f"{partition_bytes / 2**20:.0f} MiB partitions "
+                f"({os.cpu_count()} cpus, best of {repeat})"
+            )
+        )
+        for column in ("workers", "seconds", "MiB/s", "speedup"):
+            table.add_column(column, justify="right")
+
+        expected: Report = single_pass(path, chunk_rows)
+        t_single: float = best_of(lambda: single_pass(path, chunk_rows), repeat)
+        table.add_row(
+            "single pass", f"{t_single:.3f}", f"{size / 2**20 / t_single:.1f}", "1.0x"
+        )
+        for num_workers in workers:
+
+            def run() -> Report:
+                return partitioned(path, num_workers, partition_bytes, chunk_rows)
+
+            assert run() == expected
+            t_partitioned: float = best_of(run, repeat)
+            table.add_row(
+                f"{num_workers}",
+                f"{t_partitioned:.3f}",
+                f"{size / 2**20 / t_partitioned:.1f}",
+                f"{t_single / t_partitioned:.1f}x",
+            )
+        print(table)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--num-rows", type=int, default=10_000_000)
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--partition-bytes", type=int, default=64 << 20)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args: argparse.Namespace = parser.parse_args()
+    main(
+        num_rows=args.num_rows,
+        num_teams=args.teams,
+        workers=args.workers,
+        partition_bytes=args.partition_bytes,
+        chunk_rows=args.chunk_rows,
+        repeat=args.repeat,
+    )
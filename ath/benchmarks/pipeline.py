@@ -0,0 +1,259 @@
+"""Per stage timings of the sample processing pipeline on synthetic samples.
+
+Every stage is timed on its own, `--repeat` times: parsing the csv
+(`SampleService.read_csv`, downloaded from S3), each of the
+`SummaryStatisticsService.get_*` statistics, the data shared by the figures
+(`get_figure_data`), building each figure (`VisualizationService.create_*_fig`),
+rasterizing it (`render_fig_to_memory`)
+and uploading the plots. S3 is a local, in memory, stand-in (`s3_stub`).
+
+Results are written as json, to be kept around and compared between commits:
+
+    python -m benchmarks.pipeline --rows 100000 1000000 --teams 10 100 \\
+        --output before.json
+    python -m benchmarks.pipeline --rows 100000 1000000 --teams 10 100 \\
+        --output after.json --baseline before.json
+
+With `--baseline`, it exits with status 1 if a stage got slower than the
+baseline by more than `--tolerance`.
+"""
+import argparse
+import datetime as dt
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import matplotlib
+import numpy as np
+import pandas as pd
+from rich import print
+from rich.table import Table
+
+from app.core.config import Settings, get_settings
+from app.schemas.visualization import FigureData, NamedFigure, RenderedFigure
+from app.services.sample import SampleService
+from app.services.summary_statistics import SummaryStatisticsService
+from app.services.visualization import (
+    FIGURE_SPECS,
+    FigureSpec,
+    VisualizationService,
+    get_figure_data,
+)
+from app.utils.s3 import get_s3_client
+
+from .s3_stub import local_s3
+from .synthetic import write_sample_csv
+
+RESULTS_VERSION: int = 1
+
+Result = Dict[str, Any]
+
+
+def time_stage(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    timings: List[float] = timeit.repeat(func, number=1, repeat=repeat)
+    return {
+        "best": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+    }
+
+
+def spec_name(prefix: str, spec: FigureSpec) -> str:
+    args: str = ",".join(f"{key}={value}" for key, value in spec.kwargs.items())
+    return f"{prefix}({args})" if args else prefix
+
+
+def bench_sample(
+    num_rows: int, num_teams: int, repeat: int, seed: int
+) -> List[Tuple[str, Dict[str, float]]]:
+    settings: Settings = get_settings()
+    summary_statistics_svc: SummaryStatisticsService = SummaryStatisticsService(
+        db=None  # type: ignore  # none of the timed stages touch the db
+    )
+    visualization_svc: VisualizationService = VisualizationService(
+        db=None  # type: ignore
+    )
+    sample_svc: SampleService = SampleService(
+        db=None,  # type: ignore
+        summary_statistics_svc=summary_statistics_svc,
+        visualization_svc=visualization_svc,
+    )
+    file_name: str = f"bench-{num_rows}-{num_teams}-{seed}"
+    timings: List[Tuple[str, Dict[str, float]]] = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path: Path = write_sample_csv(
+            Path(tmp) / "sample.csv", num_rows, num_teams, seed=seed
+        )
+        get_s3_client().upload_file(str(path), settings.S3_CSVS_BUCKET_NAME, file_name)
+
+    timings.append(
+        ("read_csv", time_stage(lambda: sample_svc.read_csv(file_name), repeat))
+    )
+    df: pd.DataFrame = sample_svc.read_csv(file_name)
+
+    for name, _ in inspect.getmembers(SummaryStatisticsService, inspect.isfunction):
+        if name.startswith("get_"):
+            getter: Callable = getattr(summary_statistics_svc, name)
+            timings.append((name, time_stage(lambda: getter(df), repeat)))
+
+    timings.append(("get_figure_data", time_stage(lambda: get_figure_data(df), repeat)))
+    data: FigureData = get_figure_data(df)
+
+    rendered_figures: List[RenderedFigure] = []
+    for spec in FIGURE_SPECS:
+        builder: Callable = getattr(visualization_svc, spec.builder)
+
+        def build() -> None:
+            visualization_svc.release_figure(builder(data, **spec.kwargs).figure)
+
+        timings.append((spec_name(spec.builder, spec), time_stage(build, repeat)))
+
+        named_figure: NamedFigure = builder(data, **spec.kwargs)
+        timings.append(
+            (
+                spec_name("render_fig_to_memory", spec),
+                time_stage(
+                    lambda: visualization_svc.render_fig_to_memory(named_figure.figure),
+                    repeat,
+                ),
+            )
+        )
+        rendered_figures.append(
+            RenderedFigure(
+                name=named_figure.name,
+                data=visualization_svc.render_fig_to_memory(named_figure.figure),
+            )
+        )
+        visualization_svc.release_figure(named_figure.figure)
+
+    timings.append(
+        (
+            "upload_rendered_figures_to_s3",
+            time_stage(
+                lambda: visualization_svc.upload_rendered_figures_to_s3(
+                    rendered_figures, sample_file_name=file_name
+                ),
+                repeat,
+            ),
+        )
+    )
+    return timings
+
+
+def get_meta(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        commit: Optional[str] = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "version": RESULTS_VERSION,
+        "created_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "matplotlib": matplotlib.__version__,
+        "rendering_format": f"{get_settings().VISUALIZATION_RENDERING_FORMAT}",
+        "fast_distributions": get_settings().VISUALIZATION_FAST_DISTRIBUTIONS,
+        "args": vars(args),
+    }
+
+
+def result_key(result: Result) -> Tuple[int, int, str]:
+    return result["rows"], result["teams"], result["stage"]
+
+
+def compare(
+    results: List[Result], baseline: List[Result], tolerance: float
+) -> List[Tuple[Result, Result]]:
+    """Stages whose best timing is above `tolerance` times their baseline."""
+    baseline_by_key: Dict[Tuple[int, int, str], Result] = {
+        result_key(result): result for result in baseline
+    }
+    return [
+        (result, baseline_by_key[result_key(result)])
+        for result in results
+        if result_key(result) in baseline_by_key
+        and result["best"] > tolerance * baseline_by_key[result_key(result)]["best"]
+    ]
+
+
+def main(args: argparse.Namespace) -> int:
+    matplotlib.use("Agg")
+    results: List[Result] = []
+    with local_s3():
+        for num_rows in args.rows:
+            for num_teams in args.teams:
+                for stage, timing in bench_sample(
+                    num_rows, num_teams, args.repeat, args.seed
+                ):
+                    results.append(
+                        {
+                            "rows": num_rows,
+                            "teams": num_teams,
+                            "stage": stage,
+                            "repeat": args.repeat,
+                            **timing,
+                        }
+                    )
+
+    table: Table = Table(title=f"Pipeline stages (best of {args.repeat}, seconds)")
+    for column in ("rows", "teams", "stage", "best", "median"):
+        table.add_column(column, justify="left" if column == "stage" else "right")
+    for result in results:
+        table.add_row(
+            f"{result['rows']}",
+            f"{result['teams']}",
+            result["stage"],
+            f"{result['best']:.4f}",
+            f"{result['median']:.4f}",
+        )
+    print(table)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(
+        json.dumps({"meta": get_meta(args), "results": results}, indent=2, default=str)
+    )
+    print(f"Results written to {args.output}")
+
+    if not args.baseline:
+        return 0
+    baseline: List[Result] = json.loads(args.baseline.read_text())["results"]
+    regressions: List[Tuple[Result, Result]] = compare(
+        results, baseline, args.tolerance
+    )
+    for result, before in regressions:
+        print(
+            f"[red]Regression[/red] rows={result['rows']} teams={result['teams']} "
+            f"{result['stage']}: {before['best']:.4f}s -> {result['best']:.4f}s"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--teams", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", type=Path, default=Path("benchmarks/results/pipeline.json")
+    )
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    sys.exit(main(parser.parse_args()))
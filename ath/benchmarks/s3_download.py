@@ -0,0 +1,100 @@
+"""Downloading a csv from S3: a single http stream vs `S3RangeReader` range
+requests, for several part sizes and concurrencies.
+
+Usage (from the `ath` directory):
+
+    python -m benchmarks.s3_download --size-mib 256 --part-mib 4 8 16 \\
+        --concurrency 1 4 8 16
+
+Runs against the local stand-in (`s3_stub`) unless `--real` is given, in which
+case the objects are uploaded to, and read from, the configured S3 server. Only
+the download is timed, the bytes are read and dropped.
+"""
+import argparse
+import os
+import timeit
+from contextlib import closing, nullcontext
+from typing import Callable, List
+from urllib.request import urlopen
+
+from rich import print
+from rich.table import Table
+
+from app.core.config import Settings, get_settings
+from app.utils.ingestion import ByteStream
+from app.utils.s3 import S3RangeReader, get_s3_client, s3_csv_url
+
+from .s3_stub import local_s3
+
+READ_BYTES: int = 1 << 20
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def drain(stream: ByteStream) -> None:
+    with closing(stream):
+        while stream.read(READ_BYTES):
+            pass
+
+
+def main(
+    size_mib: int, part_mib: List[int], concurrency: List[int], repeat: int, real: bool
+) -> None:
+    settings: Settings = get_settings()
+    file_name: str = f"bench-download-{size_mib}"
+    size: int = size_mib << 20
+    with nullcontext() if real else local_s3():
+        get_s3_client().put_object(
+            Bucket=settings.S3_CSVS_BUCKET_NAME, Key=file_name, Body=os.urandom(size)
+        )
+        table: Table = Table(
+            title=f"Download of {size_mib} MiB (best of {repeat}, MiB/s)"
+        )
+        table.add_column("part (MiB)", justify="right")
+        for num_parts in concurrency:
+            table.add_column(f"{num_parts} at once", justify="right")
+
+        t_stream: float = best_of(lambda: drain(urlopen(s3_csv_url(file_name))), repeat)
+        table.add_row(
+            "single stream",
+            *[f"{size_mib / t_stream:.0f}"] + [""] * (len(concurrency) - 1),
+        )
+        for part in part_mib:
+            row: List[str] = [f"{part}"]
+            for num_parts in concurrency:
+                t_ranges: float = best_of(
+                    lambda: drain(
+                        S3RangeReader(
+                            file_name,
+                            settings.S3_CSVS_BUCKET_NAME,
+                            size=size,
+                            part_bytes=part << 20,
+                            concurrency=num_parts,
+                        )
+                    ),
+                    repeat,
+                )
+                row.append(f"{size_mib / t_ranges:.0f}")
+            table.add_row(*row)
+        print(table)
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--size-mib", type=int, default=256)
+    parser.add_argument("--part-mib", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--real", action="store_true")
+    args: argparse.Namespace = parser.parse_args()
+    main(
+        size_mib=args.size_mib,
+        part_mib=args.part_mib,
+        concurrency=args.concurrency,
+        repeat=args.repeat,
+        real=args.real,
+    )
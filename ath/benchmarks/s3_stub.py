@@ -0,0 +1,106 @@
+"""In memory, local stand-in for the S3 server, enough for the pipeline: path
+style PUT, GET (with single byte ranges) and HEAD of objects.
+
+It serves plain http on localhost so uploads and downloads pay for the
+client, serialization and a real socket, but not for a network or disk.
+"""
+import hashlib
+import re
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Tuple
+
+from app.core.config import Settings, get_settings
+from app.utils.s3 import reset_s3_runtime
+
+RANGE_PATTERN: re.Pattern = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class S3StubHandler(BaseHTTPRequestHandler):
+    protocol_version: str = "HTTP/1.1"
+    objects: Dict[str, bytes]
+    etags: Dict[str, str]
+    """Computed once per object, not on every (range) request."""
+
+    def log_message(self, format: str, *args) -> None:
+        ...
+
+    def key(self) -> str:
+        return self.path.split("?", 1)[0]
+
+    def do_PUT(self) -> None:
+        length: int = int(self.headers.get("Content-Length", 0))
+        data: bytes = self.rfile.read(length)
+        self.objects[self.key()] = data
+        self.etags[self.key()] = f'"{hashlib.md5(data).hexdigest()}"'
+        self.send_response(200)
+        self.send_header("ETag", self.etags[self.key()])
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self) -> None:
+        self.send_object(body=False)
+
+    def do_GET(self) -> None:
+        self.send_object(body=True)
+
+    def send_object(self, body: bool) -> None:
+        data: Optional[bytes] = self.objects.get(self.key())
+        if data is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        status: int = 200
+        start, end = 0, len(data)
+        match = RANGE_PATTERN.fullmatch(self.headers.get("Range", ""))
+        if match and (match.group(1) or match.group(2)):
+            start, end = self.parse_range(match.group(1), match.group(2), len(data))
+            status = 206
+        self.send_response(status)
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("ETag", self.etags[self.key()])
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+        self.end_headers()
+        if body:
+            with memoryview(data) as view:
+                try:
+                    self.wfile.write(view[start:end])
+                except ConnectionError:
+                    # the client dropped the transfer, as an aborted download does
+                    self.close_connection = True
+
+    @staticmethod
+    def parse_range(first: str, last: str, size: int) -> Tuple[int, int]:
+        if not first:
+            return max(size - int(last), 0), size
+        return int(first), min(int(last) + 1, size) if last else size
+
+
+@contextmanager
+def local_s3() -> Iterator[Dict[str, bytes]]:
+    """Serves a fresh stand-in on a free local port and points the settings
+    (shared by every module) and the S3 client at it for the duration of the
+    context. Yields the stored objects, keyed by `/<bucket>/<key>`."""
+    objects: Dict[str, bytes] = {}
+    handler = type("Handler", (S3StubHandler,), {"objects": objects, "etags": {}})
+    server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread: threading.Thread = threading.Thread(
+        target=server.serve_forever, daemon=True
+    )
+    thread.start()
+
+    settings: Settings = get_settings()
+    host, port = settings.S3_HOST, settings.S3_PORT
+    settings.S3_HOST, settings.S3_PORT = "127.0.0.1", str(server.server_port)
+    reset_s3_runtime()
+    try:
+        yield objects
+    finally:
+        settings.S3_HOST, settings.S3_PORT = host, port
+        reset_s3_runtime()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,46 @@
+"""Synthetic samples in the layout of the csvs under `ath/data`."""
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+CSV_COLUMNS: List[str] = ["review_time", "team", "date", "merge_time"]
+
+
+def gen_sample_csv_frame(
+    num_rows: int,
+    num_teams: int,
+    seed: int = 0,
+    zero_fraction: float = 0.05,
+    max_time: int = 100_000,
+) -> pd.DataFrame:
+    """`num_rows` PRs spread over `num_teams` teams and a year of dates. About
+    `zero_fraction` of them were merged without review and as many without CI,
+    i.e. have a zero review or merge time."""
+    rng: np.random.Generator = np.random.default_rng(seed)
+    dates: pd.DatetimeIndex = pd.date_range("2023-01-01", periods=365, freq="D")
+    review_time: np.ndarray = rng.integers(1, max_time, num_rows)
+    merge_time: np.ndarray = rng.integers(1, max_time, num_rows)
+    review_time[rng.random(num_rows) < zero_fraction] = 0
+    merge_time[rng.random(num_rows) < zero_fraction] = 0
+    return pd.DataFrame(
+        {
+            "review_time": review_time,
+            "team": np.char.add(
+                "team-", rng.integers(0, num_teams, num_rows).astype(str)
+            ),
+            "date": dates[rng.integers(0, len(dates), num_rows)].strftime("%Y-%m-%d"),
+            "merge_time": merge_time,
+        },
+        columns=CSV_COLUMNS,
+    )
+
+
+def write_sample_csv(
+    path: Path, num_rows: int, num_teams: int, seed: int = 0, **kwargs
+) -> Path:
+    gen_sample_csv_frame(num_rows, num_teams, seed=seed, **kwargs).to_csv(
+        path, index=False
+    )
+    return path
@@ -41,8 +41,11 @@ def shell():  # pragma: no cover
 @cli.command()
 def upload(
     csv_file: Optional[str] = typer.Option("./tech-assessment.csv"),
+    parent_sample_id: Optional[str] = typer.Option(
+        None, help="Sample to append the rows of the csv to"
+    ),
 ):
-    asyncio.run(upload_aio(csv_file=csv_file))
+    asyncio.run(upload_aio(csv_file=csv_file, parent_sample_id=parent_sample_id))
 
 
 cli()
@@ -1,5 +1,7 @@
 import json
+import os
 import uuid
+from typing import Dict, Optional
 
 from rich import print
 from tusclient import client
@@ -11,14 +13,41 @@ from app.utils.tusd import tusd_upload_url
 settings: Settings = get_settings()
 
 
-async def upload_aio(csv_file: str) -> None:
+def count_rows(csv_file: str, chunk_bytes: int = 1 << 20) -> int:
+    """Number of rows of a csv, its header left out, counted out of its line
+    breaks."""
+    num_lines: int = 0
+    last: bytes = b"\n"
+    with open(csv_file, "rb") as f:
+        while True:
+            data: bytes = f.read(chunk_bytes)
+            if not data:
+                break
+            num_lines += data.count(b"\n")
+            last = data[-1:]
+    if last != b"\n":
+        num_lines += 1  # no line break after the last row
+    return max(num_lines - 1, 0)
+
+
+async def upload_aio(csv_file: str, parent_sample_id: Optional[str] = None) -> None:
     upload_id: str = str(uuid.uuid4())
+    # declared upfront, uploads are admitted by the api before tusd stores them
+    metadata: Dict[str, str] = {
+        "upload_id": upload_id,
+        "filename": os.path.basename(csv_file),
+        "filetype": "text/csv",
+        "row_count": str(count_rows(csv_file)),
+    }
+    if parent_sample_id:
+        # the rows are appended to this sample instead of making a new one
+        metadata["parent_sample_id"] = parent_sample_id
     url: str = tusd_upload_url()
     tusd_client = client.TusClient(url)
     uploader = tusd_client.async_uploader(
         csv_file,
         chunk_size=settings.TUSD_UPLOAD_CHUNK,
-        metadata={"upload_id": upload_id},
+        metadata=metadata,
     )
     print(f"CSV sample uploaded with upload_id: '{upload_id}'")
     try:
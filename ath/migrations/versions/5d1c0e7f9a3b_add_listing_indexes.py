@@ -0,0 +1,46 @@
+""""Add listing indexes"
+
+Revision ID: 5d1c0e7f9a3b
+Revises: 2badbc64228c
+Create Date: 2026-10-18 10:12:41.118904
+
+"""
+from typing import Literal
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: Literal["5d1c0e7f9a3b"] = "5d1c0e7f9a3b"
+down_revision: Literal["2badbc64228c"] = "2badbc64228c"
+branch_labels: None = None
+depends_on: None = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_sample_created_at_id", "sample", ["created_at", "id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_summary_statistics_sample_id"),
+        "summary_statistics",
+        ["sample_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_visualization_sample_id"),
+        "visualization",
+        ["sample_id"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_plot_visualization_id"), "plot", ["visualization_id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_plot_visualization_id"), table_name="plot")
+    op.drop_index(op.f("ix_visualization_sample_id"), table_name="visualization")
+    op.drop_index(
+        op.f("ix_summary_statistics_sample_id"), table_name="summary_statistics"
+    )
+    op.drop_index("ix_sample_created_at_id", table_name="sample")
@@ -0,0 +1,46 @@
+""""Add sample content hash"
+
+Revision ID: 8e4f2a61c7d0
+Revises: 5d1c0e7f9a3b
+Create Date: 2026-10-18 11:03:27.402117
+
+"""
+from typing import Literal
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: Literal["8e4f2a61c7d0"] = "8e4f2a61c7d0"
+down_revision: Literal["5d1c0e7f9a3b"] = "5d1c0e7f9a3b"
+branch_labels: None = None
+depends_on: None = None
+
+
+def upgrade():
+    op.add_column(
+        "sample",
+        sa.Column("content_hash", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+    op.add_column(
+        "sample",
+        sa.Column("source_sample_id", sqlmodel.sql.sqltypes.GUID(), nullable=True),
+    )
+    op.create_index(
+        op.f("ix_sample_content_hash"), "sample", ["content_hash"], unique=False
+    )
+    op.create_foreign_key(
+        "sample_source_sample_id_fkey",
+        "sample",
+        "sample",
+        ["source_sample_id"],
+        ["id"],
+    )
+
+
+def downgrade():
+    op.drop_constraint("sample_source_sample_id_fkey", "sample", type_="foreignkey")
+    op.drop_index(op.f("ix_sample_content_hash"), table_name="sample")
+    op.drop_column("sample", "source_sample_id")
+    op.drop_column("sample", "content_hash")
@@ -0,0 +1,25 @@
+""""Add sample stages"
+
+Revision ID: b71d9c04e2a5
+Revises: 8e4f2a61c7d0
+Create Date: 2026-10-18 12:26:09.551630
+
+"""
+from typing import Literal
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: Literal["b71d9c04e2a5"] = "b71d9c04e2a5"
+down_revision: Literal["8e4f2a61c7d0"] = "8e4f2a61c7d0"
+branch_labels: None = None
+depends_on: None = None
+
+
+def upgrade():
+    op.add_column("sample", sa.Column("stages", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("sample", "stages")
@@ -0,0 +1,44 @@
+""""Add sample parent"
+
+Revision ID: c3a58e1f7b92
+Revises: b71d9c04e2a5
+Create Date: 2026-10-18 15:12:41.286530
+
+"""
+from typing import Literal
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: Literal["c3a58e1f7b92"] = "c3a58e1f7b92"
+down_revision: Literal["b71d9c04e2a5"] = "b71d9c04e2a5"
+branch_labels: None = None
+depends_on: None = None
+
+
+def upgrade():
+    op.add_column(
+        "sample",
+        sa.Column("parent_sample_id", sqlmodel.sql.sqltypes.GUID(), nullable=True),
+    )
+    op.create_index(
+        op.f("ix_sample_parent_sample_id"),
+        "sample",
+        ["parent_sample_id"],
+        unique=False,
+    )
+    op.create_foreign_key(
+        "sample_parent_sample_id_fkey",
+        "sample",
+        "sample",
+        ["parent_sample_id"],
+        ["id"],
+    )
+
+
+def downgrade():
+    op.drop_constraint("sample_parent_sample_id_fkey", "sample", type_="foreignkey")
+    op.drop_index(op.f("ix_sample_parent_sample_id"), table_name="sample")
+    op.drop_column("sample", "parent_sample_id")
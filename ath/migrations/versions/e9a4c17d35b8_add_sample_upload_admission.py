@@ -0,0 +1,38 @@
+""""Add sample upload admission"
+
+Revision ID: e9a4c17d35b8
+Revises: c3a58e1f7b92
+Create Date: 2026-10-18 21:04:17.620341
+
+"""
+from typing import Literal
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: Literal["e9a4c17d35b8"] = "e9a4c17d35b8"
+down_revision: Literal["c3a58e1f7b92"] = "c3a58e1f7b92"
+branch_labels: None = None
+depends_on: None = None
+
+
+def upgrade():
+    op.add_column("sample", sa.Column("size", sa.BigInteger(), nullable=True))
+    op.add_column(
+        "sample",
+        sa.Column("client", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+    op.create_index(
+        "ix_sample_client_started_upload_at",
+        "sample",
+        ["client", "started_upload_at"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_sample_client_started_upload_at", table_name="sample")
+    op.drop_column("sample", "client")
+    op.drop_column("sample", "size")
@@ -0,0 +1,29 @@
+""""Add sample storage"
+
+Revision ID: f2b8d6a41c93
+Revises: e9a4c17d35b8
+Create Date: 2026-10-18 22:41:09.318274
+
+"""
+from typing import Literal
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: Literal["f2b8d6a41c93"] = "f2b8d6a41c93"
+down_revision: Literal["e9a4c17d35b8"] = "e9a4c17d35b8"
+branch_labels: None = None
+depends_on: None = None
+
+
+def upgrade():
+    op.add_column(
+        "sample",
+        sa.Column("storage", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("sample", "storage")